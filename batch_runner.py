@@ -0,0 +1,303 @@
+"""
+Headless batch runner for bulk risk assessment and agent deliberation.
+
+Reads one JSON object per line from the input file, e.g.
+    {"id": "cv-screening", "description": "An AI system that ranks job applicants...", "rounds": 2,
+     "agents": [{"name": "Data Scientist", "role": "You build the ranking model..."}]}
+Only "description" is required. Results (risk assessment and transcript) are appended to the output file as
+each description completes, and descriptions already present in the output are skipped, so an interrupted
+batch can be restarted with the same command. Conversations stopped by --token-budget are written with
+"status": "budget_exhausted" and resumed by the next run (e.g., with a larger budget).
+
+With --risk-batch, the descriptions are first assessed together through the Batch API (about half the cost
+of live runs and no per-request rate limits); the results go into the risk cache, which the per-description
+processing then reads instead of running RiskGuard.
+
+Usage:
+    python batch_runner.py descriptions.jsonl results.jsonl --concurrency 4 --rounds 1
+    python batch_runner.py descriptions.jsonl results.jsonl --risk-batch --rounds 0
+"""
+import os
+import json
+import time
+import logging
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from dotenv import load_dotenv
+
+from controller.vector_store import initialize_vector_store
+from controller.chunk_ingestion import sync_pdf_chunks_to_vector_store
+from controller.file_metadata_cache import prefetch_vector_store_file_names
+from controller.local_retrieval import load_local_index
+from controller.async_runtime import run_async
+from controller.input_guardrail import get_risk_guard_assistant, topical_guardrail_for_risk_assessment
+from controller.agent import create_agent
+from controller.batch_risk import run_risk_batch
+from controller.context_compaction import CONTEXT_TOKEN_BUDGET
+from controller.conversation import run_conversation, PDFS_DIR, BUDGET_ACTIONS
+from controller.risk_cache import get_cached_risk_assessment, store_risk_assessment
+from controller.response_text_file import Transcript
+from controller.rate_limiter import RateLimitedClient, get_rate_limiter
+from controller.client_factory import create_openai_client
+from controller.token_usage import usage_scope
+
+from view.format_response import extract_response_with_citations, detect_risk_level
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+
+VECTOR_STORE_NAME = "Agents4EthicalSE"
+AI_ETHICIST_ROLE_PATH = "agent_role_examples/AI_ethicist.txt"
+
+def read_descriptions(input_path):
+    """
+    Reads the descriptions to process from a JSONL file.
+
+    Parameters:
+    - input_path: Path of the JSONL file.
+
+    Returns:
+    - List of dicts with at least 'id' and 'description'; the id defaults to the line number.
+    """
+    items = []
+    with open(input_path, "r", encoding="utf-8") as file:
+        for line_number, line in enumerate(file, start=1):
+            if not line.strip():
+                continue
+            item = json.loads(line)
+            item.setdefault("id", str(line_number))
+            items.append(item)
+    return items
+
+def read_completed_ids(output_path):
+    """
+    Returns the IDs of the descriptions that already have a successful result in the output file.
+    Results of conversations stopped by their token budget don't count, so those conversations are resumed.
+
+    Parameters:
+    - output_path: Path of the JSONL output file.
+
+    Returns:
+    - Set of completed IDs.
+    """
+    if not os.path.exists(output_path):
+        return set()
+    completed_ids = set()
+    with open(output_path, "r", encoding="utf-8") as file:
+        for line in file:
+            try:
+                result = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # A partial line left by an interrupted write
+            if not result.get("error") and result.get("status") != "budget_exhausted":
+                completed_ids.add(result["id"])
+    return completed_ids
+
+def assess_risk(api_client, async_api_client, risk_agent, description, model):
+    """
+    Assesses a description with RiskGuard, reusing a cached assessment if one exists.
+
+    Returns:
+    - Tuple of the response text, its citations and whether it was served from cache.
+    """
+    cached_assessment = get_cached_risk_assessment(description, model)
+    if cached_assessment:
+        return cached_assessment[0], cached_assessment[1], True
+
+    messages = run_async(topical_guardrail_for_risk_assessment(async_api_client, risk_agent, None, description))
+    if not messages:
+        raise RuntimeError("RiskGuard did not return an assessment.")
+    response, citations = extract_response_with_citations(api_client, messages)
+    store_risk_assessment(description, model, response, citations)
+    return response, citations, False
+
+def process_description(api_client, async_api_client, item, risk_agent, ai_ethicist_agent, default_agents, vector_store_id, args):
+    """
+    Runs the risk assessment and, unless the risk is unacceptable, the agents' deliberation for one description.
+
+    Returns:
+    - Dict with the result, ready to be written to the output file.
+    """
+    started = time.perf_counter()
+    # Tokens and estimated cost of the description's assessment and conversation
+    with usage_scope() as description_usage:
+        result = _process_description(api_client, async_api_client, item, risk_agent, ai_ethicist_agent, default_agents, vector_store_id, args)
+    result["total_tokens"] = description_usage.total_tokens
+    result["cost"] = round(description_usage.cost, 6)
+    result["elapsed_seconds"] = round(time.perf_counter() - started, 3)
+    return result
+
+def _process_description(api_client, async_api_client, item, risk_agent, ai_ethicist_agent, default_agents, vector_store_id, args):
+    description = item["description"]
+    response, citations, cached = assess_risk(api_client, async_api_client, risk_agent, description, args.model)
+    risk_level = detect_risk_level(response)
+
+    # Agents of this description (or the defaults), followed by the AI Ethicist
+    agents = default_agents
+    if "agents" in item:
+        agents = [create_batch_agent(api_client, agent["name"], agent["role"], args.model, vector_store_id, scope=item["id"]) for agent in item["agents"]]
+    agents = agents + [{"id": ai_ethicist_agent.id, "name": "AI Ethicist", "role": ai_ethicist_agent.instructions}]
+
+    transcript = Transcript(description, agents)
+    transcript.append("RiskGuard:" + response)
+    rounds = int(item.get("rounds", args.rounds))
+    budget_events = []
+    if risk_level != "Unacceptable Risk" and rounds > 0:
+        run_conversation(
+            api_client, description, agents, rounds, ai_ethicist_agent.id, vector_store_id, args.model,
+            transcript=transcript,
+            parallel_rounds=args.parallel_rounds,
+            context_token_budget=args.context_token_budget,
+            local_retrieval=args.local_retrieval,
+            profile_run_steps=args.profile_run_steps,
+            token_budget=args.token_budget,
+            budget_action=args.budget_action,
+            resume_scope=f"batch:{item['id']}",
+            on_budget_reached=lambda action, used_tokens, token_budget: budget_events.append(action)
+        )
+
+    return {
+        "id": item["id"],
+        "description": description,
+        # A conversation stopped by its token budget is resumed the next time the batch runs
+        "status": "budget_exhausted" if "stop" in budget_events else "completed",
+        "risk_level": risk_level,
+        "risk_assessment": response,
+        "risk_citations": citations,
+        "risk_assessment_cached": cached,
+        "transcript": transcript.entries,
+    }
+
+def create_batch_agent(api_client, agent_name, agent_role, model, vector_store_id, scope=None):
+    # Descriptions run concurrently; an assistant named after its description's ID is never
+    # deleted or replaced by another description that uses the same agent name with a different role
+    assistant_name = f"{agent_name} [{scope}]" if scope is not None else agent_name
+    agent = create_agent(api_client, assistant_name, agent_role, model, vector_store_id)
+    if agent is None:
+        raise RuntimeError(f"Agent '{assistant_name}' could not be created.")
+    return {"id": agent.id, "name": agent_name, "role": agent_role}
+
+def parse_agent_arguments(agent_arguments):
+    # "Name=path/to/role.txt" -> (name, role text)
+    agents = []
+    for agent_argument in agent_arguments:
+        agent_name, _, role_path = agent_argument.partition("=")
+        with open(role_path, "r", encoding="utf-8") as file:
+            agents.append((agent_name.strip(), file.read()))
+    return agents
+
+def write_batch_assessments(output_path, items, model):
+    # Assessment-only batches need no assistants: write the cached results directly
+    with open(output_path, "a", encoding="utf-8") as output_file:
+        for item in items:
+            cached_assessment = get_cached_risk_assessment(item["description"], model)
+            if cached_assessment:
+                response, citations = cached_assessment
+                result = {
+                    "id": item["id"],
+                    "description": item["description"],
+                    "risk_level": detect_risk_level(response),
+                    "risk_assessment": response,
+                    "risk_citations": citations,
+                    "risk_assessment_cached": True,
+                    "transcript": ["RiskGuard:" + response],
+                }
+            else:
+                result = {"id": item["id"], "description": item["description"], "error": "No risk assessment in the batch output."}
+            output_file.write(json.dumps(result) + "\n")
+    logging.info(f"Wrote {len(items)} batch risk assessments to {output_path}.")
+
+def run_batch(args):
+    load_dotenv()
+    # Concurrent descriptions share the rate limiter, which also does the retries
+    client_options = {"base_url": args.base_url, "max_retries": 0, "default_headers": {"OpenAI-Beta": "assistants=v2"}}
+    api_client = RateLimitedClient(create_openai_client(os.getenv("OPENAI_API_KEY"), **client_options), args.model)
+    async_api_client = RateLimitedClient(create_openai_client(os.getenv("OPENAI_API_KEY"), async_client=True, **client_options), args.model)
+
+    completed_ids = read_completed_ids(args.output)
+    items = [item for item in read_descriptions(args.input) if item["id"] not in completed_ids]
+
+    if args.risk_batch:
+        # Fill the risk cache in one batch; the per-description processing below then reads from it
+        run_risk_batch(api_client, [item["description"] for item in items], args.model, poll_interval=args.batch_poll_interval)
+        if args.rounds == 0 and not any(int(item.get("rounds", 0)) for item in items):
+            write_batch_assessments(args.output, items, args.model)
+            return
+
+    vector_store, _ = initialize_vector_store(api_client, VECTOR_STORE_NAME)
+    sync_pdf_chunks_to_vector_store(api_client, vector_store.id, PDFS_DIR)
+    # Citations resolve to the source PDFs' names without a request per cited file
+    prefetch_vector_store_file_names(api_client, vector_store.id)
+    if args.local_retrieval:
+        # Built (or opened) once before the descriptions run, so their queries only read it
+        load_local_index(PDFS_DIR)
+
+    risk_agent = get_risk_guard_assistant(api_client, args.model)
+    if risk_agent is None:
+        raise RuntimeError("RiskGuard assistant could not be initialized.")
+    with open(AI_ETHICIST_ROLE_PATH, "r", encoding="utf-8") as file:
+        ai_ethicist_agent = create_agent(api_client, "AI Ethicist", file.read(), args.model, vector_store.id)
+    default_agents = [
+        create_batch_agent(api_client, agent_name, agent_role, args.model, vector_store.id)
+        for agent_name, agent_role in parse_agent_arguments(args.agent)
+    ]
+
+    logging.info(f"Processing {len(items)} descriptions ({len(completed_ids)} already completed) with concurrency {args.concurrency}.")
+
+    output_lock = threading.Lock()
+    started = time.perf_counter()
+    processed = failed = 0
+
+    with open(args.output, "a", encoding="utf-8") as output_file, ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        futures = {
+            executor.submit(
+                process_description, api_client, async_api_client, item, risk_agent, ai_ethicist_agent,
+                default_agents, vector_store.id, args
+            ): item
+            for item in items
+        }
+        for future in as_completed(futures):
+            item = futures[future]
+            try:
+                result = future.result()
+            except Exception as error:
+                logging.error(f"Description {item['id']} failed: {error}")
+                result = {"id": item["id"], "description": item["description"], "error": str(error)}
+                failed += 1
+
+            # Stream each result as soon as it completes
+            with output_lock:
+                output_file.write(json.dumps(result) + "\n")
+                output_file.flush()
+
+            processed += 1
+            elapsed = time.perf_counter() - started
+            logging.info(
+                f"{processed}/{len(items)} descriptions done ({failed} failed) in {elapsed:.1f}s, "
+                f"{processed / elapsed * 3600:.1f} per hour, "
+                f"{get_rate_limiter().get_stats()['queue_seconds']:.1f}s spent queueing for the rate limiter."
+            )
+
+def main():
+    parser = argparse.ArgumentParser(description="Assess module descriptions and run the agents' deliberation without the UI.")
+    parser.add_argument("input", help="JSONL file with one {\"description\": ...} object per line.")
+    parser.add_argument("output", help="JSONL file the results are appended to.")
+    parser.add_argument("--concurrency", type=int, default=4, help="Number of descriptions processed at the same time.")
+    parser.add_argument("--rounds", type=int, default=1, help="Conversation rounds per description (0 for the risk assessment only).")
+    parser.add_argument("--agent", action="append", default=[], metavar="NAME=ROLE_FILE", help="Agent taking part in every conversation; repeatable.")
+    parser.add_argument("--model", default="gpt-4o-mini")
+    parser.add_argument("--parallel-rounds", action="store_true", help="Let all agents except the AI Ethicist answer each round at the same time.")
+    parser.add_argument("--local-retrieval", action="store_true", help="Ground the agents with the local index instead of the hosted file search.")
+    parser.add_argument("--context-token-budget", type=int, default=CONTEXT_TOKEN_BUDGET)
+    parser.add_argument("--profile-run-steps", action="store_true", help="Record each run's tool calls and step durations (see devtools/run_step_report.py).")
+    parser.add_argument("--token-budget", type=int, default=None, help="Tokens each conversation may use; it stops before exceeding them.")
+    parser.add_argument("--budget-action", choices=BUDGET_ACTIONS, default="stop", help="'economy' first switches to cheaper runs when nearing the budget.")
+    parser.add_argument("--risk-batch", action="store_true", help="Assess all descriptions through the Batch API before processing them.")
+    parser.add_argument("--batch-poll-interval", type=float, default=30.0, help="Seconds between two polls of the risk batch.")
+    parser.add_argument("--base-url", default=None, help="Alternative API base URL, e.g. the local mock server.")
+    run_batch(parser.parse_args())
+
+if __name__ == "__main__":
+    main()
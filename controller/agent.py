@@ -1,6 +1,8 @@
 import logging
 from typing import Any, Optional
 
+from controller.assistant_registry import find_assistants, register_assistant, unregister_assistant
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 
@@ -19,23 +21,6 @@ def create_agent(client: Any, agent_name: str, agent_role: str, model: str, vect
     - The created or existing assistant object if successful, None otherwise.
     """
     try:
-        # Retrieve the list of existing assistants
-        assistants = client.beta.assistants.list()
-
-        # Check if the agent already exists
-        for assistant in assistants.data:
-            if assistant.name == agent_name:
-                if "ai ethicist" in assistant.name.lower():
-                    logging.info(f"Found AI Ethicist with ID: {assistant.id}. Returning without changes.")
-                    return assistant
-                if "riskguard" in assistant.name.lower():
-                    logging.info(f"Found RiskGuard with ID: {assistant.id}. Returning without changes.")
-                    return assistant
-                else:
-                    logging.info(f"Agent '{assistant.name}' already exists with ID: {assistant.id}")
-                    logging.info(f"Deleting existing Agent '{assistant.name}' with ID: {assistant.id}")
-                    delete_agent_by_id(client, assistant.id)
-        
         GENERAL_INSTRUCTIONS = """
             You are an expert agent with deep expertise in your assigned domain. Your primary responsibility is to perform tasks and provide responses that align with the **best practices** and methodologies outlined in the documents provided: European Union’s AI Act, Charter of Fundamental Rights of the European Union, European Declaration on Digital Rights and Principles, and the ethical principles outlined by the AI HLEG (High-Level Expert Group on AI). 
             Your responses should be rooted in evidence, referencing the context and specific sections of the documents as needed to ensure accuracy and reliability.
@@ -62,6 +47,25 @@ def create_agent(client: Any, agent_name: str, agent_role: str, model: str, vect
         if "ai ethicist" not in agent_name.lower():
             agent_role += GENERAL_INSTRUCTIONS
 
+        # Reuse an identical agent from the process-wide registry instead of re-creating it
+        if "ai ethicist" not in agent_name.lower() and "riskguard" not in agent_name.lower():
+            for assistant in find_assistants(client, agent_name, instructions=agent_role):
+                logging.info(f"Agent '{assistant.name}' with identical instructions found with ID: {assistant.id}. Reusing it.")
+                return assistant
+
+        # Check if the agent already exists
+        for assistant in find_assistants(client, agent_name):
+            if "ai ethicist" in assistant.name.lower():
+                logging.info(f"Found AI Ethicist with ID: {assistant.id}. Returning without changes.")
+                return assistant
+            if "riskguard" in assistant.name.lower():
+                logging.info(f"Found RiskGuard with ID: {assistant.id}. Returning without changes.")
+                return assistant
+            else:
+                logging.info(f"Agent '{assistant.name}' already exists with ID: {assistant.id}")
+                logging.info(f"Deleting existing Agent '{assistant.name}' with ID: {assistant.id}")
+                delete_agent_by_id(client, assistant.id)
+
         # Create a new assistant if not found
         assistant = client.beta.assistants.create(
             name = agent_name,
@@ -72,6 +76,7 @@ def create_agent(client: Any, agent_name: str, agent_role: str, model: str, vect
                if vector_store_id else {})
         )
 
+        register_assistant(assistant)
         logging.info(f"New agent '{agent_name}' created with ID: {assistant.id}")
         return assistant
 
@@ -100,9 +105,12 @@ def delete_agent_by_id(client: Any, agent_id: str) -> bool:
         assistant = get_agent_by_id(client, agent_id)
         if assistant:
             client.beta.assistants.delete(agent_id)
+            unregister_assistant(agent_id)
             logging.info(f"Agent with ID: {agent_id} deleted successfully.")
             return True
         else:
+            # It may have been deleted elsewhere; make sure the registry forgets it too
+            unregister_assistant(agent_id)
             logging.warning(f"Agent with ID: {agent_id} not found.")
             return False
 
@@ -0,0 +1,132 @@
+import time
+import hashlib
+import logging
+import threading
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+
+# Seconds before the registry checks the API for newly created assistants
+REGISTRY_TTL_SECONDS = 60
+# Seconds before the registry re-lists every assistant to pick up deletions and edits made elsewhere
+FULL_REFRESH_INTERVAL_SECONDS = 600
+# Page size used when listing assistants (API maximum)
+LIST_PAGE_SIZE = 100
+
+# Process-wide state shared by every Streamlit session
+_registry_lock = threading.RLock()
+_assistants_by_id: Dict[str, Any] = {}
+_ids_by_name: Dict[str, Set[str]] = {}
+_ids_by_key: Dict[Tuple[str, str], Set[str]] = {}
+_last_refresh: Optional[float] = None
+_last_full_refresh: Optional[float] = None
+
+def hash_instructions(instructions: Optional[str]) -> str:
+    """
+    Computes a stable hash of an assistant's instructions.
+
+    Parameters:
+    - instructions: The instructions text (None is treated as empty).
+
+    Returns:
+    - str: The hex SHA-256 digest of the instructions.
+    """
+    return hashlib.sha256((instructions or "").encode("utf-8")).hexdigest()
+
+def register_assistant(assistant: Any) -> None:
+    """
+    Adds or replaces an assistant in the registry (e.g., right after it was created).
+
+    Parameters:
+    - assistant: The assistant object returned by the API.
+    """
+    with _registry_lock:
+        unregister_assistant(assistant.id)
+        _assistants_by_id[assistant.id] = assistant
+        _ids_by_name.setdefault(assistant.name, set()).add(assistant.id)
+        _ids_by_key.setdefault((assistant.name, hash_instructions(assistant.instructions)), set()).add(assistant.id)
+
+def unregister_assistant(assistant_id: str) -> None:
+    """
+    Removes an assistant from the registry (e.g., right after it was deleted).
+
+    Parameters:
+    - assistant_id: The ID of the assistant to remove.
+    """
+    with _registry_lock:
+        assistant = _assistants_by_id.pop(assistant_id, None)
+        if assistant is None:
+            return
+        _ids_by_name.get(assistant.name, set()).discard(assistant_id)
+        _ids_by_key.get((assistant.name, hash_instructions(assistant.instructions)), set()).discard(assistant_id)
+
+def invalidate_assistant_registry() -> None:
+    """
+    Drops all cached assistants so the next lookup performs a full refresh.
+    """
+    global _last_refresh, _last_full_refresh
+    with _registry_lock:
+        _assistants_by_id.clear()
+        _ids_by_name.clear()
+        _ids_by_key.clear()
+        _last_refresh = None
+        _last_full_refresh = None
+
+def refresh_assistant_registry(api_client: Any, force_full: bool = False) -> None:
+    """
+    Synchronizes the registry with the API when its TTL has expired.
+
+    An incremental refresh lists assistants newest-first and stops at the first one already known.
+    A full refresh walks every page and replaces the registry contents.
+
+    Parameters:
+    - api_client: The API client object for interacting with the OpenAI service.
+    - force_full: Whether to perform a full refresh regardless of the TTLs.
+    """
+    global _last_refresh, _last_full_refresh
+    with _registry_lock:
+        now = time.monotonic()
+        full = force_full or _last_full_refresh is None or now - _last_full_refresh >= FULL_REFRESH_INTERVAL_SECONDS
+        if not full and now - _last_refresh < REGISTRY_TTL_SECONDS:
+            return
+
+        if full:
+            # Iterating the page object follows the pagination cursor through every page
+            assistants = list(api_client.beta.assistants.list(limit=LIST_PAGE_SIZE, order="desc"))
+            invalidate_assistant_registry()
+            for assistant in assistants:
+                register_assistant(assistant)
+            _last_full_refresh = now
+            logging.info(f"Assistant registry fully refreshed with {len(assistants)} assistants.")
+        else:
+            new_assistants = 0
+            for assistant in api_client.beta.assistants.list(limit=LIST_PAGE_SIZE, order="desc"):
+                if assistant.id in _assistants_by_id:
+                    break
+                register_assistant(assistant)
+                new_assistants += 1
+            logging.info(f"Assistant registry incrementally refreshed with {new_assistants} new assistants.")
+
+        _last_refresh = now
+
+def find_assistants(api_client: Any, name: str, instructions: Optional[str] = None) -> List[Any]:
+    """
+    Looks up assistants by name, and optionally by exact instructions, from the registry.
+
+    Parameters:
+    - api_client: The API client object, used only when the registry needs refreshing.
+    - name: The assistant name to look up.
+    - instructions: Optional instructions the assistant must match exactly.
+
+    Returns:
+    - List of matching assistant objects, newest first.
+    """
+    refresh_assistant_registry(api_client)
+    with _registry_lock:
+        if instructions is None:
+            ids = _ids_by_name.get(name, set())
+        else:
+            ids = _ids_by_key.get((name, hash_instructions(instructions)), set())
+        matches = [_assistants_by_id[assistant_id] for assistant_id in ids]
+    return sorted(matches, key=lambda assistant: getattr(assistant, "created_at", 0) or 0, reverse=True)
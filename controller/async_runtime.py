@@ -0,0 +1,50 @@
+import asyncio
+import logging
+import threading
+import contextvars
+from typing import Any, Awaitable, Optional
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+
+# One event loop for the whole process, running in a daemon thread. Streamlit reruns the script on
+# every interaction, and `asyncio.run` would create (and close) a new loop each time, which breaks
+# AsyncOpenAI clients whose connection pools are bound to the loop they were first used on.
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_loop_lock = threading.Lock()
+
+def get_event_loop() -> asyncio.AbstractEventLoop:
+    """
+    Returns the shared background event loop, starting it on first use.
+
+    Returns:
+    - The running event loop shared by every Streamlit session in the process.
+    """
+    global _loop
+    with _loop_lock:
+        if _loop is None or _loop.is_closed():
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name="controller-event-loop", daemon=True).start()
+            logging.info("Started shared asyncio event loop.")
+        return _loop
+
+def run_async(coroutine: Awaitable[Any], timeout: Optional[float] = None) -> Any:
+    """
+    Runs a coroutine on the shared event loop and blocks until it finishes.
+
+    Parameters:
+    - coroutine: The coroutine to run.
+    - timeout: Optional maximum number of seconds to wait for the result.
+
+    Returns:
+    - The coroutine's result (exceptions raised by the coroutine are re-raised).
+    """
+    # The loop's thread does not see the caller's context variables (e.g., the current span and usage scope)
+    caller_context = contextvars.copy_context()
+
+    async def run_in_caller_context():
+        for variable, value in caller_context.items():
+            variable.set(value)
+        return await coroutine
+
+    return asyncio.run_coroutine_threadsafe(run_in_caller_context(), get_event_loop()).result(timeout)
@@ -0,0 +1,179 @@
+import io
+import json
+import time
+import hashlib
+import logging
+from typing import Any, Dict, List, Optional
+
+from controller.input_guardrail import ASSISTANT_INSTRUCTIONS
+from controller.risk_cache import get_cached_risk_assessment, store_risk_assessment
+
+from view.format_response import detect_risk_level
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+
+# Batch API endpoint and completion window used for RiskGuard backfills
+BATCH_ENDPOINT = "/v1/chat/completions"
+BATCH_COMPLETION_WINDOW = "24h"
+# Statuses after which a batch will not change anymore
+TERMINAL_BATCH_STATUSES = ("completed", "failed", "expired", "cancelled")
+# Seconds between two polls of a batch
+BATCH_POLL_INTERVAL = 30.0
+
+def get_custom_id(description: str) -> str:
+    """
+    Derives the batch request ID of a description.
+
+    Parameters:
+    - description: The module description to assess.
+
+    Returns:
+    - str: A stable ID, identical for identical descriptions.
+    """
+    return "risk-" + hashlib.sha256(description.encode("utf-8")).hexdigest()[:32]
+
+def build_batch_requests(descriptions: List[str], model: str) -> List[Dict[str, Any]]:
+    """
+    Turns descriptions into Batch API requests that use the RiskGuard instructions as system prompt.
+
+    Parameters:
+    - descriptions: The module descriptions to assess; duplicates are sent once.
+    - model: The model used by the RiskGuard assistant.
+
+    Returns:
+    - List of request dicts, one per unique description.
+    """
+    requests = {}
+    for description in descriptions:
+        requests[get_custom_id(description)] = {
+            "custom_id": get_custom_id(description),
+            "method": "POST",
+            "url": BATCH_ENDPOINT,
+            "body": {
+                "model": model,
+                # Same sampling settings as the RiskGuard assistant
+                "temperature": 0,
+                "top_p": 0.5,
+                "messages": [
+                    {"role": "system", "content": ASSISTANT_INSTRUCTIONS},
+                    {"role": "user", "content": description},
+                ],
+            },
+        }
+    return list(requests.values())
+
+def submit_risk_batch(api_client: Any, descriptions: List[str], model: str) -> Any:
+    """
+    Uploads the request file of the descriptions and creates a batch for it.
+
+    Parameters:
+    - api_client: The API client object for interacting with the OpenAI service.
+    - descriptions: The module descriptions to assess.
+    - model: The model used by the RiskGuard assistant.
+
+    Returns:
+    - The created batch object.
+    """
+    requests = build_batch_requests(descriptions, model)
+    request_file = io.BytesIO("".join(json.dumps(request) + "\n" for request in requests).encode("utf-8"))
+    input_file = api_client.files.create(file=("riskguard_batch.jsonl", request_file), purpose="batch")
+
+    batch = api_client.batches.create(
+        input_file_id=input_file.id,
+        endpoint=BATCH_ENDPOINT,
+        completion_window=BATCH_COMPLETION_WINDOW,
+        metadata={"purpose": "riskguard-backfill"}
+    )
+    logging.info(f"Submitted batch {batch.id} with {len(requests)} risk assessments.")
+    return batch
+
+def wait_for_batch(api_client: Any, batch_id: str, poll_interval: float = BATCH_POLL_INTERVAL, timeout: Optional[float] = None) -> Any:
+    """
+    Polls a batch until it reaches a terminal status.
+
+    Parameters:
+    - api_client: The API client object for interacting with the OpenAI service.
+    - batch_id: The ID of the batch.
+    - poll_interval: Seconds between two polls.
+    - timeout: Optional maximum number of seconds to wait before raising TimeoutError.
+
+    Returns:
+    - The batch object in its terminal status.
+    """
+    deadline = time.monotonic() + timeout if timeout else None
+    while True:
+        batch = api_client.batches.retrieve(batch_id)
+        if batch.status in TERMINAL_BATCH_STATUSES:
+            logging.info(f"Batch {batch_id} ended with status '{batch.status}' ({batch.request_counts}).")
+            return batch
+
+        if deadline and time.monotonic() + poll_interval > deadline:
+            raise TimeoutError(f"Batch {batch_id} did not finish within {timeout} seconds (last status: {batch.status}).")
+        time.sleep(poll_interval)
+
+def parse_batch_results(api_client: Any, batch: Any) -> Dict[str, Dict[str, Any]]:
+    """
+    Downloads and parses the output of a finished batch.
+
+    Parameters:
+    - api_client: The API client object for interacting with the OpenAI service.
+    - batch: The batch object in its terminal status.
+
+    Returns:
+    - Dict of custom ID to {'response', 'risk_level'} for successful requests, or {'error'} for failed ones.
+    """
+    results = {}
+    if batch.output_file_id:
+        for line in api_client.files.content(batch.output_file_id).text.splitlines():
+            if not line.strip():
+                continue
+            result = json.loads(line)
+            response = result.get("response") or {}
+            if result.get("error") or response.get("status_code") != 200:
+                results[result["custom_id"]] = {"error": result.get("error") or response.get("body")}
+                continue
+            response_text = response["body"]["choices"][0]["message"]["content"].strip()
+            results[result["custom_id"]] = {"response": response_text, "risk_level": detect_risk_level(response_text)}
+
+    if batch.error_file_id:
+        for line in api_client.files.content(batch.error_file_id).text.splitlines():
+            if line.strip():
+                result = json.loads(line)
+                results[result["custom_id"]] = {"error": result.get("error") or (result.get("response") or {}).get("body")}
+    return results
+
+def run_risk_batch(
+    api_client: Any, descriptions: List[str], model: str, poll_interval: float = BATCH_POLL_INTERVAL, timeout: Optional[float] = None
+) -> Dict[str, Dict[str, Any]]:
+    """
+    Assesses the descriptions that are not cached yet in one batch and stores the results in the risk cache.
+
+    Parameters:
+    - api_client: The API client object for interacting with the OpenAI service.
+    - descriptions: The module descriptions to assess.
+    - model: The model used by the RiskGuard assistant.
+    - poll_interval: Seconds between two polls of the batch.
+    - timeout: Optional maximum number of seconds to wait for the batch.
+
+    Returns:
+    - Dict of description to its result ({'response', 'risk_level'} or {'error'}) for the submitted descriptions.
+    """
+    pending = [description for description in dict.fromkeys(descriptions) if not get_cached_risk_assessment(description, model)]
+    logging.info(f"{len(pending)} of {len(set(descriptions))} descriptions need a risk assessment.")
+    if not pending:
+        return {}
+
+    batch = wait_for_batch(api_client, submit_risk_batch(api_client, pending, model).id, poll_interval, timeout)
+    results_by_id = parse_batch_results(api_client, batch)
+
+    results = {}
+    for description in pending:
+        result = results_by_id.get(get_custom_id(description), {"error": f"No result in batch {batch.id} (status '{batch.status}')."})
+        if "response" in result:
+            # The batch has no file_search tool, so its assessments carry no citations
+            store_risk_assessment(description, model, result["response"], [])
+        else:
+            logging.error(f"Risk assessment of description {get_custom_id(description)} failed: {result['error']}")
+        results[description] = result
+    return results
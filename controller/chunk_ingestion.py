@@ -0,0 +1,247 @@
+import os
+import json
+import hashlib
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterable, List, Optional
+
+from controller.file import MAX_UPLOAD_CONCURRENCY, attach_file_to_vector_store, compute_file_sha256, delete_file_by_id, get_all_files_from_vector_store, get_file_name_index
+from controller.local_retrieval import extract_pdf_pages
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+
+# Local record of which chunk files make up each document in each vector store
+CHUNK_MANIFEST_PATH = os.path.join(".cache", "chunk_manifest.json")
+# Sessions starting together wait for the first sync instead of each extracting and uploading every document
+_sync_lock = threading.Lock()
+
+# Content-defined chunk sizes in bytes; boundaries depend on content, so an edit only moves nearby boundaries
+MIN_CHUNK_SIZE = 4 * 1024
+AVERAGE_CHUNK_SIZE = 16 * 1024
+MAX_CHUNK_SIZE = 64 * 1024
+
+# Gear table for the rolling hash, derived deterministically so boundaries are stable across runs
+_GEAR = [int.from_bytes(hashlib.sha256(bytes([value])).digest()[:8], "big") for value in range(256)]
+_HASH_MASK = (1 << 64) - 1
+_BOUNDARY_MASK = (1 << (AVERAGE_CHUNK_SIZE.bit_length() - 1)) - 1
+
+def content_defined_chunks(
+    data: bytes, min_size: int = MIN_CHUNK_SIZE, max_size: int = MAX_CHUNK_SIZE, boundary_mask: int = _BOUNDARY_MASK
+) -> List[bytes]:
+    """
+    Splits data into chunks whose boundaries are chosen by a rolling gear hash of the content.
+
+    Parameters:
+    - data: The bytes to split.
+    - min_size: Minimum chunk size; no boundary is considered before it.
+    - max_size: Maximum chunk size; a boundary is forced at it.
+    - boundary_mask: A boundary is placed where the rolling hash has all of these bits cleared.
+
+    Returns:
+    - List of chunks that concatenate back to `data`.
+    """
+    chunks = []
+    start = 0
+    length = len(data)
+    while start < length:
+        end = min(start + max_size, length)
+        rolling_hash = 0
+        position = start + min_size
+        # Warm the rolling hash on the bytes just before the first allowed boundary
+        for byte in data[max(start, position - 64):min(position, end)]:
+            rolling_hash = ((rolling_hash << 1) + _GEAR[byte]) & _HASH_MASK
+        cut = end
+        while position < end:
+            rolling_hash = ((rolling_hash << 1) + _GEAR[data[position]]) & _HASH_MASK
+            position += 1
+            if not rolling_hash & boundary_mask:
+                cut = position
+                break
+        chunks.append(data[start:cut])
+        start = cut
+    return chunks
+
+def load_chunk_manifest(
+    api_client: Any, vector_store_id: str, manifest_path: str = CHUNK_MANIFEST_PATH, local_documents: Iterable[str] = ()
+) -> Dict[str, Any]:
+    """
+    Loads the chunk manifest of a vector store, rebuilding it from the file attributes if it is missing locally.
+
+    Parameters:
+    - api_client: The api_client object for interacting with OpenAI.
+    - vector_store_id: The ID of the vector store.
+    - manifest_path: The path of the local manifest file.
+    - local_documents: Names of the local PDFs; whole-document uploads without attributes are recognized by them.
+
+    Returns:
+    - Dict of document name to {'sha256': document hash, 'chunks': {chunk hash: file ID}, 'legacy_file_ids': [...]}.
+    """
+    if os.path.exists(manifest_path):
+        with open(manifest_path, "r", encoding="utf-8") as file:
+            manifests = json.load(file)
+        if vector_store_id in manifests:
+            return manifests[vector_store_id]
+
+    # Rebuild from the attributes stored on the vector store files
+    manifest: Dict[str, Any] = {}
+    local_documents = set(local_documents)
+    file_names = None
+    for file in get_all_files_from_vector_store(api_client, vector_store_id):
+        attributes = file.attributes or {}
+        if "chunk_sha256" in attributes:
+            entry = manifest.setdefault(attributes["document"], {"sha256": None, "chunks": {}, "legacy_file_ids": []})
+            entry["chunks"][attributes["chunk_sha256"]] = file.id
+            continue
+
+        # Whole-document upload made by upload_pdfs_to_vector_store, which older versions made without attributes
+        document = attributes.get("filename")
+        if document is None and local_documents:
+            if file_names is None:
+                file_names = get_file_name_index(api_client)
+            document = file_names.get(file.id)
+        if document in local_documents or "filename" in attributes:
+            entry = manifest.setdefault(document, {"sha256": None, "chunks": {}, "legacy_file_ids": []})
+            entry["legacy_file_ids"].append(file.id)
+    logging.info(f"Rebuilt chunk manifest for vector store {vector_store_id} with {len(manifest)} documents.")
+    return manifest
+
+def save_chunk_manifest(vector_store_id: str, manifest: Dict[str, Any], manifest_path: str = CHUNK_MANIFEST_PATH) -> None:
+    """
+    Persists the chunk manifest of a vector store.
+
+    Parameters:
+    - vector_store_id: The ID of the vector store.
+    - manifest: The manifest returned by `load_chunk_manifest` and updated by the sync.
+    - manifest_path: The path of the local manifest file.
+    """
+    manifests = {}
+    if os.path.exists(manifest_path):
+        with open(manifest_path, "r", encoding="utf-8") as file:
+            manifests = json.load(file)
+    manifests[vector_store_id] = manifest
+
+    os.makedirs(os.path.dirname(manifest_path) or ".", exist_ok=True)
+    # One temporary file per process, so app servers sharing the working directory never rename each other's
+    temporary_path = f"{manifest_path}.{os.getpid()}.tmp"
+    with open(temporary_path, "w", encoding="utf-8") as file:
+        json.dump(manifests, file, indent=2)
+    os.replace(temporary_path, manifest_path)
+
+def _upload_chunk(api_client: Any, vector_store_id: str, document: str, chunk_hash: str, chunk: bytes) -> Optional[str]:
+    # Uploads a chunk and attaches it with its attributes; chunks that fail to index are deleted and retried on the next sync
+    file_name = f"{os.path.splitext(document)[0]} [part {chunk_hash[:8]}].txt"
+    try:
+        uploaded_file = api_client.files.create(file=(file_name, chunk), purpose="assistants")
+    except Exception as error:
+        logging.error(f"Error uploading chunk {chunk_hash[:8]} of {document}: {error}")
+        return None
+    if not attach_file_to_vector_store(api_client, vector_store_id, uploaded_file.id, {"document": document, "chunk_sha256": chunk_hash}):
+        delete_file_by_id(api_client, uploaded_file.id)
+        return None
+    return uploaded_file.id
+
+def sync_pdf_chunks_to_vector_store(
+    api_client: Any, vector_store_id: str, directory_path: str, manifest_path: str = CHUNK_MANIFEST_PATH
+) -> Dict[str, Dict[str, int]]:
+    """
+    Synchronizes the PDFs of a directory with a vector store at chunk granularity.
+
+    Each document's text is split with content-defined chunking. Only chunks whose hash is not in the manifest
+    are uploaded (as separate text files), chunks that disappeared are deleted and unchanged chunks stay in place.
+    A document's stale chunks are deleted only after all of its new chunks are indexed, so file search never
+    sees a document with parts missing; if some fail, the stale chunks stay until the next sync replaces them.
+
+    Parameters:
+    - api_client: The api_client object for interacting with OpenAI.
+    - vector_store_id: The ID of the vector store.
+    - directory_path: The local directory path containing PDF files.
+    - manifest_path: The path of the local manifest file.
+
+    Returns:
+    - Diff report: dict of document name to counts of 'added', 'removed', 'unchanged' chunks and 'uploaded_bytes'.
+    """
+    with _sync_lock:
+        return _sync_pdf_chunks(api_client, vector_store_id, directory_path, manifest_path)
+
+def _sync_pdf_chunks(api_client: Any, vector_store_id: str, directory_path: str, manifest_path: str) -> Dict[str, Dict[str, int]]:
+    local_documents = sorted(file for file in os.listdir(directory_path) if file.lower().endswith(".pdf"))
+    manifest = load_chunk_manifest(api_client, vector_store_id, manifest_path, local_documents)
+    report: Dict[str, Dict[str, int]] = {}
+    uploads: List[Any] = []
+    deletions: List[str] = []
+    # Per document, the chunk files to delete once its new chunks are indexed
+    stale: Dict[str, Dict[str, Any]] = {}
+
+    for document in local_documents:
+        document_path = os.path.join(directory_path, document)
+        document_hash = compute_file_sha256(document_path)
+        entry = manifest.get(document, {"sha256": None, "chunks": {}, "legacy_file_ids": []})
+        if entry["sha256"] == document_hash:
+            continue
+
+        text = "\n\n".join(extract_pdf_pages(document_path)).encode("utf-8")
+        chunks = {hashlib.sha256(chunk).hexdigest(): chunk for chunk in content_defined_chunks(text)}
+        added = [chunk_hash for chunk_hash in chunks if chunk_hash not in entry["chunks"]]
+        removed = [chunk_hash for chunk_hash in entry["chunks"] if chunk_hash not in chunks]
+
+        uploads.extend((document, chunk_hash, chunks[chunk_hash]) for chunk_hash in added)
+        stale[document] = {
+            "chunks": {chunk_hash: entry["chunks"][chunk_hash] for chunk_hash in removed},
+            "legacy_file_ids": entry.get("legacy_file_ids", []),
+        }
+        manifest[document] = {
+            "sha256": document_hash,
+            "chunks": {chunk_hash: file_id for chunk_hash, file_id in entry["chunks"].items() if chunk_hash in chunks},
+            "legacy_file_ids": [],
+        }
+        report[document] = {
+            "added": len(added),
+            "removed": len(removed),
+            "unchanged": len(chunks) - len(added),
+            "uploaded_bytes": sum(len(chunks[chunk_hash]) for chunk_hash in added),
+        }
+
+    # Documents that were removed from the directory
+    for document in [document for document in manifest if document not in local_documents]:
+        entry = manifest.pop(document)
+        deletions.extend(entry["chunks"].values())
+        deletions.extend(entry.get("legacy_file_ids", []))
+        report[document] = {"added": 0, "removed": len(entry["chunks"]), "unchanged": 0, "uploaded_bytes": 0}
+
+    if not uploads and not deletions and not stale:
+        logging.info("All document chunks in the vector store are up to date.")
+        save_chunk_manifest(vector_store_id, manifest, manifest_path)
+        return report
+
+    with ThreadPoolExecutor(max_workers=MAX_UPLOAD_CONCURRENCY) as executor:
+        # New chunks are uploaded and indexed before any stale chunk is deleted
+        file_ids = list(executor.map(lambda upload: _upload_chunk(api_client, vector_store_id, *upload), uploads))
+
+        failed_documents = set()
+        for (document, chunk_hash, _), file_id in zip(uploads, file_ids):
+            if file_id:
+                manifest[document]["chunks"][chunk_hash] = file_id
+            else:
+                # Forget the document hash so the failed chunks are retried on the next sync
+                manifest[document]["sha256"] = None
+                failed_documents.add(document)
+
+        for document, stale_entry in stale.items():
+            if document in failed_documents:
+                # Keep serving the old chunks; the next sync deletes them once the document is complete
+                manifest[document]["chunks"].update(stale_entry["chunks"])
+                manifest[document]["legacy_file_ids"].extend(stale_entry["legacy_file_ids"])
+            else:
+                deletions.extend(stale_entry["chunks"].values())
+                deletions.extend(stale_entry["legacy_file_ids"])
+        list(executor.map(lambda file_id: delete_file_by_id(api_client, file_id), deletions))
+    save_chunk_manifest(vector_store_id, manifest, manifest_path)
+
+    for document, changes in report.items():
+        logging.info(
+            f"{document}: {changes['added']} chunks added, {changes['removed']} removed, "
+            f"{changes['unchanged']} unchanged ({changes['uploaded_bytes']} bytes uploaded)."
+        )
+    return report
@@ -0,0 +1,163 @@
+import time
+import logging
+import threading
+from typing import Any, Dict, Optional
+
+import httpx
+from openai import OpenAI, AsyncOpenAI
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+
+# Pool and timeout settings for our request pattern: many short polling and list calls from a few sessions
+CLIENT_POOL_SETTINGS = {
+    "max_connections": 32,
+    "max_keepalive_connections": 16,
+    # Keep idle connections long enough to survive the pause between two Streamlit reruns
+    "keepalive_expiry": 120.0,
+    "connect_timeout": 5.0,
+    "read_timeout": 60.0,
+    "write_timeout": 30.0,
+    "pool_timeout": 10.0,
+    # Needs the optional 'h2' package; falls back to HTTP/1.1 without it
+    "http2": True,
+}
+
+class ConnectionMetrics:
+    """
+    Counts requests, new connections and TLS handshakes of a client from httpcore trace events.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.connections = 0
+        self.tls_handshakes = 0
+        self.handshake_seconds = 0.0
+        self._started: Dict[Any, float] = {}
+
+    def _record(self, event_name: str) -> None:
+        now = time.perf_counter()
+        with self.lock:
+            # Emitted once per request by both the HTTP/1.1 and HTTP/2 connections
+            if event_name.endswith(".send_request_headers.started"):
+                self.requests += 1
+            elif event_name in ("connection.connect_tcp.started", "connection.start_tls.started"):
+                self._started[(threading.get_ident(), event_name)] = now
+            elif event_name in ("connection.connect_tcp.complete", "connection.start_tls.complete"):
+                started = self._started.pop((threading.get_ident(), event_name.replace(".complete", ".started")), now)
+                self.handshake_seconds += now - started
+                if event_name == "connection.connect_tcp.complete":
+                    self.connections += 1
+                else:
+                    self.tls_handshakes += 1
+
+    def trace(self, event_name: str, info: Dict[str, Any]) -> None:
+        self._record(event_name)
+
+    async def async_trace(self, event_name: str, info: Dict[str, Any]) -> None:
+        self._record(event_name)
+
+    def snapshot(self) -> Dict[str, float]:
+        """
+        Returns the current metrics.
+
+        Returns:
+        - Dict with 'requests', 'connections', 'reused_requests', 'reuse_ratio', 'tls_handshakes' and
+          'handshake_seconds'.
+        """
+        with self.lock:
+            reused_requests = max(self.requests - self.connections, 0)
+            return {
+                "requests": self.requests,
+                "connections": self.connections,
+                "reused_requests": reused_requests,
+                "reuse_ratio": reused_requests / self.requests if self.requests else 0.0,
+                "tls_handshakes": self.tls_handshakes,
+                "handshake_seconds": round(self.handshake_seconds, 4),
+            }
+
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+def create_http_client(pool_settings: Optional[Dict[str, Any]] = None, metrics: Optional[ConnectionMetrics] = None, async_client: bool = False) -> Any:
+    """
+    Creates the httpx client used by an OpenAI client.
+
+    Parameters:
+    - pool_settings: Pool and timeout settings; defaults to CLIENT_POOL_SETTINGS.
+    - metrics: Optional metrics collector attached to every request through the httpcore trace extension.
+    - async_client: Whether to create an `httpx.AsyncClient` instead of an `httpx.Client`.
+
+    Returns:
+    - The httpx client.
+    """
+    settings = {**CLIENT_POOL_SETTINGS, **(pool_settings or {})}
+    http2 = settings["http2"] and _http2_available()
+    if settings["http2"] and not http2:
+        logging.info("HTTP/2 requested but the 'h2' package is not installed; using HTTP/1.1.")
+
+    client_kwargs = {
+        "limits": httpx.Limits(
+            max_connections=settings["max_connections"],
+            max_keepalive_connections=settings["max_keepalive_connections"],
+            keepalive_expiry=settings["keepalive_expiry"],
+        ),
+        "timeout": httpx.Timeout(
+            connect=settings["connect_timeout"],
+            read=settings["read_timeout"],
+            write=settings["write_timeout"],
+            pool=settings["pool_timeout"],
+        ),
+        "http2": http2,
+        "follow_redirects": True,
+    }
+
+    if async_client:
+        if metrics:
+            async def add_async_trace(request):
+                request.extensions["trace"] = metrics.async_trace
+            client_kwargs["event_hooks"] = {"request": [add_async_trace]}
+        return httpx.AsyncClient(**client_kwargs)
+
+    if metrics:
+        def add_trace(request):
+            request.extensions["trace"] = metrics.trace
+        client_kwargs["event_hooks"] = {"request": [add_trace]}
+    return httpx.Client(**client_kwargs)
+
+def create_openai_client(
+    api_key: Optional[str],
+    base_url: Optional[str] = None,
+    async_client: bool = False,
+    pool_settings: Optional[Dict[str, Any]] = None,
+    metrics: Optional[ConnectionMetrics] = None,
+    **client_kwargs: Any
+) -> Any:
+    """
+    Creates an OpenAI (or AsyncOpenAI) client on a tuned connection pool.
+
+    Create it once per process and share it: every new client opens new connections and handshakes.
+
+    Parameters:
+    - api_key: The OpenAI API key.
+    - base_url: Optional alternative API base URL (e.g., the local mock server).
+    - async_client: Whether to create an `AsyncOpenAI` client.
+    - pool_settings: Overrides of CLIENT_POOL_SETTINGS.
+    - metrics: Optional metrics collector for connection reuse and handshakes.
+    - client_kwargs: Additional keyword arguments of the OpenAI client (e.g., default_headers, max_retries).
+
+    Returns:
+    - The OpenAI or AsyncOpenAI client.
+    """
+    client_class = AsyncOpenAI if async_client else OpenAI
+    return client_class(
+        api_key=api_key,
+        base_url=base_url,
+        http_client=create_http_client(pool_settings, metrics, async_client),
+        **client_kwargs
+    )
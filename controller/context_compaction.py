@@ -0,0 +1,92 @@
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Callable, List, Optional, Tuple
+
+from controller.context_manager import count_tokens
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+
+# Default maximum size of the conversation context before the oldest turns are summarized
+CONTEXT_TOKEN_BUDGET = 6000
+# Maximum number of summaries kept in memory
+SUMMARY_CACHE_MAX_ENTRIES = 256
+
+SUMMARY_PROMPT = (
+    "Summarize the following multi-agent discussion in a concise paragraph. Keep every decision, open issue, "
+    "risk and reference to the EU AI Act or other source documents. DO NOT GIVE ANY CODE IN YOUR RESPONSE.\n\n"
+)
+
+# Process-wide summary cache shared by every Streamlit session: hash of the folded turns -> summary
+_summary_lock = threading.Lock()
+_summaries: "OrderedDict[str, str]" = OrderedDict()
+
+def _get_cached_summary(folded_text: str, summarize: Callable[[str], str]) -> str:
+    key = hashlib.sha256(folded_text.encode("utf-8")).hexdigest()
+    with _summary_lock:
+        if key in _summaries:
+            _summaries.move_to_end(key)
+            logging.info("Conversation summary served from cache.")
+            return _summaries[key]
+
+    summary = summarize(SUMMARY_PROMPT + folded_text)
+
+    with _summary_lock:
+        _summaries[key] = summary
+        while len(_summaries) > SUMMARY_CACHE_MAX_ENTRIES:
+            _summaries.popitem(last=False)
+    return summary
+
+def compact_conversation(
+    conversation_history: List[str],
+    speakers: List[Optional[str]],
+    summarize: Callable[[str], str],
+    token_budget: int = CONTEXT_TOKEN_BUDGET,
+    model: str = "gpt-4o-mini"
+) -> Optional[Tuple[List[str], List[Optional[str]]]]:
+    """
+    Folds the oldest turns into a summary once the conversation exceeds its token budget.
+
+    The first entry (the project description) and the latest turn of every agent are kept verbatim.
+
+    Parameters:
+    - conversation_history: The list of conversation entries, starting with the project description.
+    - speakers: The agent name of each entry (None for entries not written by an agent).
+    - summarize: Callable producing a summary for a prompt; only called when no cached summary exists.
+    - token_budget: Maximum number of tokens the conversation may use before it is compacted.
+    - model: The model whose tokenizer is used for counting.
+
+    Returns:
+    - Tuple of the compacted history and its speakers, or None if the conversation fits the budget.
+    """
+    token_count = count_tokens(" ".join(conversation_history), model)
+    if token_count <= token_budget:
+        return None
+
+    latest_turns = {speaker: index for index, speaker in enumerate(speakers) if speaker is not None}
+    kept_indices = {0} | set(latest_turns.values())
+    folded_indices = [index for index in range(len(conversation_history)) if index not in kept_indices]
+    if not folded_indices:
+        logging.warning(f"Conversation uses {token_count} tokens but has no older turns left to summarize.")
+        return None
+
+    folded_text = "\n\n".join(
+        f"{speakers[index]}: {conversation_history[index]}" if speakers[index] else conversation_history[index]
+        for index in folded_indices
+    )
+    summary = _get_cached_summary(folded_text, summarize)
+
+    # Keep the summary where the folded turns were, followed by the verbatim latest turns in their original order
+    compacted_history = [conversation_history[0], f"Summary of the earlier discussion: {summary}"]
+    compacted_speakers = [speakers[0], None]
+    for index in sorted(kept_indices - {0}):
+        compacted_history.append(conversation_history[index])
+        compacted_speakers.append(speakers[index])
+
+    logging.info(
+        f"Compacted conversation from {token_count} to {count_tokens(' '.join(compacted_history), model)} tokens "
+        f"by summarizing {len(folded_indices)} turns."
+    )
+    return compacted_history, compacted_speakers
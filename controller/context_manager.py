@@ -0,0 +1,93 @@
+import logging
+from typing import Dict, List, Set, Tuple
+
+try:
+    import tiktoken
+except ImportError:  # Token counts fall back to an estimate without tiktoken
+    tiktoken = None
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+
+# Rough characters-per-token ratio for English text, used when tiktoken is unavailable
+CHARS_PER_TOKEN = 4
+
+_encodings = {}
+
+def count_tokens(text: str, model: str = "gpt-4o-mini") -> int:
+    """
+    Counts the tokens of a text locally.
+
+    Parameters:
+    - text: The text to count.
+    - model: The model whose tokenizer should be used.
+
+    Returns:
+    - int: The exact token count with tiktoken installed, an estimate otherwise.
+    """
+    if not text:
+        return 0
+    if tiktoken is None:
+        return max(1, len(text) // CHARS_PER_TOKEN)
+
+    if model not in _encodings:
+        try:
+            _encodings[model] = tiktoken.encoding_for_model(model)
+        except KeyError:
+            _encodings[model] = tiktoken.get_encoding("o200k_base")
+    return len(_encodings[model].encode(text))
+
+def build_context_delta(
+    conversation_history: List[str], context_state: Dict[str, Set[int]], thread_id: str, model: str = "gpt-4o-mini"
+) -> Tuple[str, Dict[str, int]]:
+    """
+    Returns only the conversation entries a thread has not seen yet and marks them as seen.
+
+    Parameters:
+    - conversation_history: The list of conversation entries (project description and responses).
+    - context_state: Dict of thread ID to the indices of the entries that thread already contains.
+    - thread_id: The ID of the thread the next message will be posted to.
+    - model: The model whose tokenizer is used for the token counts.
+
+    Returns:
+    - Tuple of the text to post (empty if the thread is up to date) and a dict with 'delta_tokens',
+      'full_context_tokens' (what re-sending the whole history would cost) and 'saved_tokens'.
+    """
+    seen = context_state.setdefault(thread_id, set())
+    unseen_indices = [index for index in range(len(conversation_history)) if index not in seen]
+    delta = " ".join(conversation_history[index] for index in unseen_indices)
+    seen.update(unseen_indices)
+
+    delta_tokens = count_tokens(delta, model)
+    full_context_tokens = count_tokens(" ".join(conversation_history), model)
+    token_counts = {
+        "delta_tokens": delta_tokens,
+        "full_context_tokens": full_context_tokens,
+        "saved_tokens": full_context_tokens - delta_tokens,
+    }
+    return delta, token_counts
+
+def mark_context_seen(context_state: Dict[str, Set[int]], thread_id: str, index: int) -> None:
+    """
+    Records that a thread already contains a conversation entry (e.g., a response its run produced).
+
+    Parameters:
+    - context_state: Dict of thread ID to the indices of the entries that thread already contains.
+    - thread_id: The ID of the thread.
+    - index: The index of the entry in the conversation history.
+    """
+    context_state.setdefault(thread_id, set()).add(index)
+
+def log_turn_tokens(agent_name: str, round_number: int, token_counts: Dict[str, int]) -> None:
+    """
+    Logs the input tokens sent for one agent turn.
+
+    Parameters:
+    - agent_name: The name of the agent taking the turn.
+    - round_number: The 1-based round number.
+    - token_counts: The token counts returned by `build_context_delta`.
+    """
+    logging.info(
+        f"Round {round_number}, {agent_name}: sent {token_counts['delta_tokens']} input tokens "
+        f"instead of {token_counts['full_context_tokens']} (saved {token_counts['saved_tokens']})."
+    )
@@ -0,0 +1,438 @@
+import logging
+import contextvars
+from contextlib import nullcontext
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, ContextManager, Dict, List, Optional, Tuple
+
+from controller.context_manager import build_context_delta, mark_context_seen, log_turn_tokens
+from controller.context_compaction import compact_conversation, CONTEXT_TOKEN_BUDGET
+from controller.conversation_store import start_or_resume_conversation, record_turn, complete_conversation
+from controller.local_retrieval import load_local_index, search_local_index, format_passages_for_context
+from controller.response_text_file import Transcript
+from controller.run_completion import execute_run, RunNotCompletedError
+from controller.run_step_profiler import profile_run_steps, record_run_profile
+from controller.thread_reader import fetch_new_messages
+from controller.tracing import get_tracer
+from controller.token_usage import record_run_usage, usage_scope, get_usage_summary, ECONOMY_RUN_PARAMS
+
+from view.format_response import extract_response_with_citations
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+
+# Directory of the PDF data sources
+PDFS_DIR = "./pdf_data_sources"
+# Maximum number of agents answering concurrently in parallel rounds
+MAX_PARALLEL_AGENTS = 4
+# What a conversation does when its next turns would exceed its token budget
+BUDGET_ACTIONS = ("stop", "economy")
+# Share of the token budget after which the "economy" action switches to the cheaper run parameters
+ECONOMY_SWITCH_SHARE = 0.75
+
+def create_conversation_thread(api_client: Any, vector_store_id: str) -> Any:
+    """
+    Creates a thread with access to the vector store for the agents' conversation.
+
+    Parameters:
+    - api_client: The API client object for interacting with the OpenAI service.
+    - vector_store_id: The ID of the vector store used by file_search.
+
+    Returns:
+    - The created thread object.
+    """
+    thread_message = {
+        "tool_resources": {
+            "file_search": {
+                "vector_store_ids": [vector_store_id]
+            }
+        }
+    }
+    return api_client.beta.threads.create(**thread_message)
+
+def retrieve_local_context(query: str, pdf_dir: str = PDFS_DIR) -> Tuple[str, List[str]]:
+    """
+    Retrieves the passages most relevant to a query from the local index over the PDF data sources.
+
+    Parameters:
+    - query: The text to find supporting passages for.
+    - pdf_dir: The directory containing the PDF data sources.
+
+    Returns:
+    - Tuple of the passages formatted for the agent's context and their page-level citations.
+    """
+    passages = search_local_index(load_local_index(pdf_dir), query)
+    return format_passages_for_context(passages)
+
+def generate_agent_response(
+    api_client: Any,
+    agent: Any,
+    context: str,
+    thread: Any,
+    is_unacceptable_risk: bool = False,
+    on_text_delta: Optional[Callable[[str], None]] = None,
+    retrieval_query: Optional[str] = None,
+    step_profile_labels: Optional[Dict[str, Any]] = None,
+    run_overrides: Optional[Dict[str, Any]] = None
+) -> Tuple[str, List[str]]:
+    """
+    Posts new context to a thread, runs an agent on it and extracts the response.
+
+    Parameters:
+    - api_client: The API client object for interacting with the OpenAI service.
+    - agent: The agent dict (with 'id'), or the assistant object if `is_unacceptable_risk` is set.
+    - context: The text to post before the run; nothing is posted if empty.
+    - thread: The thread object to run on.
+    - is_unacceptable_risk: Whether `agent` is an assistant object rather than an agent dict.
+    - on_text_delta: Optional callback receiving text deltas as they are generated.
+    - retrieval_query: Optional query for the local index; if given, its passages replace the file_search tool.
+    - step_profile_labels: Optional 'round_number' and 'prompt' of the turn; if given, the run's steps are
+      profiled and recorded (one extra API call).
+    - run_overrides: Optional run parameters overriding the defaults (e.g., ECONOMY_RUN_PARAMS).
+
+    Returns:
+    - Tuple of the response text and its citations.
+    """
+    # Add a message to the thread
+    message_multiagent = {
+        "role": "user",
+        "content": [
+            {
+                "type": "text",
+                "text": context
+            }
+        ]
+    }
+
+    agent_name = agent.name if is_unacceptable_risk else agent.get('name')
+    with get_tracer().span("agent turn", kind="turn", agent=agent_name, thread_id=thread.id):
+        # Ground the turn with passages from the local index instead of the hosted file_search tool
+        local_citations = []
+        if retrieval_query:
+            local_context, local_citations = retrieve_local_context(retrieval_query)
+            context = f"{context}\n\n{local_context}".strip()
+            message_multiagent["content"][0]["text"] = context
+
+        # The thread may already contain everything the agent needs; only post new context
+        if context:
+            api_client.beta.threads.messages.create(thread_id=thread.id, **message_multiagent)
+
+        if is_unacceptable_risk:
+            agent_id = agent.id
+        else:
+            agent_id = agent['id']
+
+        # Run the agent and return as soon as the run reaches a terminal status
+        run_params = {"tools": []} if retrieval_query else {}
+        run_params.update(run_overrides or {})
+        try:
+            run, _ = execute_run(api_client, thread.id, agent_id, on_text_delta=on_text_delta, **run_params)
+        except RunNotCompletedError as error:
+            # Unfinished runs are billed too
+            record_run_usage(error.run, agent_name)
+            raise
+        record_run_usage(run, agent_name)
+
+        # Attribute the run's server-side time to tool calls versus generation; profiling never fails the turn
+        if step_profile_labels is not None:
+            try:
+                record_run_profile(profile_run_steps(api_client, thread.id, run.id), agent_name, **step_profile_labels)
+            except Exception as error:
+                logging.error(f"Error profiling the steps of run {run.id}: {error}")
+
+        # Fetch only the messages this run added to the thread
+        response_messages = fetch_new_messages(api_client, thread.id, run_id=run.id)
+        response, citations = extract_response_with_citations(api_client, response_messages)
+
+        return response, local_citations + citations
+
+def summarize_conversation(api_client: Any, conversation_history: str, summary_agent: Dict[str, str], thread: Any) -> str:
+    """
+    Generates a summary of the conversation history using the specified agent.
+
+    Parameters:
+    - api_client: The API client object for interacting with the OpenAI service.
+    - conversation_history: The current conversation history to be summarized.
+    - summary_agent: The agent responsible for summarization.
+    - thread: The thread object for communication.
+
+    Returns:
+    - A summarized text of the conversation.
+    """
+    response, _ = generate_agent_response(api_client, summary_agent, conversation_history, thread)
+    return response.strip()
+
+def generate_parallel_responses(
+    api_client: Any,
+    agents: List[Dict[str, str]],
+    conversation_history: List[str],
+    agent_threads: Dict[str, Any],
+    context_state: Dict[str, Any],
+    round_number: int,
+    vector_store_id: str,
+    model: str,
+    retrieval_query: Optional[str] = None,
+    on_response: Optional[Callable[[Dict[str, str], Any, str, List[str]], None]] = None,
+    step_profile_labels: Optional[Dict[str, Any]] = None,
+    run_overrides: Optional[Dict[str, Any]] = None
+) -> List[Tuple[str, List[str]]]:
+    """
+    Generates the responses of several agents concurrently, each on its own thread.
+
+    Parameters:
+    - api_client: The API client object for interacting with the OpenAI service.
+    - agents: The agents to answer, in the order their responses should be returned.
+    - conversation_history: The conversation entries so far; each thread only receives the ones it has not seen.
+    - agent_threads: Dict of agent ID to thread object, extended with new threads as needed.
+    - context_state: Dict of thread ID to the indices of the conversation entries each thread contains.
+    - round_number: The 1-based round number, used for token reporting.
+    - vector_store_id: The ID of the vector store attached to new threads.
+    - model: The model whose tokenizer is used for token reporting.
+    - retrieval_query: Optional query for the local index; if given, its passages replace the file_search tool.
+    - on_response: Optional callable(agent, thread, response, citations) invoked as soon as each agent has answered.
+    - step_profile_labels: Optional labels of the turns; if given, the runs' steps are profiled (see `generate_agent_response`).
+    - run_overrides: Optional run parameters overriding the defaults (e.g., ECONOMY_RUN_PARAMS).
+
+    Returns:
+    - List of (response, citations) tuples in the same order as `agents`.
+    """
+    contexts = []
+    for agent in agents:
+        if agent['id'] not in agent_threads:
+            agent_threads[agent['id']] = create_conversation_thread(api_client, vector_store_id)
+        context, token_counts = build_context_delta(conversation_history, context_state, agent_threads[agent['id']].id, model)
+        log_turn_tokens(agent['name'], round_number, token_counts)
+        contexts.append(context)
+
+    def respond(agent, context):
+        response, citations = generate_agent_response(
+            api_client, agent, context, agent_threads[agent['id']], retrieval_query=retrieval_query,
+            step_profile_labels=step_profile_labels, run_overrides=run_overrides
+        )
+        if on_response:
+            on_response(agent, agent_threads[agent['id']], response, citations)
+        return response, citations
+
+    # Worker threads start with an empty context; carry the caller's span over so the turns nest under its round
+    caller_contexts = [contextvars.copy_context() for _ in agents]
+    with ThreadPoolExecutor(max_workers=MAX_PARALLEL_AGENTS) as executor:
+        # map() yields results in submission order, so the merge order is deterministic
+        return list(executor.map(lambda caller_context, agent, context: caller_context.run(respond, agent, context), caller_contexts, agents, contexts))
+
+def run_conversation(
+    api_client: Any,
+    project_description: str,
+    agents: List[Dict[str, str]],
+    rounds: int,
+    ai_ethicist_id: str,
+    vector_store_id: str,
+    model: str,
+    transcript: Optional[Transcript] = None,
+    parallel_rounds: bool = False,
+    context_token_budget: int = CONTEXT_TOKEN_BUDGET,
+    local_retrieval: bool = False,
+    profile_run_steps: bool = False,
+    token_budget: Optional[int] = None,
+    budget_action: str = "stop",
+    resume_scope: Optional[str] = None,
+    on_round_start: Optional[Callable[[int], None]] = None,
+    on_turn_start: Optional[Callable[[Dict[str, str]], Optional[Callable[[str], None]]]] = None,
+    on_turn_complete: Optional[Callable[[Dict[str, str], str, List[str]], None]] = None,
+    on_compacted: Optional[Callable[[int], None]] = None,
+    on_budget_reached: Optional[Callable[[str, int, int], None]] = None,
+    parallel_wait: Callable[[List[Dict[str, str]]], ContextManager] = lambda agents: nullcontext()
+) -> Transcript:
+    """
+    Runs a multi-round conversation among agents, without any user interface.
+
+    Every completed turn is checkpointed, so an interrupted conversation resumes from its last completed turn.
+    A conversation stopped by its token budget is left unfinished, so it can be resumed the same way; the budget
+    counts the tokens of every attempt.
+
+    Parameters:
+    - api_client: The API client object for interacting with the OpenAI service.
+    - project_description: Initial project description to start the conversation.
+    - agents: The agent dicts ('id', 'name', 'role') in speaking order; the AI Ethicist should be last.
+    - rounds: Number of conversation rounds to run.
+    - ai_ethicist_id: The ID of the AI Ethicist, which also writes the conversation summaries.
+    - vector_store_id: The ID of the vector store attached to the conversation threads.
+    - model: The model whose tokenizer is used for token budgets.
+    - transcript: The transcript the rounds and responses are appended to; a new one is created if None.
+    - parallel_rounds: Whether all agents except the AI Ethicist answer each round concurrently.
+    - context_token_budget: Token count above which the oldest turns are folded into a summary.
+    - local_retrieval: Whether to ground turns with passages from the local index instead of file_search.
+    - profile_run_steps: Whether to profile the run steps of every turn (see `controller.run_step_profiler`).
+    - token_budget: Optional maximum number of tokens the conversation's runs may use; before each turn (or batch
+      of parallel turns) the usage is projected with the largest run so far and the conversation stops rather
+      than exceed it.
+    - budget_action: 'stop' to only stop at the budget, or 'economy' to first switch to ECONOMY_RUN_PARAMS once
+      the projected usage passes ECONOMY_SWITCH_SHARE of the budget.
+    - resume_scope: Optional owner of the conversation (e.g., a session or batch item ID); only unfinished
+      conversations of the same owner are resumed.
+    - on_round_start: Optional callable(round_number) invoked at the start of each 1-based round.
+    - on_turn_start: Optional callable(agent) invoked before each turn; may return a text delta callback.
+    - on_turn_complete: Optional callable(agent, response, citations) invoked after each turn.
+    - on_compacted: Optional callable(token_budget) invoked when older turns were summarized.
+    - on_budget_reached: Optional callable(action, used_tokens, token_budget) invoked when the conversation
+      switches to economy mode ('economy') or stops ('stop') because of its token budget.
+    - parallel_wait: Callable(agents) returning a context manager held while parallel agents are answering.
+
+    Returns:
+    - Transcript: The transcript with every round and response appended.
+    """
+    if budget_action not in BUDGET_ACTIONS:
+        raise ValueError(f"Unknown budget action '{budget_action}'; use one of {BUDGET_ACTIONS}.")
+    if transcript is None:
+        transcript = Transcript(project_description, agents)
+
+    conversation_history = [project_description]
+    # Agent name of each conversation entry, used to keep every agent's latest turn when compacting
+    conversation_speakers = [None]
+    summary_agent = {"id": ai_ethicist_id, "name": "AI Ethicist"}
+
+    # Turns completed by an earlier, interrupted attempt are replayed instead of run again
+    conversation_id, completed_turns = start_or_resume_conversation(project_description, [agent['id'] for agent in agents], resume_scope)
+
+    with get_tracer().span("conversation", kind="conversation", rounds=rounds, agents=len(agents), parallel_rounds=parallel_rounds), usage_scope(conversation_id=conversation_id) as conversation_usage:
+        # A resumed conversation's budget also covers the tokens its earlier attempts spent
+        if token_budget is not None:
+            conversation_usage.add_previous_usage(get_usage_summary((), conversation_id=conversation_id)[0])
+        # Create thread
+        thread_multiagent = create_conversation_thread(api_client, vector_store_id)
+        # Per-agent threads used in parallel rounds
+        agent_threads = {}
+        # Conversation entries each thread already contains, so only new ones are sent
+        context_state = {}
+        # Run parameters overriding the defaults once the conversation switched to economy mode
+        run_overrides = None
+        economy_started_at_run = 0
+
+        def checkpoint_turn(round_number, agent, thread, response, citations):
+            record_turn(conversation_id, round_number, agent['id'], agent['name'], thread.id, response, citations)
+
+        def complete_turn(agent, response, citations):
+            conversation_history.append(response)
+            conversation_speakers.append(agent['name'])
+            transcript.append(agent['name'] + ": " + response)
+            if on_turn_complete:
+                on_turn_complete(agent, response, citations)
+
+        def projected_tokens(turns):
+            # Turns are projected at the size of the largest run so far, or of the latest run once economy runs
+            # (which do not grow with tool results) have been measured
+            run_tokens = conversation_usage.max_run_tokens
+            if run_overrides and conversation_usage.runs > economy_started_at_run:
+                run_tokens = conversation_usage.last_run_tokens
+            return conversation_usage.total_tokens + run_tokens * turns
+
+        def within_token_budget(turns):
+            # Switches to economy mode or stops before the next turns would exceed the token budget
+            nonlocal run_overrides, economy_started_at_run
+            if token_budget is None:
+                return True
+            if budget_action == "economy" and not run_overrides and projected_tokens(turns) > token_budget * ECONOMY_SWITCH_SHARE:
+                logging.info(f"Switching to economy mode after {conversation_usage.total_tokens} of {token_budget} tokens.")
+                run_overrides, economy_started_at_run = ECONOMY_RUN_PARAMS, conversation_usage.runs
+                if on_budget_reached:
+                    on_budget_reached("economy", conversation_usage.total_tokens, token_budget)
+            if projected_tokens(turns) > token_budget:
+                logging.warning(f"Stopping the conversation: {turns} more turns would use about {projected_tokens(turns)} of {token_budget} tokens.")
+                if on_budget_reached:
+                    on_budget_reached("stop", conversation_usage.total_tokens, token_budget)
+                return False
+            return True
+
+        budget_exhausted = False
+        for round_number in range(1, rounds + 1):
+            with get_tracer().span("round", kind="round", round_number=round_number), usage_scope(round_number=round_number):
+                if on_round_start:
+                    on_round_start(round_number)
+                transcript.append("ROUND: " + str(round_number))
+                step_profile_labels = {"round_number": round_number, "prompt": project_description} if profile_run_steps else None
+
+                sequential_agents = agents
+                if parallel_rounds:
+                    # All agents except the AI Ethicist answer the same round context concurrently
+                    parallel_agents = [agent for agent in agents if agent['id'] != ai_ethicist_id]
+                    sequential_agents = [agent for agent in agents if agent['id'] == ai_ethicist_id]
+
+                    pending_agents = [agent for agent in parallel_agents if (round_number, agent['id']) not in completed_turns]
+                    parallel_responses = {}
+                    if pending_agents and not within_token_budget(len(pending_agents)):
+                        budget_exhausted = True
+                        break
+                    if pending_agents:
+                        with parallel_wait(pending_agents):
+                            responses = generate_parallel_responses(
+                                api_client, pending_agents, conversation_history, agent_threads, context_state, round_number,
+                                vector_store_id, model,
+                                retrieval_query=conversation_history[-1] if local_retrieval else None,
+                                on_response=lambda agent, thread, response, citations: checkpoint_turn(round_number, agent, thread, response, citations),
+                                step_profile_labels=step_profile_labels, run_overrides=run_overrides
+                            )
+                        parallel_responses = {agent['id']: response for agent, response in zip(pending_agents, responses)}
+
+                    for agent in parallel_agents:
+                        if on_turn_start:
+                            on_turn_start(agent)
+                        if agent['id'] in parallel_responses:
+                            response, citations = parallel_responses[agent['id']]
+                            mark_context_seen(context_state, agent_threads[agent['id']].id, len(conversation_history))
+                        else:
+                            turn = completed_turns[(round_number, agent['id'])]
+                            response, citations = turn['response'], turn['citations']
+                        complete_turn(agent, response, citations)
+
+                for agent in sequential_agents:
+                    turn = completed_turns.get((round_number, agent['id']))
+                    # Checked before the turn starts, so a stopped conversation never shows an empty turn
+                    if not turn and not within_token_budget(1):
+                        budget_exhausted = True
+                        break
+                    on_text_delta = on_turn_start(agent) if on_turn_start else None
+
+                    if turn:
+                        # Replay the checkpointed turn; the shared thread receives it with the next context delta
+                        complete_turn(agent, turn['response'], turn['citations'])
+                        continue
+
+                    # Only send what the shared thread has not seen yet
+                    context, token_counts = build_context_delta(conversation_history, context_state, thread_multiagent.id, model)
+                    log_turn_tokens(agent['name'], round_number, token_counts)
+
+                    # Generate agent's response using the assistant API, passing partial text to the callback if any
+                    response, citations = generate_agent_response(
+                        api_client, agent, context, thread_multiagent, on_text_delta=on_text_delta,
+                        retrieval_query=conversation_history[-1] if local_retrieval else None,
+                        step_profile_labels=step_profile_labels, run_overrides=run_overrides
+                    )
+                    checkpoint_turn(round_number, agent, thread_multiagent, response, citations)
+
+                    # The run already added the response to the shared thread
+                    mark_context_seen(context_state, thread_multiagent.id, len(conversation_history))
+                    complete_turn(agent, response, citations)
+
+                if budget_exhausted:
+                    break
+
+                # Summarize the oldest turns once the conversation exceeds its token budget
+                compacted = compact_conversation(
+                    conversation_history,
+                    conversation_speakers,
+                    lambda prompt: summarize_conversation(api_client, prompt, summary_agent, create_conversation_thread(api_client, vector_store_id)),
+                    token_budget=context_token_budget,
+                    model=model
+                )
+                if compacted:
+                    conversation_history[:], conversation_speakers[:] = compacted
+
+                    # Continue on fresh threads that only receive the compacted history
+                    thread_multiagent = create_conversation_thread(api_client, vector_store_id)
+                    agent_threads = {}
+                    context_state = {}
+                    if on_compacted:
+                        on_compacted(context_token_budget)
+
+        if not budget_exhausted:
+            complete_conversation(conversation_id)
+
+    return transcript
@@ -0,0 +1,186 @@
+import os
+import json
+import time
+import uuid
+import sqlite3
+import hashlib
+import logging
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+
+# Location of the on-disk conversation checkpoints
+CONVERSATION_STORE_PATH = os.path.join(".cache", "conversations.sqlite3")
+# Unfinished conversations without a new turn for this long are abandoned and not resumed anymore
+RESUME_TTL_SECONDS = 24 * 60 * 60
+
+_store_lock = threading.Lock()
+
+def _connect(store_path: str) -> sqlite3.Connection:
+    os.makedirs(os.path.dirname(store_path) or ".", exist_ok=True)
+    connection = sqlite3.connect(store_path)
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute(
+        """
+        CREATE TABLE IF NOT EXISTS conversations (
+            conversation_id TEXT PRIMARY KEY,
+            conversation_key TEXT NOT NULL,
+            project_description TEXT NOT NULL,
+            status TEXT NOT NULL,
+            created_at REAL NOT NULL,
+            updated_at REAL NOT NULL
+        )
+        """
+    )
+    connection.execute(
+        """
+        CREATE TABLE IF NOT EXISTS turns (
+            conversation_id TEXT NOT NULL,
+            round_number INTEGER NOT NULL,
+            agent_id TEXT NOT NULL,
+            agent_name TEXT NOT NULL,
+            thread_id TEXT NOT NULL,
+            response TEXT NOT NULL,
+            citations TEXT NOT NULL,
+            created_at REAL NOT NULL,
+            PRIMARY KEY (conversation_id, round_number, agent_id)
+        )
+        """
+    )
+    connection.execute("CREATE INDEX IF NOT EXISTS conversations_by_key ON conversations (conversation_key, status)")
+    return connection
+
+def get_conversation_key(project_description: str, agent_ids: List[str], resume_scope: Optional[str] = None) -> str:
+    """
+    Identifies a conversation by its project description, participating agents and resume scope.
+
+    Parameters:
+    - project_description: The module description the agents discuss.
+    - agent_ids: The IDs of the participating agents, in speaking order.
+    - resume_scope: Optional owner of the conversation (e.g., a session or batch item ID); conversations of
+      different owners are never resumed by each other.
+
+    Returns:
+    - str: The hex SHA-256 digest of the scope, description and agent IDs.
+    """
+    normalized_description = " ".join(project_description.split())
+    return hashlib.sha256("\n".join([resume_scope or "", normalized_description, *agent_ids]).encode("utf-8")).hexdigest()
+
+def start_or_resume_conversation(
+    project_description: str,
+    agent_ids: List[str],
+    resume_scope: Optional[str] = None,
+    store_path: str = CONVERSATION_STORE_PATH,
+    resume_ttl: float = RESUME_TTL_SECONDS
+) -> Tuple[str, Dict[Tuple[int, str], Dict[str, Any]]]:
+    """
+    Resumes the latest unfinished conversation with the same description, agents and resume scope, or starts a
+    new one.
+
+    Parameters:
+    - project_description: The module description the agents discuss.
+    - agent_ids: The IDs of the participating agents, in speaking order.
+    - resume_scope: Optional owner of the conversation (e.g., a session or batch item ID), see `get_conversation_key`.
+    - store_path: Path of the SQLite store file.
+    - resume_ttl: Seconds after its last update an unfinished conversation is no longer resumed.
+
+    Returns:
+    - Tuple of the conversation ID and its completed turns, keyed by (1-based round number, agent ID). Each turn is
+      a dict with 'agent_name', 'thread_id', 'response' and 'citations'.
+    """
+    conversation_key = get_conversation_key(project_description, agent_ids, resume_scope)
+    now = time.time()
+    with _store_lock:
+        connection = _connect(store_path)
+        with connection:
+            row = connection.execute(
+                "SELECT conversation_id FROM conversations WHERE conversation_key = ? AND status = 'running' "
+                "AND updated_at >= ? ORDER BY updated_at DESC LIMIT 1",
+                (conversation_key, now - resume_ttl)
+            ).fetchone()
+            if row:
+                conversation_id = row[0]
+                rows = connection.execute(
+                    "SELECT round_number, agent_id, agent_name, thread_id, response, citations FROM turns "
+                    "WHERE conversation_id = ?",
+                    (conversation_id,)
+                ).fetchall()
+            else:
+                conversation_id = uuid.uuid4().hex
+                rows = []
+                connection.execute(
+                    "INSERT INTO conversations VALUES (?, ?, ?, 'running', ?, ?)",
+                    (conversation_id, conversation_key, project_description, now, now)
+                )
+        connection.close()
+
+    turns = {
+        (round_number, agent_id): {
+            "agent_name": agent_name, "thread_id": thread_id, "response": response, "citations": json.loads(citations)
+        }
+        for round_number, agent_id, agent_name, thread_id, response, citations in rows
+    }
+    if turns:
+        logging.info(f"Resuming conversation {conversation_id} with {len(turns)} completed turns.")
+    return conversation_id, turns
+
+def record_turn(
+    conversation_id: str,
+    round_number: int,
+    agent_id: str,
+    agent_name: str,
+    thread_id: str,
+    response: str,
+    citations: List[str],
+    store_path: str = CONVERSATION_STORE_PATH
+) -> None:
+    """
+    Checkpoints a completed agent turn; safe to call from worker threads.
+
+    Parameters:
+    - conversation_id: The ID returned by `start_or_resume_conversation`.
+    - round_number: The 1-based round number.
+    - agent_id: The ID of the agent that answered.
+    - agent_name: The name of the agent that answered.
+    - thread_id: The ID of the thread the run was executed on.
+    - response: The agent's response text.
+    - citations: The citations extracted from the response.
+    - store_path: Path of the SQLite store file.
+    """
+    now = time.time()
+    try:
+        with _store_lock:
+            connection = _connect(store_path)
+            with connection:
+                connection.execute(
+                    "INSERT OR REPLACE INTO turns VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (conversation_id, round_number, agent_id, agent_name, thread_id, response, json.dumps(citations), now)
+                )
+                connection.execute(
+                    "UPDATE conversations SET updated_at = ? WHERE conversation_id = ?", (now, conversation_id)
+                )
+            connection.close()
+    except sqlite3.Error as error:
+        logging.error(f"Error checkpointing turn of {agent_name} in round {round_number}: {error}")
+
+def complete_conversation(conversation_id: str, store_path: str = CONVERSATION_STORE_PATH) -> None:
+    """
+    Marks a conversation as completed so it is no longer resumed.
+
+    Parameters:
+    - conversation_id: The ID returned by `start_or_resume_conversation`.
+    - store_path: Path of the SQLite store file.
+    """
+    try:
+        with _store_lock:
+            connection = _connect(store_path)
+            with connection:
+                connection.execute(
+                    "UPDATE conversations SET status = 'completed', updated_at = ? WHERE conversation_id = ?",
+                    (time.time(), conversation_id)
+                )
+            connection.close()
+    except sqlite3.Error as error:
+        logging.error(f"Error completing conversation {conversation_id}: {error}")
@@ -1,13 +1,31 @@
 import os
+import hashlib
 import logging
-from typing import Any, List, Optional
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 
+# Number of files uploaded in parallel
+MAX_UPLOAD_CONCURRENCY = 4
+# Bytes read at a time when hashing local files
+HASH_BLOCK_SIZE = 1024 * 1024
+# Page sizes used when listing files (API maximums)
+FILE_LIST_PAGE_SIZE = 10000
+VECTOR_STORE_LIST_PAGE_SIZE = 100
+
 def upload_pdfs_to_vector_store(api_client: Any, vector_store_id: str, directory_path: str) -> bool:
     """
-    Uploads PDF files from a specified directory to OpenAI vector store.
+    Synchronizes the PDF files from a specified directory with an OpenAI vector store, one file per PDF.
+
+    Legacy whole-document ingestion, kept for the upload benchmark only: the app and the batch runner ingest
+    the PDFs through `controller.chunk_ingestion.sync_pdf_chunks_to_vector_store`, which also replaces the
+    files this function leaves behind.
+
+    Files whose SHA-256 content hash matches the hash stored in the vector store file attributes are skipped.
+    New or changed files are uploaded and attached concurrently, each with its hash in its attributes, and
+    waited for until indexed. Outdated versions of changed files are deleted.
 
     Parameters:
     - api_client: The api_client object for interacting with OpenAI.
@@ -18,38 +36,55 @@ def upload_pdfs_to_vector_store(api_client: Any, vector_store_id: str, directory
     - bool: True if all files were uploaded successfully, False otherwise.
     """
     try:
-        # Retrieve all existing files in the vector store
-        existing_files = get_all_files_from_vector_store(api_client, vector_store_id)
-        existing_file_names = {
-            get_file_name_by_id(api_client, file.id): file.id
-            for file in existing_files
-            if get_file_by_id_from_vector_store(api_client, vector_store_id, file.id)
+        # Index the existing vector store files by file name in one paginated pass each
+        file_names = get_file_name_index(api_client)
+        existing_files = {
+            file_names[file.id]: file
+            for file in get_all_files_from_vector_store(api_client, vector_store_id)
+            if file.id in file_names
         }
-        
-        # Get all PDF files from the directory
+
+        # Get all PDF files from the directory and find the ones that are new or changed
         file_paths = [os.path.join(directory_path, file) for file in os.listdir(directory_path) if file.lower().endswith(".pdf")]
-        
-        # Upload files
+        changed_files = {}
         for file_path in file_paths:
             file_name = os.path.basename(file_path)
-            
-            # If a file with the same name exists, delete it first
-            if file_name in existing_file_names:
-                try:
-                    delete_file_by_id(api_client, existing_file_names[file_name])
-                    logging.info(f"Deleted existing file: {file_name}")
-                except Exception as delete_error:
-                    logging.error(f"Error deleting file {file_name}: {delete_error}")
-
-            # Upload the new file
-            try:
-                with open(file_path, "rb") as file:
-                    uploaded_file = api_client.beta.vector_stores.files.upload(vector_store_id=vector_store_id, file=file)
-                    logging.info(f"Uploaded file: {file_name} with ID: {uploaded_file.id}")
-            except (FileNotFoundError, PermissionError) as file_error:
-                logging.error(f"Error reading or uploading file {file_name}: {file_error}")
-                continue  # Skip this file and move to the next one
-        
+            file_hash = compute_file_sha256(file_path)
+            existing_file = existing_files.get(file_name)
+            if existing_file and (existing_file.attributes or {}).get("sha256") == file_hash:
+                logging.info(f"Skipping unchanged file: {file_name}")
+                continue
+            changed_files[file_path] = file_hash
+
+        if not changed_files:
+            logging.info("All files in the vector store are up to date.")
+            return True
+
+        with ThreadPoolExecutor(max_workers=MAX_UPLOAD_CONCURRENCY) as executor:
+            # If a file with the same name exists, delete the outdated version first
+            outdated_file_ids = [
+                existing_files[os.path.basename(file_path)].id
+                for file_path in changed_files
+                if os.path.basename(file_path) in existing_files
+            ]
+            list(executor.map(lambda file_id: delete_file_by_id(api_client, file_id), outdated_file_ids))
+
+            # Upload and attach the new or changed files concurrently; the content hash is stored with each file
+            # so unchanged files are skipped next time, and files that fail to index are uploaded again
+            indexed_file_ids = {
+                file_id for file_id in executor.map(
+                    lambda item: upload_and_attach_file(
+                        api_client, vector_store_id, item[0], {"sha256": item[1], "filename": os.path.basename(item[0])}
+                    ),
+                    changed_files.items()
+                )
+                if file_id
+            }
+
+        if len(indexed_file_ids) != len(changed_files):
+            logging.error("Some files could not be uploaded or indexed.")
+            return False
+
         logging.info("All files have been uploaded successfully.")
         return True
 
@@ -59,93 +94,141 @@ def upload_pdfs_to_vector_store(api_client: Any, vector_store_id: str, directory
 
 # Helper Functions
 
-def get_all_files_from_vector_store(api_client: Any, vector_store_id: str) -> List[Any]:
+def compute_file_sha256(file_path: str) -> str:
     """
-    Retrieves all files from the specified vector store.
+    Computes the SHA-256 hash of a local file's content.
 
     Parameters:
-    - api_client: The api_client object for interacting with OpenAI.
-    - vector_store_id: The ID of the vector store from which files are to be retrieved.
+    - file_path: The path of the file to hash.
 
     Returns:
-    - List of file objects retrieved from the vector store. Returns an empty list if an error occurs.
+    - str: The hex digest of the file content.
     """
-    try:
-        # Retrieve files from the vector store
-        file_list = api_client.beta.vector_stores.files.list(vector_store_id=vector_store_id)
+    sha256 = hashlib.sha256()
+    with open(file_path, "rb") as file:
+        for block in iter(lambda: file.read(HASH_BLOCK_SIZE), b""):
+            sha256.update(block)
+    return sha256.hexdigest()
 
-        # Log the number of files retrieved
-        file_count = len(file_list.data) if file_list.data else 0
-        if file_count > 0:
-            logging.info(f"Retrieved {file_count} files from vector store with ID: {vector_store_id}.")
-        else:
-            logging.info(f"No files found in vector store with ID: {vector_store_id}.")
+def upload_file(api_client: Any, file_path: str) -> Optional[str]:
+    """
+    Uploads a local file to OpenAI for use by assistants.
 
-        # Return the list of files or an empty list if none exist
-        return file_list.data or []
+    Parameters:
+    - api_client: The api_client object for interacting with OpenAI.
+    - file_path: The path of the file to upload.
 
-    except (ConnectionError, ValueError) as error:
-        logging.error(f"Error retrieving files from vector store {vector_store_id}: {error}")
-        return []
-    
-def get_file_name_by_id(api_client: Any, file_id: str) -> Optional[str]:
+    Returns:
+    - str: The ID of the uploaded file, None if the upload failed.
+    """
+    file_name = os.path.basename(file_path)
+    try:
+        with open(file_path, "rb") as file:
+            uploaded_file = api_client.files.create(file=file, purpose="assistants")
+        logging.info(f"Uploaded file: {file_name} with ID: {uploaded_file.id}")
+        return uploaded_file.id
+    except (FileNotFoundError, PermissionError) as file_error:
+        logging.error(f"Error reading or uploading file {file_name}: {file_error}")
+    except Exception as error:
+        logging.error(f"Unexpected error while uploading file {file_name}: {error}")
+    return None
+
+def attach_file_to_vector_store(api_client: Any, vector_store_id: str, file_id: str, attributes: Dict[str, Any]) -> bool:
     """
-    Retrieves the file name corresponding to a given file ID.
+    Attaches an uploaded file to a vector store together with its attributes and waits until it is indexed.
 
     Parameters:
     - api_client: The api_client object for interacting with OpenAI.
-    - file_id: The ID of the file whose name is to be retrieved.
+    - vector_store_id: The ID of the vector store.
+    - file_id: The ID of the uploaded file.
+    - attributes: The attributes stored with the vector store file (e.g., content hashes).
 
     Returns:
-    - str: The filename if found, None otherwise.
+    - bool: True if the file was indexed, False otherwise.
     """
     try:
-        # Retrieve the list of files
-        files = api_client.files.list()
+        vector_store_file = api_client.vector_stores.files.create(vector_store_id=vector_store_id, file_id=file_id, attributes=attributes)
+        if vector_store_file.status == "in_progress":
+            vector_store_file = api_client.vector_stores.files.poll(file_id, vector_store_id=vector_store_id)
+        if vector_store_file.status != "completed":
+            logging.error(f"File {file_id} could not be indexed (status '{vector_store_file.status}').")
+        return vector_store_file.status == "completed"
+    except Exception as error:
+        logging.error(f"Error attaching file {file_id} to vector store {vector_store_id}: {error}")
+        return False
 
-        # Find the file with the matching ID
-        file_name = next((file.filename for file in files.data if file.id == file_id), None)
+def upload_and_attach_file(api_client: Any, vector_store_id: str, file_path: str, attributes: Dict[str, Any]) -> Optional[str]:
+    """
+    Uploads a local file and attaches it to a vector store with its attributes (see `attach_file_to_vector_store`).
 
-        if file_name:
-            logging.info(f"Retrieved file name: {file_name} for ID: {file_id}.")
-        else:
-            logging.warning(f"No file found with ID: {file_id}.")
-            
-        return file_name
+    A file that was uploaded but could not be indexed is deleted again.
 
-    except (AttributeError, ConnectionError) as error:
-        logging.error(f"Error retrieving file name with ID {file_id}: {error}")
+    Parameters:
+    - api_client: The api_client object for interacting with OpenAI.
+    - vector_store_id: The ID of the vector store.
+    - file_path: The path of the file to upload.
+    - attributes: The attributes stored with the vector store file.
+
+    Returns:
+    - str: The ID of the indexed file, None if the upload or the indexing failed.
+    """
+    file_id = upload_file(api_client, file_path)
+    if file_id is None:
         return None
-    
-def get_file_by_id_from_vector_store(api_client: Any, vector_store_id: str, file_id: str) -> Optional[Any]:
+    if not attach_file_to_vector_store(api_client, vector_store_id, file_id, attributes):
+        delete_file_by_id(api_client, file_id)
+        return None
+    return file_id
+
+def get_file_name_index(api_client: Any) -> Dict[str, str]:
     """
-    Retrieves a file from a specified vector store using the given file ID.
+    Builds an index of all uploaded assistant files from file ID to file name.
 
     Parameters:
     - api_client: The api_client object for interacting with OpenAI.
-    - vector_store_id: The ID of the vector store to search within.
-    - file_id: The ID of the file to be retrieved.
 
     Returns:
-    - The file object if found, None otherwise.
+    - Dict mapping file IDs to file names. Returns an empty dict if an error occurs.
     """
     try:
-        # Retrieve the list of files from the specified vector store
-        files = api_client.beta.vector_stores.files.list(vector_store_id=vector_store_id)
+        # Iterating the page object follows the pagination cursor through every page
+        files = api_client.files.list(purpose="assistants", limit=FILE_LIST_PAGE_SIZE)
+        file_names = {file.id: file.filename for file in files}
+        logging.info(f"Indexed {len(file_names)} uploaded files.")
+        return file_names
+
+    except (AttributeError, ConnectionError) as error:
+        logging.error(f"Error indexing uploaded files: {error}")
+        return {}
+
+def get_all_files_from_vector_store(api_client: Any, vector_store_id: str) -> List[Any]:
+    """
+    Retrieves all files from the specified vector store.
+
+    Parameters:
+    - api_client: The api_client object for interacting with OpenAI.
+    - vector_store_id: The ID of the vector store from which files are to be retrieved.
 
-        # Use a generator expression to find the matching file by ID
-        file = next((file for file in files.data if file.id == file_id), None)
+    Returns:
+    - List of file objects retrieved from the vector store. Returns an empty list if an error occurs.
+    """
+    try:
+        # Retrieve files from the vector store, following the pagination cursor through every page
+        file_list = list(api_client.vector_stores.files.list(vector_store_id=vector_store_id, limit=VECTOR_STORE_LIST_PAGE_SIZE))
 
-        if file:
-            logging.info(f"Retrieved file with ID: {file.id} from vector store with ID: {vector_store_id}.")
+        # Log the number of files retrieved
+        file_count = len(file_list)
+        if file_count > 0:
+            logging.info(f"Retrieved {file_count} files from vector store with ID: {vector_store_id}.")
         else:
-            logging.warning(f"No file found with ID: {file_id} in vector store with ID: {vector_store_id}.")
-        
-        return file
+            logging.info(f"No files found in vector store with ID: {vector_store_id}.")
 
-    except (AttributeError, ConnectionError) as error:
-        logging.error(f"Error retrieving file with ID {file_id} from vector store {vector_store_id}: {error}")
-        return None
+        # Return the list of files or an empty list if none exist
+        return file_list
+
+    except (ConnectionError, ValueError) as error:
+        logging.error(f"Error retrieving files from vector store {vector_store_id}: {error}")
+        return []
     
 def delete_file_by_id(api_client: Any, file_id: str) -> bool:
     """
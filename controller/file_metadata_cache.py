@@ -0,0 +1,122 @@
+import time
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from controller.file import get_all_files_from_vector_store, get_file_name_index
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+
+# Maximum number of file names kept in memory
+FILE_CACHE_MAX_ENTRIES = 1024
+# Seconds a cached file name stays valid
+FILE_CACHE_TTL_SECONDS = 3600
+
+# Process-wide LRU cache shared by every Streamlit session: file ID -> (file name, expiry time)
+_cache_lock = threading.Lock()
+_file_names: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+_cache_stats = {"hits": 0, "misses": 0, "evictions": 0, "prefetched": 0}
+_prefetched_stores: Dict[str, float] = {}
+
+def _store_file_name(file_id: str, file_name: str) -> None:
+    with _cache_lock:
+        _file_names[file_id] = (file_name, time.monotonic() + FILE_CACHE_TTL_SECONDS)
+        _file_names.move_to_end(file_id)
+        while len(_file_names) > FILE_CACHE_MAX_ENTRIES:
+            _file_names.popitem(last=False)
+            _cache_stats["evictions"] += 1
+
+def get_cached_file_name(api_client: Any, file_id: str) -> Optional[str]:
+    """
+    Returns the file name for a file ID, retrieving it from the API only on a cache miss.
+
+    Parameters:
+    - api_client: The API client object for interacting with the file service.
+    - file_id: The ID of the file.
+
+    Returns:
+    - str: The file name, None if it could not be retrieved.
+    """
+    with _cache_lock:
+        entry = _file_names.get(file_id)
+        if entry and entry[1] > time.monotonic():
+            _file_names.move_to_end(file_id)
+            _cache_stats["hits"] += 1
+            return entry[0]
+        _cache_stats["misses"] += 1
+        expired_stores = [vector_store_id for vector_store_id, expiry in _prefetched_stores.items() if expiry <= time.monotonic()]
+
+    # Refresh expired prefetches first, so chunk files keep resolving to their source document's name
+    for vector_store_id in expired_stores:
+        prefetch_vector_store_file_names(api_client, vector_store_id)
+    with _cache_lock:
+        entry = _file_names.get(file_id)
+        if entry and entry[1] > time.monotonic():
+            return entry[0]
+
+    try:
+        file_name = api_client.files.retrieve(file_id).filename
+    except Exception as error:
+        logging.error(f"Error retrieving file with ID {file_id}: {error}")
+        return None
+
+    _store_file_name(file_id, file_name)
+    return file_name
+
+def prefetch_vector_store_file_names(api_client: Any, vector_store_id: str) -> int:
+    """
+    Loads the names of all files in a vector store into the cache, at most once per TTL.
+
+    A file's source document name from its attributes (see `controller.chunk_ingestion`) takes precedence over
+    the name it was uploaded with.
+
+    Parameters:
+    - api_client: The API client object for interacting with the file service.
+    - vector_store_id: The ID of the vector store whose files are cited by the agents.
+
+    Returns:
+    - int: The number of file names cached by this call (0 if the prefetch was still fresh).
+    """
+    with _cache_lock:
+        if _prefetched_stores.get(vector_store_id, 0.0) > time.monotonic():
+            return 0
+        _prefetched_stores[vector_store_id] = time.monotonic() + FILE_CACHE_TTL_SECONDS
+
+    file_names = None
+    prefetched = 0
+    for file in get_all_files_from_vector_store(api_client, vector_store_id):
+        # Chunks of a PDF are cited by the PDF's name, not by the name of their upload
+        attributes = file.attributes or {}
+        file_name = attributes.get("document") or attributes.get("filename")
+        if file_name is None:
+            if file_names is None:
+                file_names = get_file_name_index(api_client)
+            file_name = file_names.get(file.id)
+        if file_name:
+            _store_file_name(file.id, file_name)
+            prefetched += 1
+
+    with _cache_lock:
+        _cache_stats["prefetched"] += prefetched
+    logging.info(f"Prefetched {prefetched} file names from vector store with ID: {vector_store_id}.")
+    return prefetched
+
+def get_file_cache_stats() -> Dict[str, int]:
+    """
+    Returns the hit/miss counters of the file metadata cache.
+
+    Returns:
+    - Dict with 'hits', 'misses', 'evictions', 'prefetched' and the current 'size'.
+    """
+    with _cache_lock:
+        return {**_cache_stats, "size": len(_file_names)}
+
+def clear_file_cache() -> None:
+    """
+    Empties the file metadata cache and forgets previous prefetches.
+    """
+    with _cache_lock:
+        _file_names.clear()
+        _prefetched_stores.clear()
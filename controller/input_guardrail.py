@@ -1,6 +1,10 @@
-import asyncio
 import logging
-from typing import Any, Tuple, List, Optional
+from typing import Any, List, Optional
+
+from controller.assistant_registry import find_assistants, register_assistant
+from controller.run_completion import async_execute_run, RunNotCompletedError
+from controller.thread_reader import async_fetch_new_messages
+from controller.token_usage import record_run_usage
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -108,28 +112,22 @@ Only respond using the following structured format:
 """.format(UNACCEPTABLE_RISK_CRITERIA, HIGH_RISK_CRITERIA, LIMITED_RISK_CRITERIA, MINIMAL_RISK_CRITERIA)
 
 
-def initialize_risk_guard(api_client: Any, vector_store: Any, model: str) -> Tuple[Any, Any]:
+def get_risk_guard_assistant(api_client: Any, model: str) -> Optional[Any]:
     """
-    Initializes the RiskGuard assistant and creates a new thread.
+    Retrieves the RiskGuard assistant, creating it if it does not exist yet.
 
     Parameters:
     - api_client: Client object to interact with the API.
-    - vector_store: The vector store to be used by the assistant (optional).
     - model: The model to be used by the assistant (e.g., gpt-4).
 
     Returns:
-    - Tuple containing the created assistant and thread objects, or (None, None) if an error occurs.
+    - The RiskGuard assistant object, or None if an error occurs.
     """
     try:
-        # Create a new thread for the assistant
-        thread = api_client.beta.threads.create()
-
         # Check if an assistant named "RiskGuardAI" already exists
-        assistants = api_client.beta.assistants.list()
-        for assistant in assistants.data:
-            if assistant.name == "RiskGuardAI":
-                logging.info(f"RiskGuard assistant already exists with ID: {assistant.id}")
-                return assistant, thread
+        for assistant in find_assistants(api_client, "RiskGuardAI"):
+            logging.info(f"RiskGuard assistant already exists with ID: {assistant.id}")
+            return assistant
 
         # If no assistant named "RiskGuardAI" exists, create a new one
         assistant = api_client.beta.assistants.create(
@@ -142,31 +140,35 @@ def initialize_risk_guard(api_client: Any, vector_store: Any, model: str) -> Tup
             # tools=[{"type": "file_search"}],
             # tool_resources={"file_search": {"vector_store_ids": [vector_store.id]}]
         )
+        register_assistant(assistant)
         logging.info(f"Initialized RiskGuard assistant with ID: {assistant.id}")
-        return assistant, thread
+        return assistant
 
     except Exception as e:
         logging.error(f"Error initializing RiskGuard assistant: {e}")
-        return None, None
+        return None
 
 async def topical_guardrail_for_risk_assessment(
-    api_client: Any, assistant: Any, thread: Any, project_description: str
+    async_client: Any, assistant: Any, thread: Optional[Any], project_description: str
 ) -> Optional[List[Any]]:
     """
     Performs a risk assessment using the provided assistant and thread context based on the project description.
 
     Parameters:
-    - api_client: The client object to interact with the OpenAI API.
+    - async_client: The asynchronous client object (`AsyncOpenAI`) to interact with the OpenAI API.
     - assistant: The assistant object to conduct the risk assessment.
-    - thread: The thread object where the interaction takes place.
+    - thread: The thread object where the interaction takes place; a new thread is created if None.
     - project_description: The description of the AI project to be assessed.
 
     Returns:
-    - List of messages from the thread if the run completes successfully, None otherwise.
+    - List of messages added by the run (newest first) if it completes successfully, None otherwise.
     """
     try:
+        if thread is None:
+            thread = await async_client.beta.threads.create()
+
         # Send the project description to the assistant
-        api_client.beta.threads.messages.create(
+        await async_client.beta.threads.messages.create(
             thread_id=thread.id,
             role="user",
             content=project_description
@@ -176,20 +178,20 @@ async def topical_guardrail_for_risk_assessment(
         )
 
         # Start the run and wait for it to complete
-        run = api_client.beta.threads.runs.create_and_poll(
-            thread_id=thread.id,
-            assistant_id=assistant.id
-        )
-
-        if run.status == 'completed':
-            # Retrieve and return the messages from the thread
-            messages = api_client.beta.threads.messages.list(thread_id=thread.id)
-            # api_client.files.delete(message_file.id)
-            logging.info(f"Messages from thread {thread.id}: {messages}")
-            return messages
-        else:
-            logging.warning(f"Run status: {run.status}")
+        try:
+            run, _ = await async_execute_run(async_client, thread.id, assistant.id)
+        except RunNotCompletedError as run_error:
+            logging.warning(f"Run status: {run_error.status}")
+            # Unfinished runs are billed too
+            record_run_usage(run_error.run, assistant.name)
             return None
+        record_run_usage(run, assistant.name)
+
+        # Retrieve and return only the messages the run added to the thread
+        messages = await async_fetch_new_messages(async_client, thread.id, run_id=run.id)
+        # api_client.files.delete(message_file.id)
+        logging.info(f"Messages from thread {thread.id}: {messages}")
+        return messages
 
     except Exception as e:
         logging.error(f"Error during AI risk assessment: {e}")
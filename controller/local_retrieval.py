@@ -0,0 +1,266 @@
+import os
+import re
+import json
+import logging
+import threading
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+
+from controller.file import compute_file_sha256
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+
+# Where the index arrays are stored and how the PDFs are split into passages
+LOCAL_INDEX_DIR = os.path.join(".cache", "local_index")
+CHUNK_WORDS = 200
+CHUNK_OVERLAP_WORDS = 40
+# BM25 parameters
+BM25_K1 = 1.2
+BM25_B = 0.75
+# Number of passages injected into an agent's context
+TOP_K_PASSAGES = 5
+
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "has", "have", "in", "is", "it", "its", "of",
+    "on", "or", "that", "the", "their", "this", "to", "was", "were", "which", "with", "shall", "should", "may",
+}
+
+_index_lock = threading.Lock()
+_loaded_indexes: Dict[str, Dict[str, Any]] = {}
+
+def tokenize(text: str) -> List[str]:
+    """
+    Splits a text into lowercase index terms.
+
+    Parameters:
+    - text: The text to tokenize.
+
+    Returns:
+    - List of terms without stopwords.
+    """
+    return [term for term in re.findall(r"[a-z0-9]+", text.lower()) if term not in STOPWORDS and len(term) > 1]
+
+def extract_pdf_pages(pdf_path: str) -> List[str]:
+    """
+    Extracts the text of every page of a PDF file.
+
+    Parameters:
+    - pdf_path: The path of the PDF file.
+
+    Returns:
+    - List of page texts, one entry per page.
+    """
+    from pypdf import PdfReader
+
+    reader = PdfReader(pdf_path)
+    return [page.extract_text() or "" for page in reader.pages]
+
+def chunk_pages(pages: List[str], chunk_words: int = CHUNK_WORDS, overlap_words: int = CHUNK_OVERLAP_WORDS) -> List[Tuple[int, str]]:
+    """
+    Splits page texts into overlapping passages that never cross a page boundary.
+
+    Parameters:
+    - pages: The page texts of a document.
+    - chunk_words: Number of words per passage.
+    - overlap_words: Number of words shared by consecutive passages of a page.
+
+    Returns:
+    - List of (1-based page number, passage text) tuples.
+    """
+    chunks = []
+    step = max(chunk_words - overlap_words, 1)
+    for page_number, page_text in enumerate(pages, start=1):
+        words = page_text.split()
+        for start in range(0, max(len(words) - overlap_words, 1), step):
+            passage = " ".join(words[start:start + chunk_words])
+            if passage:
+                chunks.append((page_number, passage))
+    return chunks
+
+def _source_manifest(pdf_dir: str) -> Dict[str, str]:
+    return {
+        file_name: compute_file_sha256(os.path.join(pdf_dir, file_name))
+        for file_name in sorted(os.listdir(pdf_dir))
+        if file_name.lower().endswith(".pdf")
+    }
+
+def build_local_index(pdf_dir: str, index_dir: str = LOCAL_INDEX_DIR) -> None:
+    """
+    Builds a BM25 index over the PDFs of a directory and stores it as memory-mappable arrays.
+
+    Parameters:
+    - pdf_dir: The directory containing the PDF data sources.
+    - index_dir: The directory the index files are written to.
+    """
+    manifest = _source_manifest(pdf_dir)
+    chunk_documents, chunk_pages_numbers, chunk_texts = [], [], []
+    for document_id, file_name in enumerate(manifest):
+        for page_number, passage in chunk_pages(extract_pdf_pages(os.path.join(pdf_dir, file_name))):
+            chunk_documents.append(document_id)
+            chunk_pages_numbers.append(page_number)
+            chunk_texts.append(passage)
+
+    # Term frequencies per chunk, then postings grouped by term (CSR layout)
+    vocabulary: Dict[str, int] = {}
+    postings: List[Dict[int, int]] = []
+    chunk_lengths = np.zeros(len(chunk_texts), dtype=np.float32)
+    for chunk_id, passage in enumerate(chunk_texts):
+        terms = tokenize(passage)
+        chunk_lengths[chunk_id] = len(terms)
+        for term in terms:
+            term_id = vocabulary.setdefault(term, len(vocabulary))
+            if term_id == len(postings):
+                postings.append({})
+            postings[term_id][chunk_id] = postings[term_id].get(chunk_id, 0) + 1
+
+    offsets = np.zeros(len(postings) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(term_postings) for term_postings in postings])
+    posting_chunks = np.fromiter(
+        (chunk_id for term_postings in postings for chunk_id in term_postings), dtype=np.int32, count=int(offsets[-1])
+    )
+    posting_frequencies = np.fromiter(
+        (frequency for term_postings in postings for frequency in term_postings.values()), dtype=np.float32, count=int(offsets[-1])
+    )
+    document_frequencies = np.diff(offsets).astype(np.float32)
+    idf = np.log(1.0 + (len(chunk_texts) - document_frequencies + 0.5) / (document_frequencies + 0.5)).astype(np.float32)
+
+    # Passage texts are stored as one UTF-8 blob addressed by byte offsets
+    encoded_texts = [passage.encode("utf-8") for passage in chunk_texts]
+    text_offsets = np.zeros(len(encoded_texts) + 1, dtype=np.int64)
+    text_offsets[1:] = np.cumsum([len(encoded) for encoded in encoded_texts])
+
+    os.makedirs(index_dir, exist_ok=True)
+    arrays = {
+        "offsets": offsets,
+        "posting_chunks": posting_chunks,
+        "posting_frequencies": posting_frequencies,
+        "idf": idf,
+        "chunk_lengths": chunk_lengths,
+        "chunk_documents": np.asarray(chunk_documents, dtype=np.int32),
+        "chunk_pages": np.asarray(chunk_pages_numbers, dtype=np.int32),
+        "text_offsets": text_offsets,
+        "text_blob": np.frombuffer(b"".join(encoded_texts), dtype=np.uint8),
+    }
+    for name, array in arrays.items():
+        np.save(os.path.join(index_dir, f"{name}.npy"), array)
+    with open(os.path.join(index_dir, "vocabulary.json"), "w", encoding="utf-8") as file:
+        json.dump(vocabulary, file)
+    # Written last, so an interrupted build is detected as stale
+    with open(os.path.join(index_dir, "manifest.json"), "w", encoding="utf-8") as file:
+        json.dump({"documents": list(manifest), "hashes": manifest}, file)
+
+    logging.info(f"Built local index with {len(chunk_texts)} passages and {len(vocabulary)} terms in {index_dir}.")
+
+def load_local_index(pdf_dir: str, index_dir: str = LOCAL_INDEX_DIR) -> Dict[str, Any]:
+    """
+    Loads the local index (memory-mapped), rebuilding it first if the PDFs changed.
+
+    The loaded index is cached for the whole process. The app and the batch runner load it at startup, so
+    queries only read the cached index.
+
+    Parameters:
+    - pdf_dir: The directory containing the PDF data sources.
+    - index_dir: The directory holding the index files.
+
+    Returns:
+    - Dict with the memory-mapped arrays, the vocabulary, the document names and 'average_length'.
+    """
+    # Queries after startup read the loaded index without taking the lock
+    index = _loaded_indexes.get(index_dir)
+    if index is not None:
+        return index
+
+    with _index_lock:
+        if index_dir in _loaded_indexes:
+            return _loaded_indexes[index_dir]
+
+        manifest_path = os.path.join(index_dir, "manifest.json")
+        manifest = None
+        if os.path.exists(manifest_path):
+            with open(manifest_path, "r", encoding="utf-8") as file:
+                manifest = json.load(file)
+        if manifest is None or manifest["hashes"] != _source_manifest(pdf_dir):
+            build_local_index(pdf_dir, index_dir)
+            with open(manifest_path, "r", encoding="utf-8") as file:
+                manifest = json.load(file)
+
+        index = {
+            name: np.load(os.path.join(index_dir, f"{name}.npy"), mmap_mode="r")
+            for name in ("offsets", "posting_chunks", "posting_frequencies", "idf", "chunk_lengths",
+                         "chunk_documents", "chunk_pages", "text_offsets", "text_blob")
+        }
+        with open(os.path.join(index_dir, "vocabulary.json"), "r", encoding="utf-8") as file:
+            index["vocabulary"] = json.load(file)
+        index["documents"] = manifest["documents"]
+        index["average_length"] = float(index["chunk_lengths"].mean()) if len(index["chunk_lengths"]) else 0.0
+
+        _loaded_indexes[index_dir] = index
+        logging.info(f"Loaded local index with {len(index['chunk_lengths'])} passages from {index_dir}.")
+        return index
+
+def search_local_index(index: Dict[str, Any], query: str, top_k: int = TOP_K_PASSAGES) -> List[Dict[str, Any]]:
+    """
+    Ranks the indexed passages against a query with BM25.
+
+    Parameters:
+    - index: The index returned by `load_local_index`.
+    - query: The query text.
+    - top_k: Number of passages to return.
+
+    Returns:
+    - List of dicts with 'document', 'page', 'text' and 'score', best match first.
+    """
+    chunk_lengths = index["chunk_lengths"]
+    if not len(chunk_lengths):
+        return []
+
+    scores = np.zeros(len(chunk_lengths), dtype=np.float32)
+    length_norm = BM25_K1 * (1.0 - BM25_B + BM25_B * np.asarray(chunk_lengths) / max(index["average_length"], 1.0))
+    for term in set(tokenize(query)):
+        term_id = index["vocabulary"].get(term)
+        if term_id is None:
+            continue
+        start, end = int(index["offsets"][term_id]), int(index["offsets"][term_id + 1])
+        chunk_ids = index["posting_chunks"][start:end]
+        frequencies = index["posting_frequencies"][start:end]
+        # Each chunk appears at most once per term's postings, so fancy-index addition is safe
+        scores[chunk_ids] += index["idf"][term_id] * frequencies * (BM25_K1 + 1.0) / (frequencies + length_norm[chunk_ids])
+
+    top_k = min(top_k, len(scores))
+    best = np.argpartition(-scores, top_k - 1)[:top_k]
+    best = best[np.argsort(-scores[best])]
+
+    results = []
+    for chunk_id in best:
+        if scores[chunk_id] <= 0:
+            break
+        text_start, text_end = int(index["text_offsets"][chunk_id]), int(index["text_offsets"][chunk_id + 1])
+        results.append({
+            "document": index["documents"][int(index["chunk_documents"][chunk_id])],
+            "page": int(index["chunk_pages"][chunk_id]),
+            "text": bytes(index["text_blob"][text_start:text_end]).decode("utf-8"),
+            "score": float(scores[chunk_id]),
+        })
+    return results
+
+def format_passages_for_context(passages: List[Dict[str, Any]]) -> Tuple[str, List[str]]:
+    """
+    Formats retrieved passages for injection into an agent's context.
+
+    Parameters:
+    - passages: The passages returned by `search_local_index`.
+
+    Returns:
+    - Tuple of the context text and the matching citations (e.g., "[0] European Union's AI Act.pdf, p. 12").
+    """
+    if not passages:
+        return "", []
+
+    citations = [f"[{index}] {passage['document']}, p. {passage['page']}" for index, passage in enumerate(passages)]
+    context = "Relevant excerpts from the source documents (cite them by their number):\n" + "\n\n".join(
+        f"[{index}] ({passage['document']}, p. {passage['page']}): {passage['text']}"
+        for index, passage in enumerate(passages)
+    )
+    return context, citations
@@ -0,0 +1,397 @@
+import time
+import random
+import asyncio
+import inspect
+import logging
+import threading
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from controller.context_manager import count_tokens
+from controller.tracing import get_tracer
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+
+# Requests- and tokens-per-minute limits per model; unknown models use the defaults
+MODEL_RATE_LIMITS = {
+    "gpt-4o-mini": {"rpm": 500, "tpm": 200000},
+    "gpt-4o": {"rpm": 500, "tpm": 30000},
+}
+DEFAULT_RATE_LIMITS = {"rpm": 500, "tpm": 30000}
+# Calls that run a model and count against its limits; the others (run polls, listings, messages, files) share
+# the API_BUCKET, so polling never takes requests from the models
+MODEL_CALLS = (
+    "Runs.create", "Runs.stream", "Runs.create_and_poll", "Runs.create_and_stream",
+    "Threads.create_and_run", "Threads.create_and_run_poll", "Threads.create_and_run_stream",
+    "Completions.create", "Embeddings.create", "Responses.create",
+)
+API_BUCKET = "api"
+API_RATE_LIMITS = {"rpm": 3000, "tpm": 0}
+
+# Retries with jittered exponential backoff, unless the server sends Retry-After
+MAX_RETRIES = 6
+BACKOFF_BASE_SECONDS = 0.5
+BACKOFF_MAX_SECONDS = 30.0
+RETRYABLE_STATUS_CODES = (408, 409, 429, 500, 502, 503, 504)
+RETRYABLE_ERROR_NAMES = ("APIConnectionError", "APITimeoutError")
+# Queueing delays above this are logged
+QUEUE_DELAY_LOG_THRESHOLD = 0.5
+
+class TokenBucket:
+    """
+    Thread-safe token bucket using reservations: callers take their tokens immediately and wait out any deficit.
+    """
+
+    def __init__(self, capacity: float, refill_per_second: float):
+        self.capacity = capacity
+        self.refill_per_second = refill_per_second
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+        self.lock = threading.Lock()
+
+    def reserve(self, amount: float) -> float:
+        """
+        Reserves tokens from the bucket.
+
+        Parameters:
+        - amount: The number of tokens to take; amounts above the capacity are capped at the capacity.
+
+        Returns:
+        - float: Seconds the caller has to wait before the reserved tokens are available.
+        """
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.refill_per_second)
+            self.updated_at = now
+            self.tokens -= min(amount, self.capacity)
+            return 0.0 if self.tokens >= 0 else -self.tokens / self.refill_per_second
+
+    def consume(self, amount: float) -> None:
+        """
+        Takes tokens that were used without a reservation (e.g., reported usage); later callers wait for them.
+
+        Parameters:
+        - amount: The number of tokens used.
+        """
+        with self.lock:
+            self.tokens = max(self.tokens - amount, -self.capacity)
+
+class RateLimiter:
+    """
+    Process-wide requests-per-minute and tokens-per-minute buckets per model, shared by every session.
+    """
+
+    def __init__(self, model_limits: Optional[Dict[str, Dict[str, int]]] = None):
+        self.model_limits = model_limits if model_limits is not None else MODEL_RATE_LIMITS
+        self.buckets: Dict[str, Dict[str, TokenBucket]] = {}
+        self.lock = threading.Lock()
+        self.stats = {"requests": 0, "queued_requests": 0, "queue_seconds": 0.0, "max_queue_seconds": 0.0, "retries": 0}
+
+    def _get_buckets(self, model: str) -> Dict[str, TokenBucket]:
+        with self.lock:
+            if model not in self.buckets:
+                limits = API_RATE_LIMITS if model == API_BUCKET else self.model_limits.get(model, DEFAULT_RATE_LIMITS)
+                self.buckets[model] = {
+                    "requests": TokenBucket(limits["rpm"], limits["rpm"] / 60.0),
+                    "tokens": TokenBucket(limits["tpm"], limits["tpm"] / 60.0),
+                }
+            return self.buckets[model]
+
+    def reserve(self, model: str, estimated_tokens: int = 0) -> float:
+        """
+        Reserves one request and the estimated tokens for a model.
+
+        Parameters:
+        - model: The model the request is billed to, or API_BUCKET for calls that do not run a model.
+        - estimated_tokens: The estimated number of tokens of the request.
+
+        Returns:
+        - float: The queueing delay in seconds the caller has to wait before sending the request.
+        """
+        buckets = self._get_buckets(model)
+        delay = max(buckets["requests"].reserve(1), buckets["tokens"].reserve(estimated_tokens))
+        with self.lock:
+            self.stats["requests"] += 1
+            if delay > 0:
+                self.stats["queued_requests"] += 1
+                self.stats["queue_seconds"] += delay
+                self.stats["max_queue_seconds"] = max(self.stats["max_queue_seconds"], delay)
+        if delay > QUEUE_DELAY_LOG_THRESHOLD:
+            logging.info(f"Rate limiter queued a {model} request for {delay:.2f}s.")
+        return delay
+
+    def record_usage(self, model: str, tokens: int) -> None:
+        """
+        Charges tokens reported by the API after a request (e.g., a run's usage) to the model's token bucket.
+
+        Parameters:
+        - model: The model the tokens are billed to.
+        - tokens: The number of tokens used beyond the reserved estimate.
+        """
+        if tokens > 0:
+            self._get_buckets(model)["tokens"].consume(tokens)
+
+    def record_retry(self) -> None:
+        with self.lock:
+            self.stats["retries"] += 1
+
+    def get_stats(self) -> Dict[str, float]:
+        """
+        Returns the queueing statistics of the limiter.
+
+        Returns:
+        - Dict with 'requests', 'queued_requests', 'queue_seconds', 'max_queue_seconds', 'retries' and
+          'average_queue_seconds' (over all requests).
+        """
+        with self.lock:
+            stats = dict(self.stats)
+        stats["average_queue_seconds"] = stats["queue_seconds"] / stats["requests"] if stats["requests"] else 0.0
+        return stats
+
+_rate_limiter = RateLimiter()
+
+def get_rate_limiter() -> RateLimiter:
+    """
+    Returns the limiter shared by the whole process.
+
+    Returns:
+    - RateLimiter: The process-wide limiter.
+    """
+    return _rate_limiter
+
+def is_retryable_error(error: Exception) -> bool:
+    """
+    Tells whether an API error is transient (rate limit, timeout, connection or server error).
+
+    Parameters:
+    - error: The exception raised by the API client.
+
+    Returns:
+    - bool: True if the call should be retried.
+    """
+    return getattr(error, "status_code", None) in RETRYABLE_STATUS_CODES or type(error).__name__ in RETRYABLE_ERROR_NAMES
+
+def get_retry_delay(error: Exception, attempt: int) -> float:
+    """
+    Computes how long to wait before retrying, preferring the server's Retry-After headers.
+
+    Parameters:
+    - error: The exception raised by the API client.
+    - attempt: The 0-based retry attempt.
+
+    Returns:
+    - float: Seconds to wait.
+    """
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    for header, scale in (("retry-after-ms", 0.001), ("retry-after", 1.0)):
+        try:
+            return min(float(headers[header]) * scale, BACKOFF_MAX_SECONDS)
+        except (KeyError, TypeError, ValueError):
+            continue  # Missing, or an HTTP date we do not parse
+    # Full jitter keeps concurrent sessions from retrying in lockstep
+    return random.uniform(0, min(BACKOFF_BASE_SECONDS * 2 ** attempt, BACKOFF_MAX_SECONDS))
+
+def estimate_request_tokens(kwargs: Dict[str, Any], model: str) -> int:
+    """
+    Estimates the input tokens of a request from its text arguments.
+
+    Parameters:
+    - kwargs: The keyword arguments of the API call.
+    - model: The model whose tokenizer is used.
+
+    Returns:
+    - int: The estimated number of tokens.
+    """
+    texts = []
+    for key in ("content", "messages", "instructions", "input"):
+        value = kwargs.get(key)
+        if isinstance(value, str):
+            texts.append(value)
+        elif isinstance(value, list):
+            texts.extend(str(item) for item in value)
+    return count_tokens(" ".join(texts), model)
+
+def _call_name(function: Callable) -> str:
+    # e.g., 'Messages.create' or 'Runs.retrieve'
+    return getattr(function, "__qualname__", None) or str(function)
+
+def _add_queue_time(span: Any, delay: float) -> None:
+    if delay > 0:
+        span.set_attribute("queue_seconds", round(span.attributes.get("queue_seconds", 0.0) + delay, 4))
+
+def _reservation(function: Callable, kwargs: Dict[str, Any], default_model: str) -> Tuple[str, str, int]:
+    # (bucket, model, estimated tokens) of a call; calls that do not run a model reserve no tokens
+    model = kwargs.get("model") or default_model
+    if _call_name(function).removeprefix("Async") not in MODEL_CALLS:
+        return API_BUCKET, model, 0
+    return model, model, estimate_request_tokens(kwargs, model)
+
+def _usage_tokens(result: Any) -> int:
+    usage = getattr(result, "usage", None)
+    return getattr(usage, "total_tokens", 0) or 0
+
+def call_with_rate_limit(
+    function: Callable, *args: Any, default_model: str = "gpt-4o-mini", limiter: Optional[RateLimiter] = None, max_retries: int = MAX_RETRIES, **kwargs: Any
+) -> Any:
+    """
+    Calls an API function through the rate limiter, retrying transient errors with backoff.
+
+    Parameters:
+    - function: The API client method to call.
+    - args: Positional arguments of the call.
+    - default_model: The model the call is billed to when it does not name one itself.
+    - limiter: The limiter to use; defaults to the process-wide one.
+    - max_retries: Maximum number of retries of transient errors.
+    - kwargs: Keyword arguments of the call.
+
+    Returns:
+    - The result of the call.
+    """
+    limiter = limiter or get_rate_limiter()
+    bucket, model, estimated_tokens = _reservation(function, kwargs, default_model)
+    # One span per logical call, so queueing and retries show up in the call's own time
+    with get_tracer().span(_call_name(function), kind="api", model=model) as span:
+        for attempt in range(max_retries + 1):
+            delay = limiter.reserve(bucket, estimated_tokens)
+            _add_queue_time(span, delay)
+            time.sleep(delay)
+            try:
+                result = function(*args, **kwargs)
+            except Exception as error:
+                if attempt == max_retries or not is_retryable_error(error):
+                    raise
+                delay = get_retry_delay(error, attempt)
+                limiter.record_retry()
+                span.set_attribute("retries", attempt + 1)
+                logging.warning(f"Retrying {_call_name(function)} in {delay:.2f}s after: {error}")
+                time.sleep(delay)
+                continue
+            if bucket != API_BUCKET:
+                limiter.record_usage(model, _usage_tokens(result) - estimated_tokens)
+            return result
+
+async def async_call_with_rate_limit(
+    function: Callable, *args: Any, default_model: str = "gpt-4o-mini", limiter: Optional[RateLimiter] = None, max_retries: int = MAX_RETRIES, **kwargs: Any
+) -> Any:
+    """
+    Asynchronous counterpart of `call_with_rate_limit` for `AsyncOpenAI` methods; `function` may also be a plain
+    function returning an awaitable (e.g., a paginator), which is called again on every retry.
+    """
+    limiter = limiter or get_rate_limiter()
+    bucket, model, estimated_tokens = _reservation(function, kwargs, default_model)
+    with get_tracer().span(_call_name(function), kind="api", model=model) as span:
+        for attempt in range(max_retries + 1):
+            delay = limiter.reserve(bucket, estimated_tokens)
+            _add_queue_time(span, delay)
+            await asyncio.sleep(delay)
+            try:
+                result = function(*args, **kwargs)
+                if inspect.isawaitable(result):
+                    result = await result
+            except Exception as error:
+                if attempt == max_retries or not is_retryable_error(error):
+                    raise
+                delay = get_retry_delay(error, attempt)
+                limiter.record_retry()
+                span.set_attribute("retries", attempt + 1)
+                logging.warning(f"Retrying {_call_name(function)} in {delay:.2f}s after: {error}")
+                await asyncio.sleep(delay)
+                continue
+            if bucket != API_BUCKET:
+                limiter.record_usage(model, _usage_tokens(result) - estimated_tokens)
+            return result
+
+def record_run_tokens(run: Any, request_kwargs: Dict[str, Any], default_model: str = "gpt-4o-mini", limiter: Optional[RateLimiter] = None) -> None:
+    """
+    Charges the tokens of a run in its terminal status to its model's token bucket. The call that created the run
+    only reserved the estimate of its parameters, and neither it nor the run's stream report any usage.
+
+    Parameters:
+    - run: The run object in its terminal status.
+    - request_kwargs: The keyword arguments of the call that created the run.
+    - default_model: The model the run is billed to when it does not name one itself.
+    - limiter: The limiter to charge; defaults to the process-wide one.
+    """
+    model = getattr(run, "model", None) or default_model
+    (limiter or get_rate_limiter()).record_usage(model, _usage_tokens(run) - estimate_request_tokens(request_kwargs, model))
+
+class AsyncRateLimitedCall:
+    """
+    Call of an `AsyncOpenAI` method that is a plain function (e.g., `messages.list`, `runs.create` or
+    `runs.stream`). The request is only sent when the call is awaited, iterated with `async for` or entered with
+    `async with`, so the wait for the rate limiter is awaited there instead of blocking the event loop.
+    """
+
+    def __init__(self, function: Callable, args: tuple, kwargs: Dict[str, Any], default_model: str, limiter: Optional[RateLimiter]):
+        self._function = function
+        self._args = args
+        self._kwargs = kwargs
+        self._default_model = default_model
+        self._limiter = limiter
+        self._manager = None
+
+    def __await__(self):
+        return async_call_with_rate_limit(
+            self._function, *self._args, default_model=self._default_model, limiter=self._limiter, **self._kwargs
+        ).__await__()
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        # Only the first page is rate limited, like the listings of the sync client
+        async for item in await self:
+            yield item
+
+    async def __aenter__(self):
+        # Stream managers send their request when entered; they are not retried
+        limiter = self._limiter or get_rate_limiter()
+        bucket, model, estimated_tokens = _reservation(self._function, self._kwargs, self._default_model)
+        with get_tracer().span(_call_name(self._function), kind="api", model=model) as span:
+            delay = limiter.reserve(bucket, estimated_tokens)
+            _add_queue_time(span, delay)
+            await asyncio.sleep(delay)
+        self._manager = self._function(*self._args, **self._kwargs)
+        return await self._manager.__aenter__()
+
+    async def __aexit__(self, *exc_info):
+        return await self._manager.__aexit__(*exc_info)
+
+def _is_async_client(client: Any) -> bool:
+    # Resources (e.g., beta.threads.runs) keep their client in `_client`; AsyncOpenAI's request methods are coroutines
+    root_client = getattr(client, "_client", client)
+    return inspect.iscoroutinefunction(getattr(root_client, "post", None))
+
+class RateLimitedClient:
+    """
+    Proxy of an `OpenAI` or `AsyncOpenAI` client whose API methods go through the shared rate limiter.
+
+    Create the wrapped client with `max_retries=0` so retries are not done twice. Only the first page of a
+    listing is rate limited; further pages are fetched by the wrapped client itself.
+    """
+
+    def __init__(self, client: Any, model: str = "gpt-4o-mini", limiter: Optional[RateLimiter] = None, is_async: Optional[bool] = None):
+        self._client = client
+        self._model = model
+        self._limiter = limiter
+        self._is_async = _is_async_client(client) if is_async is None else is_async
+
+    def __getattr__(self, name: str) -> Any:
+        attribute = getattr(self._client, name)
+        if inspect.iscoroutinefunction(attribute):
+            async def async_method(*args, **kwargs):
+                return await async_call_with_rate_limit(attribute, *args, default_model=self._model, limiter=self._limiter, **kwargs)
+            return async_method
+        if inspect.ismethod(attribute) and self._is_async and not name.startswith("_"):
+            # Plain methods of async resources must not wait for the limiter with time.sleep on the event loop
+            def deferred_method(*args, **kwargs):
+                return AsyncRateLimitedCall(attribute, args, kwargs, self._model, self._limiter)
+            return deferred_method
+        if inspect.ismethod(attribute):
+            def method(*args, **kwargs):
+                return call_with_rate_limit(attribute, *args, default_model=self._model, limiter=self._limiter, **kwargs)
+            return method
+        if name.startswith("_") or isinstance(attribute, (str, int, float, bool, type(None))):
+            return attribute
+        # Resource namespaces (e.g., beta.threads.runs) are wrapped in turn
+        return RateLimitedClient(attribute, self._model, self._limiter, self._is_async)
@@ -1,5 +1,151 @@
+import gzip
+import json
+import zlib
 from io import StringIO
 
+# Supported transcript export formats and their MIME types
+EXPORT_FORMATS = {
+    "txt": "text/plain",
+    "md": "text/markdown",
+    "jsonl": "application/jsonl",
+}
+
+def _render_entry(entry, export_format, index):
+    if export_format == "md":
+        if entry.startswith("ROUND: "):
+            return f"### Round {entry[len('ROUND: '):]}\n\n"
+        return f"{entry}\n\n"
+    if export_format == "jsonl":
+        return json.dumps({"type": "entry", "index": index, "text": entry}) + "\n"
+    return entry + "\n"
+
+class Transcript:
+    """
+    Conversation transcript with O(1) appends and incremental exports.
+
+    The header (project description and agents) is rendered on export, while every entry is rendered (and
+    compressed) only once per format, the first time an export needs it.
+    """
+
+    def __init__(self, project_description="", agents=None):
+        self.project_description = project_description
+        self.agents = agents if agents is not None else []
+        self.entries = []
+        # Per-format rendering state: rendered entries, gzip stream of the entries and the last export
+        self._exports = {}
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __iter__(self):
+        return iter(self.entries)
+
+    def append(self, entry):
+        """
+        Adds a conversation entry (e.g., "AI Ethicist: ..." or "ROUND: 1") to the transcript.
+
+        Parameters:
+        - entry: The entry; converted to a string if it's not already a string.
+        """
+        self.entries.append(str(entry))
+
+    def render_header(self, export_format="txt"):
+        """
+        Renders the project description and the agents (except the AI Ethicist).
+
+        Parameters:
+        - export_format: One of EXPORT_FORMATS.
+
+        Returns:
+        - str: The header text.
+        """
+        agents = [agent for agent in self.agents if agent['name'] != "AI Ethicist"]
+        header = StringIO()
+        if export_format == "md":
+            header.write(f"# Project Description\n\n{self.project_description}\n\n## Agents\n\n")
+            for agent in agents:
+                header.write(f"### {agent['name']}\n\n{agent['role']}\n\n")
+            header.write("## Conversation History\n\n")
+        elif export_format == "jsonl":
+            header.write(json.dumps({
+                "type": "header",
+                "project_description": self.project_description,
+                "agents": [{"name": agent['name'], "instructions": agent['role']} for agent in agents],
+            }) + "\n")
+        else:
+            header.write(f"Project Description:\n{self.project_description}\n\nAgents:\n")
+            for agent in agents:
+                header.write(f"Name: {agent['name']}\nInstructions: {agent['role']}\n\n")
+            header.write("Conversation History:\n")
+        return header.getvalue()
+
+    def _sync(self, export_format, compress):
+        state = self._exports.setdefault(export_format, {
+            "parts": [], "gzip_parts": [], "compressor": zlib.compressobj(wbits=31), "last_export": None
+        })
+        # Only entries appended since the previous export are rendered
+        for index in range(len(state["parts"]), len(self.entries)):
+            state["parts"].append(_render_entry(self.entries[index], export_format, index))
+        if compress:
+            for part in state["parts"][len(state["gzip_parts"]):]:
+                state["gzip_parts"].append(state["compressor"].compress(part.encode("utf-8")))
+        return state
+
+    def export(self, export_format="txt", compress=False):
+        """
+        Exports the transcript, reusing everything rendered by earlier exports.
+
+        Parameters:
+        - export_format: One of EXPORT_FORMATS.
+        - compress: Whether to gzip the export.
+
+        Returns:
+        - bytes: The exported transcript.
+        """
+        if export_format not in EXPORT_FORMATS:
+            raise ValueError(f"Unsupported transcript format '{export_format}'.")
+
+        header = self.render_header(export_format)
+        state = self._sync(export_format, compress)
+        export_key = (header, len(self.entries), compress)
+        if state["last_export"] and state["last_export"][0] == export_key:
+            return state["last_export"][1]
+
+        if compress:
+            # Header and entries are separate gzip members, so a header change never recompresses the entries
+            data = gzip.compress(header.encode("utf-8")) + b"".join(state["gzip_parts"]) + state["compressor"].copy().flush()
+        else:
+            data = (header + "".join(state["parts"])).encode("utf-8")
+        state["last_export"] = (export_key, data)
+        return data
+
+    def file_name(self, export_format="txt", compress=False, stem="conversation_history"):
+        """
+        Returns the download file name of an export.
+
+        Parameters:
+        - export_format: One of EXPORT_FORMATS.
+        - compress: Whether the export is gzipped.
+        - stem: The file name without extension.
+
+        Returns:
+        - str: The file name, e.g. "conversation_history.md.gz".
+        """
+        return f"{stem}.{export_format}" + (".gz" if compress else "")
+
+    def mime_type(self, export_format="txt", compress=False):
+        """
+        Returns the MIME type of an export.
+
+        Parameters:
+        - export_format: One of EXPORT_FORMATS.
+        - compress: Whether the export is gzipped.
+
+        Returns:
+        - str: The MIME type.
+        """
+        return "application/gzip" if compress else EXPORT_FORMATS[export_format]
+
 def generate_conversation_text(conversation_history, agents, project_description):
     """
     Generate a text version of the conversation with agent names, instructions, and project description.
@@ -12,20 +158,7 @@ def generate_conversation_text(conversation_history, agents, project_description
     Returns:
     - Text content to be saved in a file.
     """
-    text_content = StringIO()
-    
-    text_content.write("Project Description:\n")
-    text_content.write(f"{project_description}\n\n")
-    
-    text_content.write("Agents:\n")
-    for agent in agents:
-        if agent['name'] != "AI Ethicist":
-            text_content.write(f"Name: {agent['name']}\n")
-            text_content.write(f"Instructions: {agent['role']}\n\n")
-    
-    text_content.write("Conversation History:\n")
+    transcript = Transcript(project_description, agents)
     for entry in conversation_history:
-        # Convert entry to a string if it's not already a string
-        text_content.write(str(entry) + "\n")
-    
-    return text_content.getvalue()
+        transcript.append(entry)
+    return transcript.export("txt").decode("utf-8")
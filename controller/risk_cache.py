@@ -0,0 +1,174 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from typing import List, Optional, Tuple
+
+from controller.input_guardrail import ASSISTANT_INSTRUCTIONS
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+
+# Location and size limit of the on-disk risk assessment cache
+RISK_CACHE_PATH = os.path.join(".cache", "risk_assessments.sqlite3")
+RISK_CACHE_MAX_ENTRIES = 5000
+
+_cache_lock = threading.Lock()
+_purged_paths = set()
+
+def normalize_description(description: str) -> str:
+    """
+    Normalizes a module description so trivially different inputs share a cache entry.
+
+    Parameters:
+    - description: The module description entered by the user.
+
+    Returns:
+    - str: The lowercased description with collapsed whitespace.
+    """
+    return " ".join(description.lower().split())
+
+def get_risk_cache_version(model: str, instructions: str = ASSISTANT_INSTRUCTIONS) -> str:
+    """
+    Computes the version of the risk assessment setup; changing the criteria or model changes it.
+
+    Parameters:
+    - model: The model used by the RiskGuard assistant.
+    - instructions: The RiskGuard instructions, which embed the risk criteria constants.
+
+    Returns:
+    - str: The hex SHA-256 digest identifying the current version.
+    """
+    return hashlib.sha256(f"{model}\n{instructions}".encode("utf-8")).hexdigest()
+
+def _connect(cache_path: str) -> sqlite3.Connection:
+    os.makedirs(os.path.dirname(cache_path) or ".", exist_ok=True)
+    connection = sqlite3.connect(cache_path)
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute(
+        """
+        CREATE TABLE IF NOT EXISTS risk_assessments (
+            description_hash TEXT NOT NULL,
+            version TEXT NOT NULL,
+            response TEXT NOT NULL,
+            citations TEXT NOT NULL,
+            created_at REAL NOT NULL,
+            last_accessed REAL NOT NULL,
+            PRIMARY KEY (description_hash, version)
+        )
+        """
+    )
+    return connection
+
+def _description_hash(description: str) -> str:
+    return hashlib.sha256(normalize_description(description).encode("utf-8")).hexdigest()
+
+def get_cached_risk_assessment(description: str, model: str, cache_path: str = RISK_CACHE_PATH) -> Optional[Tuple[str, List[str]]]:
+    """
+    Looks up a previous RiskGuard assessment of the same description, criteria and model.
+
+    Parameters:
+    - description: The module description to assess.
+    - model: The model used by the RiskGuard assistant.
+    - cache_path: Path of the SQLite cache file.
+
+    Returns:
+    - Tuple of the response text and its citations if cached, None otherwise.
+    """
+    version = get_risk_cache_version(model)
+    try:
+        with _cache_lock:
+            connection = _connect(cache_path)
+            if cache_path not in _purged_paths:
+                # Drop entries produced with outdated criteria once per process
+                _purged_paths.add(cache_path)
+                _delete_entries(connection, model)
+
+            with connection:
+                row = connection.execute(
+                    "SELECT response, citations FROM risk_assessments WHERE description_hash = ? AND version = ?",
+                    (_description_hash(description), version)
+                ).fetchone()
+                if row:
+                    connection.execute(
+                        "UPDATE risk_assessments SET last_accessed = ? WHERE description_hash = ? AND version = ?",
+                        (time.time(), _description_hash(description), version)
+                    )
+            connection.close()
+    except sqlite3.Error as error:
+        logging.error(f"Error reading risk assessment cache: {error}")
+        return None
+
+    if row is None:
+        return None
+    logging.info("Risk assessment served from cache.")
+    return row[0], json.loads(row[1])
+
+def store_risk_assessment(
+    description: str, model: str, response: str, citations: List[str], cache_path: str = RISK_CACHE_PATH
+) -> None:
+    """
+    Stores a RiskGuard assessment and evicts the least recently used entries beyond the size limit.
+
+    Parameters:
+    - description: The assessed module description.
+    - model: The model used by the RiskGuard assistant.
+    - response: The RiskGuard response text.
+    - citations: The citations extracted from the response.
+    - cache_path: Path of the SQLite cache file.
+    """
+    now = time.time()
+    try:
+        with _cache_lock:
+            connection = _connect(cache_path)
+            with connection:
+                connection.execute(
+                    "INSERT OR REPLACE INTO risk_assessments VALUES (?, ?, ?, ?, ?, ?)",
+                    (_description_hash(description), get_risk_cache_version(model), response, json.dumps(citations), now, now)
+                )
+                connection.execute(
+                    """
+                    DELETE FROM risk_assessments WHERE rowid IN (
+                        SELECT rowid FROM risk_assessments ORDER BY last_accessed DESC LIMIT -1 OFFSET ?
+                    )
+                    """,
+                    (RISK_CACHE_MAX_ENTRIES,)
+                )
+            connection.close()
+    except sqlite3.Error as error:
+        logging.error(f"Error writing risk assessment cache: {error}")
+
+def _delete_entries(connection: sqlite3.Connection, model: Optional[str]) -> int:
+    with connection:
+        if model is None:
+            return connection.execute("DELETE FROM risk_assessments").rowcount
+        return connection.execute(
+            "DELETE FROM risk_assessments WHERE version != ?", (get_risk_cache_version(model),)
+        ).rowcount
+
+def invalidate_risk_cache(model: Optional[str] = None, cache_path: str = RISK_CACHE_PATH) -> int:
+    """
+    Removes cached assessments that no longer match the current criteria constants.
+
+    Parameters:
+    - model: If given, keep only entries for the current version with this model; if None, remove everything.
+    - cache_path: Path of the SQLite cache file.
+
+    Returns:
+    - int: The number of removed entries.
+    """
+    try:
+        with _cache_lock:
+            connection = _connect(cache_path)
+            removed = _delete_entries(connection, model)
+            connection.close()
+    except sqlite3.Error as error:
+        logging.error(f"Error invalidating risk assessment cache: {error}")
+        return 0
+
+    if removed:
+        logging.info(f"Removed {removed} outdated risk assessments from cache.")
+    return removed
@@ -0,0 +1,147 @@
+import re
+import math
+import logging
+import threading
+from typing import Dict, List, Optional, Set, Tuple
+
+from controller.input_guardrail import (
+    UNACCEPTABLE_RISK_CRITERIA,
+    HIGH_RISK_CRITERIA,
+    LIMITED_RISK_CRITERIA,
+    MINIMAL_RISK_CRITERIA,
+)
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+
+# Categories in order of severity; ties are resolved towards the more severe category
+RISK_CATEGORIES = {
+    "Unacceptable Risk": UNACCEPTABLE_RISK_CRITERIA,
+    "High Risk": HIGH_RISK_CRITERIA,
+    "Limited Risk": LIMITED_RISK_CRITERIA,
+    "Minimal Risk": MINIMAL_RISK_CRITERIA,
+}
+
+# Minimum score of the winning category and lead over the runner-up for a provisional verdict
+MIN_SCORE = 3.0
+MIN_MARGIN = 1.5
+# Single words alone are too ambiguous; the winning category must also match this many phrases
+MIN_PHRASE_MATCHES = 1
+# Phrases (bigrams) are more specific than single words
+PHRASE_WEIGHT = 2.0
+
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "based", "be", "by", "can", "could", "do", "does", "e", "for", "from",
+    "g", "in", "into", "is", "it", "its", "may", "must", "not", "of", "on", "or", "that", "the", "their", "they",
+    "this", "to", "used", "uses", "use", "using", "where", "which", "with", "without", "ai", "system", "systems",
+    "criteria", "risk", "low", "specific", "potentially", "involves", "provides", "performs", "requires",
+}
+
+def _stem(token: str) -> str:
+    # Light suffix stripping so 'publicly'/'public' and 'spaces'/'space' match
+    for suffix in ("ally", "ly", "ing", "ies", "es", "s", "ed"):
+        if len(token) > len(suffix) + 3 and token.endswith(suffix):
+            return token[: -len(suffix)] + ("y" if suffix == "ies" else "")
+    return token
+
+def extract_features(text: str) -> Set[str]:
+    """
+    Extracts the stemmed keywords and adjacent keyword phrases from a text.
+
+    Parameters:
+    - text: The text to analyze.
+
+    Returns:
+    - Set of single-word and two-word features.
+    """
+    tokens = [_stem(token) for token in re.findall(r"[a-z]+", text.lower()) if token not in STOPWORDS]
+    return set(tokens) | {f"{first} {second}" for first, second in zip(tokens, tokens[1:])}
+
+def _compile_feature_weights() -> Dict[str, Dict[str, float]]:
+    category_features = {category: extract_features(criteria) for category, criteria in RISK_CATEGORIES.items()}
+    document_frequency: Dict[str, int] = {}
+    for features in category_features.values():
+        for feature in features:
+            document_frequency[feature] = document_frequency.get(feature, 0) + 1
+
+    # Inverse document frequency across the categories: features shared by every category carry no weight
+    total = len(category_features)
+    return {
+        category: {
+            feature: math.log(total / document_frequency[feature]) * (PHRASE_WEIGHT if " " in feature else 1.0)
+            for feature in features
+            if document_frequency[feature] < total
+        }
+        for category, features in category_features.items()
+    }
+
+# Compiled once at import from the criteria constants
+FEATURE_WEIGHTS = _compile_feature_weights()
+
+def score_description(description: str) -> List[Tuple[str, float]]:
+    """
+    Scores a module description against every risk category.
+
+    Parameters:
+    - description: The module description to classify.
+
+    Returns:
+    - List of (category, score) tuples ordered from highest to lowest score.
+    """
+    features = extract_features(description)
+    scores = [
+        (category, sum(weights.get(feature, 0.0) for feature in features))
+        for category, weights in FEATURE_WEIGHTS.items()
+    ]
+    # sorted() is stable, so equal scores keep the severity order
+    return sorted(scores, key=lambda item: item[1], reverse=True)
+
+def classify_description(description: str) -> Optional[str]:
+    """
+    Returns a provisional risk category for clear-cut descriptions.
+
+    Parameters:
+    - description: The module description to classify.
+
+    Returns:
+    - str: The provisional category, or None if the description is not clear-cut enough.
+    """
+    (top_category, top_score), (_, runner_up_score) = score_description(description)[:2]
+    if top_score < MIN_SCORE or top_score - runner_up_score < MIN_MARGIN:
+        return None
+
+    features = extract_features(description)
+    phrase_matches = sum(1 for feature in features if " " in feature and feature in FEATURE_WEIGHTS[top_category])
+    return top_category if phrase_matches >= MIN_PHRASE_MATCHES else None
+
+# Agreement between the provisional and the LLM verdicts, shared by every session in the process
+_metrics_lock = threading.Lock()
+_agreement_metrics = {"provisional": 0, "agreed": 0, "revised": 0, "undecided": 0}
+
+def record_classifier_agreement(provisional_category: Optional[str], llm_category: str) -> Dict[str, float]:
+    """
+    Records whether the LLM verdict confirmed the provisional category and logs the agreement rate.
+
+    Parameters:
+    - provisional_category: The category returned by `classify_description` (None if undecided).
+    - llm_category: The category returned by the RiskGuard assistant.
+
+    Returns:
+    - Dict with the counters and the current 'agreement_rate'.
+    """
+    with _metrics_lock:
+        if provisional_category is None:
+            _agreement_metrics["undecided"] += 1
+        else:
+            _agreement_metrics["provisional"] += 1
+            _agreement_metrics["agreed" if provisional_category == llm_category else "revised"] += 1
+        metrics = dict(_agreement_metrics)
+
+    metrics["agreement_rate"] = metrics["agreed"] / metrics["provisional"] if metrics["provisional"] else 0.0
+    if provisional_category is not None and provisional_category != llm_category:
+        logging.info(f"RiskGuard revised provisional category '{provisional_category}' to '{llm_category}'.")
+    logging.info(
+        f"Local risk classifier agreement rate: {metrics['agreement_rate']:.0%} "
+        f"({metrics['agreed']}/{metrics['provisional']} provisional verdicts, {metrics['undecided']} undecided)."
+    )
+    return metrics
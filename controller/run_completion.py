@@ -0,0 +1,311 @@
+import time
+import asyncio
+import logging
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from controller.rate_limiter import record_run_tokens
+from controller.tracing import get_tracer
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+
+# Statuses after which the Assistants API will not advance a run on its own.
+# 'requires_action' is included because none of our agents define function tools,
+# so nothing in the app can ever submit tool outputs for it.
+TERMINAL_RUN_STATUSES = ("completed", "failed", "cancelled", "expired", "incomplete", "requires_action")
+
+# Adaptive polling defaults (seconds) used when streaming is unavailable
+POLL_INITIAL_INTERVAL = 0.1
+POLL_MAX_INTERVAL = 1.0
+POLL_BACKOFF_FACTOR = 1.5
+
+class RunNotCompletedError(Exception):
+    """
+    Raised when a run reaches a terminal status other than 'completed'.
+
+    Attributes:
+    - run: The final run object returned by the API.
+    - status: The terminal status of the run (e.g., 'failed', 'expired').
+    """
+    def __init__(self, run: Any):
+        self.run = run
+        self.status = getattr(run, "status", None)
+        last_error = getattr(run, "last_error", None)
+        incomplete_details = getattr(run, "incomplete_details", None)
+        detail = getattr(last_error, "message", None) or getattr(incomplete_details, "reason", None) or "no details"
+        super().__init__(f"Run {getattr(run, 'id', '?')} ended with status '{self.status}': {detail}")
+
+def get_run_timing(run: Any, wall_clock_seconds: float) -> Dict[str, Optional[float]]:
+    """
+    Compares the client-side wall-clock duration of a run with the server-side timestamps.
+
+    Parameters:
+    - run: The final run object.
+    - wall_clock_seconds: Time measured locally from run creation request to completion.
+
+    Returns:
+    - Dict with 'wall_clock_seconds', 'server_seconds', 'queued_seconds' and 'client_overhead_seconds'.
+      Server-side values are None when the API did not report the relevant timestamps.
+    """
+    created_at = getattr(run, "created_at", None)
+    started_at = getattr(run, "started_at", None)
+    finished_at = next(
+        (value for value in (
+            getattr(run, "completed_at", None),
+            getattr(run, "failed_at", None),
+            getattr(run, "cancelled_at", None),
+            getattr(run, "expires_at", None) if getattr(run, "status", None) == "expired" else None,
+        ) if value),
+        None
+    )
+
+    server_seconds = float(finished_at - created_at) if created_at and finished_at else None
+    queued_seconds = float(started_at - created_at) if created_at and started_at else None
+    client_overhead_seconds = max(wall_clock_seconds - server_seconds, 0.0) if server_seconds is not None else None
+
+    return {
+        "wall_clock_seconds": round(wall_clock_seconds, 3),
+        "server_seconds": server_seconds,
+        "queued_seconds": queued_seconds,
+        "client_overhead_seconds": round(client_overhead_seconds, 3) if client_overhead_seconds is not None else None,
+    }
+
+def wait_for_run(
+    api_client: Any,
+    thread_id: str,
+    run_id: str,
+    initial_interval: float = POLL_INITIAL_INTERVAL,
+    max_interval: float = POLL_MAX_INTERVAL,
+    backoff_factor: float = POLL_BACKOFF_FACTOR,
+    timeout: Optional[float] = None
+) -> Any:
+    """
+    Polls a run with adaptive sub-second backoff until it reaches a terminal status.
+
+    Parameters:
+    - api_client: The API client object for interacting with the OpenAI service.
+    - thread_id: The ID of the thread the run belongs to.
+    - run_id: The ID of the run to wait for.
+    - initial_interval: First sleep between polls, in seconds.
+    - max_interval: Upper bound for the sleep between polls, in seconds.
+    - backoff_factor: Multiplier applied to the interval after every non-terminal poll.
+    - timeout: Optional maximum number of seconds to wait before raising TimeoutError.
+
+    Returns:
+    - The run object in its terminal status.
+    """
+    interval = initial_interval
+    deadline = time.monotonic() + timeout if timeout else None
+
+    while True:
+        run = api_client.beta.threads.runs.retrieve(run_id, thread_id=thread_id)
+        if run.status in TERMINAL_RUN_STATUSES:
+            return run
+
+        if deadline and time.monotonic() + interval > deadline:
+            raise TimeoutError(f"Run {run_id} did not finish within {timeout} seconds (last status: {run.status}).")
+
+        with get_tracer().span("poll sleep", kind="wait", run_id=run_id):
+            time.sleep(interval)
+        interval = min(interval * backoff_factor, max_interval)
+
+def stream_run(
+    api_client: Any,
+    thread_id: str,
+    assistant_id: str,
+    on_text_delta: Optional[Callable[[str], None]] = None,
+    **run_params: Any
+) -> Any:
+    """
+    Creates a run through the streaming runs API and consumes its events until the run ends.
+
+    If the event stream breaks after the run was created, the run is followed up by polling
+    instead of being started again.
+
+    Parameters:
+    - api_client: The API client object for interacting with the OpenAI service.
+    - thread_id: The ID of the thread to run.
+    - assistant_id: The ID of the assistant executing the run.
+    - on_text_delta: Optional callback invoked with every text fragment as the assistant writes it.
+    - run_params: Additional keyword arguments passed to the run creation call.
+
+    Returns:
+    - The run object in its terminal status.
+    """
+    stream = None
+    try:
+        # Creating the stream manager sends nothing; the run's request and its events are timed here
+        with get_tracer().span("run event stream", kind="api", thread_id=thread_id):
+            with api_client.beta.threads.runs.stream(thread_id=thread_id, assistant_id=assistant_id, **run_params) as stream:
+                if on_text_delta:
+                    for text_delta in stream.text_deltas:
+                        on_text_delta(text_delta)
+                stream.until_done()
+                run = stream.current_run
+    except Exception as error:
+        current_run = getattr(stream, "current_run", None) if stream is not None else None
+        if current_run is None:
+            raise
+        logging.warning(f"Stream for run {current_run.id} interrupted ({error}). Falling back to polling.")
+        return wait_for_run(api_client, thread_id, current_run.id)
+
+    if run is None:
+        raise RuntimeError(f"Stream on thread {thread_id} ended without a run object.")
+
+    # The stream can end on a non-terminal event (e.g. a dropped connection); finish by polling
+    if run.status not in TERMINAL_RUN_STATUSES:
+        return wait_for_run(api_client, thread_id, run.id)
+    return run
+
+def execute_run(
+    api_client: Any,
+    thread_id: str,
+    assistant_id: str,
+    use_streaming: bool = True,
+    on_text_delta: Optional[Callable[[str], None]] = None,
+    **run_params: Any
+) -> Tuple[Any, Dict[str, Optional[float]]]:
+    """
+    Runs an assistant on a thread and returns as soon as the run reaches a terminal status.
+
+    Uses the streaming runs API when available, otherwise creates the run and polls it with
+    adaptive backoff. Runs stuck in 'requires_action' are cancelled so the thread is not left locked.
+
+    Parameters:
+    - api_client: The API client object for interacting with the OpenAI service.
+    - thread_id: The ID of the thread to run.
+    - assistant_id: The ID of the assistant executing the run.
+    - use_streaming: Whether to try the streaming runs API first.
+    - on_text_delta: Optional callback receiving text fragments as they arrive (streaming only).
+    - run_params: Additional keyword arguments passed to the run creation call.
+
+    Returns:
+    - Tuple of the completed run object and its timing breakdown (see `get_run_timing`).
+
+    Raises:
+    - RunNotCompletedError: If the run ends in any status other than 'completed'.
+    """
+    started = time.perf_counter()
+
+    run = None
+    if use_streaming and hasattr(api_client.beta.threads.runs, "stream"):
+        run = stream_run(api_client, thread_id, assistant_id, on_text_delta=on_text_delta, **run_params)
+    if run is None:
+        created_run = api_client.beta.threads.runs.create(thread_id=thread_id, assistant_id=assistant_id, **run_params)
+        run = wait_for_run(api_client, thread_id, created_run.id)
+
+    # The run's tokens count against the model's tokens-per-minute limit once they are known
+    record_run_tokens(run, {"assistant_id": assistant_id, **run_params})
+    timing = get_run_timing(run, time.perf_counter() - started)
+    logging.info(
+        f"Run {run.id} on thread {thread_id} ended with status '{run.status}' "
+        f"(wall clock: {timing['wall_clock_seconds']}s, server: {timing['server_seconds']}s)."
+    )
+
+    if run.status == "requires_action":
+        try:
+            api_client.beta.threads.runs.cancel(run.id, thread_id=thread_id)
+            logging.warning(f"Cancelled run {run.id}: it requested tool outputs that no agent provides.")
+        except Exception as error:
+            logging.error(f"Error cancelling run {run.id} in 'requires_action': {error}")
+
+    if run.status != "completed":
+        raise RunNotCompletedError(run)
+
+    return run, timing
+
+async def async_wait_for_run(
+    async_client: Any,
+    thread_id: str,
+    run_id: str,
+    initial_interval: float = POLL_INITIAL_INTERVAL,
+    max_interval: float = POLL_MAX_INTERVAL,
+    backoff_factor: float = POLL_BACKOFF_FACTOR
+) -> Any:
+    """
+    Asynchronous counterpart of `wait_for_run` for an `AsyncOpenAI` client.
+
+    Parameters:
+    - async_client: The asynchronous API client object.
+    - thread_id: The ID of the thread the run belongs to.
+    - run_id: The ID of the run to wait for.
+    - initial_interval: First sleep between polls, in seconds.
+    - max_interval: Upper bound for the sleep between polls, in seconds.
+    - backoff_factor: Multiplier applied to the interval after every non-terminal poll.
+
+    Returns:
+    - The run object in its terminal status.
+    """
+    interval = initial_interval
+    while True:
+        run = await async_client.beta.threads.runs.retrieve(run_id, thread_id=thread_id)
+        if run.status in TERMINAL_RUN_STATUSES:
+            return run
+        with get_tracer().span("poll sleep", kind="wait", run_id=run_id):
+            await asyncio.sleep(interval)
+        interval = min(interval * backoff_factor, max_interval)
+
+async def async_execute_run(
+    async_client: Any,
+    thread_id: str,
+    assistant_id: str,
+    use_streaming: bool = True,
+    **run_params: Any
+) -> Tuple[Any, Dict[str, Optional[float]]]:
+    """
+    Asynchronous counterpart of `execute_run` for an `AsyncOpenAI` client.
+
+    Parameters:
+    - async_client: The asynchronous API client object.
+    - thread_id: The ID of the thread to run.
+    - assistant_id: The ID of the assistant executing the run.
+    - use_streaming: Whether to try the streaming runs API first.
+    - run_params: Additional keyword arguments passed to the run creation call.
+
+    Returns:
+    - Tuple of the completed run object and its timing breakdown (see `get_run_timing`).
+
+    Raises:
+    - RunNotCompletedError: If the run ends in any status other than 'completed'.
+    """
+    started = time.perf_counter()
+
+    run = None
+    if use_streaming and hasattr(async_client.beta.threads.runs, "stream"):
+        stream = None
+        try:
+            with get_tracer().span("run event stream", kind="api", thread_id=thread_id):
+                async with async_client.beta.threads.runs.stream(thread_id=thread_id, assistant_id=assistant_id, **run_params) as stream:
+                    await stream.until_done()
+                    run = stream.current_run
+        except Exception as error:
+            current_run = getattr(stream, "current_run", None) if stream is not None else None
+            if current_run is None:
+                raise
+            logging.warning(f"Stream for run {current_run.id} interrupted ({error}). Falling back to polling.")
+            run = current_run
+        if run is not None and run.status not in TERMINAL_RUN_STATUSES:
+            run = await async_wait_for_run(async_client, thread_id, run.id)
+    if run is None:
+        created_run = await async_client.beta.threads.runs.create(thread_id=thread_id, assistant_id=assistant_id, **run_params)
+        run = await async_wait_for_run(async_client, thread_id, created_run.id)
+
+    # The run's tokens count against the model's tokens-per-minute limit once they are known
+    record_run_tokens(run, {"assistant_id": assistant_id, **run_params})
+    timing = get_run_timing(run, time.perf_counter() - started)
+    logging.info(
+        f"Run {run.id} on thread {thread_id} ended with status '{run.status}' "
+        f"(wall clock: {timing['wall_clock_seconds']}s, server: {timing['server_seconds']}s)."
+    )
+
+    if run.status == "requires_action":
+        try:
+            await async_client.beta.threads.runs.cancel(run.id, thread_id=thread_id)
+            logging.warning(f"Cancelled run {run.id}: it requested tool outputs that no agent provides.")
+        except Exception as error:
+            logging.error(f"Error cancelling run {run.id} in 'requires_action': {error}")
+
+    if run.status != "completed":
+        raise RunNotCompletedError(run)
+
+    return run, timing
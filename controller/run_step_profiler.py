@@ -0,0 +1,215 @@
+import os
+import json
+import time
+import logging
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+
+# One JSON object per profiled run
+RUN_STEP_PROFILE_PATH = os.path.join(".cache", "run_step_profiles.jsonl")
+# Asks the API to return the retrieved chunks of file_search calls, so they can be counted
+FILE_SEARCH_RESULTS_INCLUDE = "step_details.tool_calls[*].file_search.results[*].content"
+# Characters of the prompt kept with each record
+PROMPT_PREVIEW_LENGTH = 120
+# Steps requested per page (API maximum)
+STEP_PAGE_SIZE = 100
+
+_profile_lock = threading.Lock()
+
+def _step_seconds(step: Any) -> Optional[float]:
+    # Step timestamps are whole seconds; unfinished steps have no duration
+    finished_at = getattr(step, "completed_at", None) or getattr(step, "failed_at", None) or getattr(step, "cancelled_at", None)
+    created_at = getattr(step, "created_at", None)
+    return float(finished_at - created_at) if finished_at and created_at else None
+
+def profile_run_steps(api_client: Any, thread_id: str, run_id: str) -> Dict[str, Any]:
+    """
+    Lists the steps of a finished run and summarizes where its server-side time and tokens went.
+
+    Parameters:
+    - api_client: The API client object for interacting with the OpenAI service.
+    - thread_id: The ID of the thread the run belongs to.
+    - run_id: The ID of the run.
+
+    Returns:
+    - Dict with 'run_id', 'steps', 'tool_calls' (count per tool type), 'retrieved_chunks', 'tool_seconds',
+      'generation_seconds', 'prompt_tokens', 'completion_tokens', 'total_tokens' and 'step_details' (one dict
+      per step with 'type', 'seconds', 'tools', 'retrieved_chunks' and 'total_tokens').
+    """
+    steps = api_client.beta.threads.runs.steps.list(
+        run_id, thread_id=thread_id, order="asc", limit=STEP_PAGE_SIZE, include=[FILE_SEARCH_RESULTS_INCLUDE]
+    )
+
+    profile = {
+        "run_id": run_id,
+        "steps": 0,
+        "tool_calls": {},
+        "retrieved_chunks": 0,
+        "tool_seconds": 0.0,
+        "generation_seconds": 0.0,
+        "prompt_tokens": 0,
+        "completion_tokens": 0,
+        "total_tokens": 0,
+        "step_details": [],
+    }
+    for step in steps:
+        tools = []
+        retrieved_chunks = 0
+        if step.type == "tool_calls":
+            for tool_call in step.step_details.tool_calls:
+                tools.append(tool_call.type)
+                profile["tool_calls"][tool_call.type] = profile["tool_calls"].get(tool_call.type, 0) + 1
+                if tool_call.type == "file_search":
+                    retrieved_chunks += len(getattr(tool_call.file_search, "results", None) or [])
+
+        seconds = _step_seconds(step)
+        usage = getattr(step, "usage", None)
+        total_tokens = getattr(usage, "total_tokens", 0) or 0
+        profile["steps"] += 1
+        profile["retrieved_chunks"] += retrieved_chunks
+        profile["tool_seconds" if step.type == "tool_calls" else "generation_seconds"] += seconds or 0.0
+        profile["prompt_tokens"] += getattr(usage, "prompt_tokens", 0) or 0
+        profile["completion_tokens"] += getattr(usage, "completion_tokens", 0) or 0
+        profile["total_tokens"] += total_tokens
+        profile["step_details"].append({
+            "type": step.type,
+            "seconds": seconds,
+            "tools": tools,
+            "retrieved_chunks": retrieved_chunks,
+            "total_tokens": total_tokens,
+        })
+    return profile
+
+def record_run_profile(profile: Dict[str, Any], agent_name: str, round_number: Optional[int] = None, prompt: str = "", profile_path: str = RUN_STEP_PROFILE_PATH) -> Dict[str, Any]:
+    """
+    Appends a run profile, labelled with its agent, round and prompt, to the profile file.
+
+    Parameters:
+    - profile: The profile returned by `profile_run_steps`.
+    - agent_name: The name of the agent that executed the run.
+    - round_number: The 1-based conversation round of the run, if any.
+    - prompt: The project description the conversation is about; only a preview is kept.
+    - profile_path: Path of the JSONL profile file.
+
+    Returns:
+    - Dict: The record as written.
+    """
+    record = {
+        "recorded_at": time.time(),
+        "agent": agent_name,
+        "round": round_number,
+        "prompt": prompt[:PROMPT_PREVIEW_LENGTH],
+        **profile,
+    }
+    with _profile_lock:
+        os.makedirs(os.path.dirname(profile_path) or ".", exist_ok=True)
+        with open(profile_path, "a", encoding="utf-8") as file:
+            file.write(json.dumps(record) + "\n")
+    logging.info(
+        f"Run {profile['run_id']} of '{agent_name}': {profile['steps']} steps, {sum(profile['tool_calls'].values())} tool calls, "
+        f"{profile['retrieved_chunks']} chunks, {profile['tool_seconds']:.0f}s in tools, {profile['generation_seconds']:.0f}s generating."
+    )
+    return record
+
+def load_run_profiles(profile_path: str = RUN_STEP_PROFILE_PATH) -> List[Dict[str, Any]]:
+    """
+    Reads the recorded run profiles.
+
+    Parameters:
+    - profile_path: Path of the JSONL profile file.
+
+    Returns:
+    - List of records, oldest first; empty if nothing was recorded yet.
+    """
+    if not os.path.exists(profile_path):
+        return []
+    records = []
+    with open(profile_path, "r", encoding="utf-8") as file:
+        for line in file:
+            try:
+                records.append(json.loads(line))
+            except json.JSONDecodeError:
+                continue  # A partial line left by an interrupted write
+    return records
+
+def aggregate_run_profiles(records: Iterable[Dict[str, Any]], group_by: Sequence[str] = ("agent",)) -> List[Dict[str, Any]]:
+    """
+    Aggregates run profiles per group (e.g., per agent, per agent and round, or per prompt).
+
+    Parameters:
+    - records: The records written by `record_run_profile`.
+    - group_by: The record keys identifying a group.
+
+    Returns:
+    - List of dicts with the group keys, 'runs', 'tool_calls_per_run', 'file_search_calls', 'code_interpreter_calls',
+      'chunks_per_run', 'tool_seconds', 'generation_seconds', 'tool_time_share' and 'tokens_per_run', sorted by
+      tool seconds, most expensive first.
+    """
+    groups = {}
+    for record in records:
+        key = tuple(record.get(field) for field in group_by)
+        group = groups.setdefault(key, {
+            **dict(zip(group_by, key)),
+            "runs": 0, "tool_calls": 0, "file_search_calls": 0, "code_interpreter_calls": 0, "retrieved_chunks": 0,
+            "tool_seconds": 0.0, "generation_seconds": 0.0, "total_tokens": 0,
+        })
+        tool_calls = record.get("tool_calls", {})
+        group["runs"] += 1
+        group["tool_calls"] += sum(tool_calls.values())
+        group["file_search_calls"] += tool_calls.get("file_search", 0)
+        group["code_interpreter_calls"] += tool_calls.get("code_interpreter", 0)
+        group["retrieved_chunks"] += record.get("retrieved_chunks", 0)
+        group["tool_seconds"] += record.get("tool_seconds", 0.0)
+        group["generation_seconds"] += record.get("generation_seconds", 0.0)
+        group["total_tokens"] += record.get("total_tokens", 0)
+
+    summaries = []
+    for group in groups.values():
+        runs = group.pop("runs")
+        tool_calls = group.pop("tool_calls")
+        retrieved_chunks = group.pop("retrieved_chunks")
+        total_tokens = group.pop("total_tokens")
+        step_seconds = group["tool_seconds"] + group["generation_seconds"]
+        summaries.append({
+            **group,
+            "tool_seconds": round(group["tool_seconds"], 1),
+            "generation_seconds": round(group["generation_seconds"], 1),
+            "runs": runs,
+            "tool_calls_per_run": round(tool_calls / runs, 2),
+            "chunks_per_run": round(retrieved_chunks / runs, 1),
+            "tool_time_share": round(group["tool_seconds"] / step_seconds, 2) if step_seconds else 0.0,
+            "tokens_per_run": round(total_tokens / runs),
+        })
+    return sorted(summaries, key=lambda summary: -summary["tool_seconds"])
+
+def format_run_profile_report(records: List[Dict[str, Any]], top_prompts: int = 10) -> str:
+    """
+    Renders the aggregated run profiles as a plain-text report: per agent, per agent and round, and the prompts
+    with the most tool time.
+
+    Parameters:
+    - records: The records written by `record_run_profile`.
+    - top_prompts: The number of prompts listed.
+
+    Returns:
+    - str: The report.
+    """
+    columns = ["runs", "tool_calls_per_run", "file_search_calls", "code_interpreter_calls", "chunks_per_run",
+               "tool_seconds", "generation_seconds", "tool_time_share", "tokens_per_run"]
+    sections = [
+        ("Per agent", ("agent",), None),
+        ("Per agent and round", ("agent", "round"), None),
+        (f"Top {top_prompts} prompts by tool time", ("prompt",), top_prompts),
+    ]
+
+    lines = [f"{len(records)} profiled runs"]
+    for title, group_by, limit in sections:
+        lines += ["", title]
+        lines.append(" | ".join([f"{' / '.join(group_by):>40}"] + [f"{column:>22}" for column in columns]))
+        for summary in aggregate_run_profiles(records, group_by)[:limit]:
+            label = " / ".join(str(summary[field]) for field in group_by)
+            lines.append(" | ".join([f"{label[:40]:>40}"] + [f"{summary[column]:>22}" for column in columns]))
+    return "\n".join(lines)
@@ -0,0 +1,76 @@
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+
+# Messages requested per page (API maximum)
+MESSAGE_PAGE_SIZE = 100
+# Maximum number of threads whose cursor is remembered
+MAX_TRACKED_THREADS = 1024
+
+# Process-wide cursors: thread ID -> ID of the newest message already read
+_cursor_lock = threading.Lock()
+_cursors: "OrderedDict[str, str]" = OrderedDict()
+
+def _get_cursor(thread_id: str) -> Optional[str]:
+    with _cursor_lock:
+        return _cursors.get(thread_id)
+
+def _set_cursor(thread_id: str, message_id: str) -> None:
+    with _cursor_lock:
+        _cursors[thread_id] = message_id
+        _cursors.move_to_end(thread_id)
+        while len(_cursors) > MAX_TRACKED_THREADS:
+            _cursors.popitem(last=False)
+
+def _build_list_params(thread_id: str, run_id: Optional[str], limit: int) -> Dict[str, Any]:
+    params = {"thread_id": thread_id, "order": "asc", "limit": limit}
+    cursor = _get_cursor(thread_id)
+    if cursor:
+        params["after"] = cursor
+    if run_id:
+        params["run_id"] = run_id
+    return params
+
+def _advance_cursor(thread_id: str, messages: List[Any]) -> List[Any]:
+    if messages:
+        _set_cursor(thread_id, messages[-1].id)
+    logging.info(f"Fetched {len(messages)} new messages from thread {thread_id}.")
+    # Newest first, matching the default order of messages.list
+    return messages[::-1]
+
+def fetch_new_messages(api_client: Any, thread_id: str, run_id: Optional[str] = None, limit: int = MESSAGE_PAGE_SIZE) -> List[Any]:
+    """
+    Fetches only the messages of a thread that are newer than the last message read from it.
+
+    Parameters:
+    - api_client: The API client object for interacting with the OpenAI service.
+    - thread_id: The ID of the thread to read.
+    - run_id: Optional ID of a run; only messages created by that run are returned.
+    - limit: Page size of the message listing.
+
+    Returns:
+    - List of new message objects, newest first.
+    """
+    params = _build_list_params(thread_id, run_id, limit)
+    return _advance_cursor(thread_id, list(api_client.beta.threads.messages.list(**params)))
+
+async def async_fetch_new_messages(async_client: Any, thread_id: str, run_id: Optional[str] = None, limit: int = MESSAGE_PAGE_SIZE) -> List[Any]:
+    """
+    Asynchronous counterpart of `fetch_new_messages` for an `AsyncOpenAI` client.
+
+    Parameters:
+    - async_client: The asynchronous API client object.
+    - thread_id: The ID of the thread to read.
+    - run_id: Optional ID of a run; only messages created by that run are returned.
+    - limit: Page size of the message listing.
+
+    Returns:
+    - List of new message objects, newest first.
+    """
+    params = _build_list_params(thread_id, run_id, limit)
+    messages = [message async for message in async_client.beta.threads.messages.list(**params)]
+    return _advance_cursor(thread_id, messages)
@@ -0,0 +1,242 @@
+import os
+import time
+import sqlite3
+import logging
+import threading
+import contextvars
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+
+# Location of the on-disk usage ledger
+TOKEN_USAGE_PATH = os.path.join(".cache", "token_usage.sqlite3")
+# USD per million prompt and completion tokens; unknown models are priced like DEFAULT_MODEL_PRICES
+MODEL_PRICES = {
+    "gpt-4o-mini": {"prompt": 0.15, "completion": 0.60},
+    "gpt-4o": {"prompt": 2.50, "completion": 10.00},
+}
+DEFAULT_MODEL_PRICES = {"prompt": 2.50, "completion": 10.00}
+# Columns the usage can be aggregated by
+USAGE_GROUP_COLUMNS = ("day", "session_id", "conversation_id", "round_number", "agent", "model")
+
+# Run parameters of the cheaper mode a conversation can switch to near its budget: no tool calls (file_search
+# results are the bulk of the prompt tokens) and only the latest messages of the thread as context
+ECONOMY_RUN_PARAMS = {"tools": [], "truncation_strategy": {"type": "last_messages", "last_messages": 4}}
+
+_ledger_lock = threading.Lock()
+# The innermost usage scope of the current thread or asyncio task
+_current_scope: contextvars.ContextVar[Optional["UsageScope"]] = contextvars.ContextVar("current_usage_scope", default=None)
+
+class UsageScope:
+    """
+    Running token and cost totals of a session, conversation or round; runs count towards every enclosing scope.
+    """
+
+    def __init__(self, labels: Dict[str, Any], parent: Optional["UsageScope"]):
+        self.labels = {**(parent.labels if parent else {}), **labels}
+        self.parent = parent
+        self.lock = threading.Lock()
+        self.runs = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.total_tokens = 0
+        self.cost = 0.0
+        self.max_run_tokens = 0
+        self.last_run_tokens = 0
+
+    def add(self, prompt_tokens: int, completion_tokens: int, cost: float) -> None:
+        with self.lock:
+            self.runs += 1
+            self.prompt_tokens += prompt_tokens
+            self.completion_tokens += completion_tokens
+            self.total_tokens += prompt_tokens + completion_tokens
+            self.cost += cost
+            self.max_run_tokens = max(self.max_run_tokens, prompt_tokens + completion_tokens)
+            self.last_run_tokens = prompt_tokens + completion_tokens
+
+    def add_previous_usage(self, summary: Dict[str, Any]) -> None:
+        """
+        Starts the totals from usage recorded before the scope was opened (e.g., by an interrupted attempt of the
+        same conversation); the enclosing scopes are not changed.
+
+        Parameters:
+        - summary: A single group returned by `get_usage_summary`.
+        """
+        with self.lock:
+            self.runs += summary["runs"]
+            self.prompt_tokens += summary["prompt_tokens"]
+            self.completion_tokens += summary["completion_tokens"]
+            self.total_tokens += summary["total_tokens"]
+            self.cost += summary["cost"]
+            self.max_run_tokens = max(self.max_run_tokens, summary["max_run_tokens"])
+
+@contextmanager
+def usage_scope(**labels: Any) -> Iterator[UsageScope]:
+    """
+    Opens a usage scope nested in the current one; runs recorded inside it are labelled with `labels`.
+
+    Parameters:
+    - labels: Any of 'session_id', 'conversation_id' and 'round_number'.
+
+    Returns:
+    - Context manager yielding the scope, whose totals cover the runs recorded inside it.
+    """
+    scope = UsageScope(labels, _current_scope.get())
+    token = _current_scope.set(scope)
+    try:
+        yield scope
+    finally:
+        _current_scope.reset(token)
+
+def current_day() -> str:
+    """
+    Returns the day usage is attributed to now ('YYYY-MM-DD', local time).
+    """
+    return time.strftime("%Y-%m-%d")
+
+def estimate_cost(model: str, prompt_tokens: int, completion_tokens: int) -> float:
+    """
+    Estimates the price of a request from its token counts.
+
+    Parameters:
+    - model: The model the tokens were billed to.
+    - prompt_tokens: The number of input tokens.
+    - completion_tokens: The number of output tokens.
+
+    Returns:
+    - float: The estimated cost in USD.
+    """
+    prices = MODEL_PRICES.get(model, DEFAULT_MODEL_PRICES)
+    return (prompt_tokens * prices["prompt"] + completion_tokens * prices["completion"]) / 1_000_000
+
+def _connect(store_path: str) -> sqlite3.Connection:
+    os.makedirs(os.path.dirname(store_path) or ".", exist_ok=True)
+    connection = sqlite3.connect(store_path)
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute(
+        """
+        CREATE TABLE IF NOT EXISTS run_usage (
+            run_id TEXT PRIMARY KEY,
+            recorded_at REAL NOT NULL,
+            day TEXT NOT NULL,
+            session_id TEXT,
+            conversation_id TEXT,
+            round_number INTEGER,
+            agent TEXT NOT NULL,
+            model TEXT NOT NULL,
+            prompt_tokens INTEGER NOT NULL,
+            completion_tokens INTEGER NOT NULL,
+            total_tokens INTEGER NOT NULL,
+            cost REAL NOT NULL
+        )
+        """
+    )
+    connection.execute("CREATE INDEX IF NOT EXISTS run_usage_by_day ON run_usage (day)")
+    return connection
+
+def record_run_usage(run: Any, agent_name: str, store_path: str = TOKEN_USAGE_PATH) -> Optional[Dict[str, Any]]:
+    """
+    Records the token usage of a finished run in the ledger and in the enclosing usage scopes.
+
+    Parameters:
+    - run: The run object in its terminal status.
+    - agent_name: The name of the assistant that executed the run.
+    - store_path: Path of the SQLite ledger file.
+
+    Returns:
+    - Dict with the recorded row, or None if the run reported no usage.
+    """
+    usage = getattr(run, "usage", None)
+    if usage is None:
+        return None
+    scope = _current_scope.get()
+    labels = scope.labels if scope else {}
+    model = getattr(run, "model", None) or "unknown"
+    prompt_tokens = getattr(usage, "prompt_tokens", 0) or 0
+    completion_tokens = getattr(usage, "completion_tokens", 0) or 0
+    now = time.time()
+    record = {
+        "run_id": run.id,
+        "recorded_at": now,
+        "day": current_day(),
+        "session_id": labels.get("session_id"),
+        "conversation_id": labels.get("conversation_id"),
+        "round_number": labels.get("round_number"),
+        "agent": agent_name or "unknown",
+        "model": model,
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "total_tokens": prompt_tokens + completion_tokens,
+        "cost": estimate_cost(model, prompt_tokens, completion_tokens),
+    }
+
+    while scope is not None:
+        scope.add(prompt_tokens, completion_tokens, record["cost"])
+        scope = scope.parent
+
+    try:
+        with _ledger_lock:
+            connection = _connect(store_path)
+            with connection:
+                connection.execute(f"INSERT OR IGNORE INTO run_usage VALUES ({', '.join('?' * len(record))})", tuple(record.values()))
+            connection.close()
+    except sqlite3.Error as error:
+        logging.error(f"Error recording the usage of run {run.id}: {error}")
+    return record
+
+def get_usage_summary(
+    group_by: Sequence[str] = ("agent",),
+    day: Optional[str] = None,
+    session_id: Optional[str] = None,
+    conversation_id: Optional[str] = None,
+    store_path: str = TOKEN_USAGE_PATH
+) -> List[Dict[str, Any]]:
+    """
+    Aggregates the recorded usage, optionally filtered by day, session or conversation.
+
+    Parameters:
+    - group_by: Columns to group by, from USAGE_GROUP_COLUMNS; an empty sequence gives one overall total.
+    - day: Optional day ('YYYY-MM-DD', local time) to restrict the usage to.
+    - session_id: Optional session to restrict the usage to.
+    - conversation_id: Optional conversation to restrict the usage to.
+    - store_path: Path of the SQLite ledger file.
+
+    Returns:
+    - List of dicts with the group columns, 'runs', 'prompt_tokens', 'completion_tokens', 'total_tokens',
+      'cost' and 'max_run_tokens', most expensive first.
+    """
+    unknown_columns = set(group_by) - set(USAGE_GROUP_COLUMNS)
+    if unknown_columns:
+        raise ValueError(f"Cannot group usage by {sorted(unknown_columns)}; use {USAGE_GROUP_COLUMNS}.")
+
+    filters = {"day": day, "session_id": session_id, "conversation_id": conversation_id}
+    conditions = [f"{column} = ?" for column, value in filters.items() if value is not None]
+    parameters = [value for value in filters.values() if value is not None]
+    columns = list(group_by)
+    aggregates = ["COUNT(*)"] + [f"COALESCE(SUM({column}), 0)" for column in ("prompt_tokens", "completion_tokens", "total_tokens", "cost")]
+    aggregates.append("COALESCE(MAX(total_tokens), 0)")
+    query = f"SELECT {', '.join(columns + aggregates)} FROM run_usage"
+    if conditions:
+        query += f" WHERE {' AND '.join(conditions)}"
+    if columns:
+        query += f" GROUP BY {', '.join(columns)}"
+    with _ledger_lock:
+        connection = _connect(store_path)
+        rows = connection.execute(query, parameters).fetchall()
+        connection.close()
+
+    summary = []
+    for row in rows:
+        runs, prompt_tokens, completion_tokens, total_tokens, cost, max_run_tokens = row[len(columns):]
+        summary.append({
+            **dict(zip(columns, row[:len(columns)])),
+            "runs": runs,
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": total_tokens,
+            "cost": round(cost, 6),
+            "max_run_tokens": max_run_tokens,
+        })
+    return sorted(summary, key=lambda group: -group["cost"])
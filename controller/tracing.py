@@ -0,0 +1,238 @@
+import os
+import json
+import time
+import uuid
+import logging
+import threading
+import contextvars
+from collections import OrderedDict
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Iterator, List, Optional
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+
+# Finished traces are written here as one JSON file per trace
+TRACE_EXPORT_DIR = os.path.join(".cache", "traces")
+# Finished traces kept in memory for the sidebar waterfall
+MAX_TRACES_IN_MEMORY = 50
+# Upper bounds (seconds) of the Prometheus duration histogram buckets
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+METRIC_PREFIX = "agents4ethicalse"
+
+# The innermost open span of the current thread or asyncio task
+_current_span: contextvars.ContextVar[Optional["Span"]] = contextvars.ContextVar("current_span", default=None)
+
+class Span:
+    """
+    One timed operation of a trace (e.g., a conversation, a round, an agent turn or an API call).
+    """
+
+    def __init__(self, name: str, kind: str, parent: Optional["Span"], attributes: Dict[str, Any]):
+        self.name = name
+        self.kind = kind
+        self.trace_id = parent.trace_id if parent else uuid.uuid4().hex
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent.span_id if parent else None
+        self.attributes = attributes
+        self.start_time = time.time()
+        self.duration = None
+        self.error = None
+        self._started = time.perf_counter()
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    def finish(self) -> None:
+        self.duration = time.perf_counter() - self._started
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "kind": self.kind,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "start_time": self.start_time,
+            "duration_seconds": round(self.duration, 6) if self.duration is not None else None,
+            "attributes": self.attributes,
+            "error": self.error,
+        }
+
+class Tracer:
+    """
+    Thread-safe collector of spans: keeps recent traces in memory, exports finished ones to JSON files and
+    aggregates span durations for the Prometheus endpoint.
+    """
+
+    def __init__(self, export_dir: Optional[str] = TRACE_EXPORT_DIR, max_traces: int = MAX_TRACES_IN_MEMORY):
+        self.export_dir = export_dir
+        self.max_traces = max_traces
+        self.lock = threading.Lock()
+        self.traces: "OrderedDict[str, List[Span]]" = OrderedDict()
+        # (kind, name) -> {"buckets": [...], "sum": float, "count": int, "errors": int}
+        self.histograms: Dict[tuple, Dict[str, Any]] = {}
+
+    @contextmanager
+    def span(self, name: str, kind: str = "internal", **attributes: Any) -> Iterator[Span]:
+        """
+        Times the enclosed block as a span nested under the current span, if any.
+
+        Parameters:
+        - name: The operation name (e.g., 'round', 'Messages.create').
+        - kind: The span category: 'conversation', 'round', 'turn', 'api', 'wait' or 'internal'.
+        - attributes: Values recorded with the span (e.g., the agent name or the thread ID).
+
+        Returns:
+        - Context manager yielding the open span.
+        """
+        span = Span(name, kind, _current_span.get(), attributes)
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as error:
+            span.error = f"{type(error).__name__}: {error}"
+            raise
+        finally:
+            _current_span.reset(token)
+            span.finish()
+            self._record(span)
+
+    def _record(self, span: Span) -> None:
+        # Single API calls outside any conversation or session step are only aggregated, so the ones made on every
+        # rerun never evict the traces of running conversations
+        standalone_call = span.parent_id is None and span.kind == "api"
+        with self.lock:
+            spans = None
+            if not standalone_call:
+                spans = self.traces.setdefault(span.trace_id, [])
+                spans.append(span)
+                self.traces.move_to_end(span.trace_id)
+                while len(self.traces) > self.max_traces:
+                    self.traces.popitem(last=False)
+
+            histogram = self.histograms.setdefault((span.kind, span.name), {"buckets": [0] * len(DURATION_BUCKETS), "sum": 0.0, "count": 0, "errors": 0})
+            for index, upper_bound in enumerate(DURATION_BUCKETS):
+                if span.duration <= upper_bound:
+                    histogram["buckets"][index] += 1
+            histogram["sum"] += span.duration
+            histogram["count"] += 1
+            if span.error:
+                histogram["errors"] += 1
+
+            export = span.parent_id is None and not standalone_call and self.export_dir
+            trace = [recorded.to_dict() for recorded in spans] if export else None
+        if trace:
+            self._export(span.trace_id, trace)
+
+    def _export(self, trace_id: str, trace: List[Dict[str, Any]]) -> None:
+        try:
+            os.makedirs(self.export_dir, exist_ok=True)
+            with open(os.path.join(self.export_dir, f"{trace_id}.json"), "w", encoding="utf-8") as file:
+                json.dump(sorted(trace, key=lambda span: span["start_time"]), file, indent=2, default=str)
+        except OSError as error:
+            logging.error(f"Error exporting trace {trace_id}: {error}")
+
+    def get_trace(self, trace_id: str) -> List[Dict[str, Any]]:
+        """
+        Returns the finished spans of a trace kept in memory.
+
+        Parameters:
+        - trace_id: The ID of the trace.
+
+        Returns:
+        - List of span dicts (see `Span.to_dict`) ordered by start time; empty if the trace is unknown.
+        """
+        with self.lock:
+            spans = [span.to_dict() for span in self.traces.get(trace_id, [])]
+        return sorted(spans, key=lambda span: span["start_time"])
+
+    def prometheus_text(self) -> str:
+        """
+        Renders the span duration histograms in the Prometheus text exposition format.
+
+        Returns:
+        - str: The metrics page.
+        """
+        with self.lock:
+            histograms = {key: {**value, "buckets": list(value["buckets"])} for key, value in self.histograms.items()}
+
+        duration_metric = f"{METRIC_PREFIX}_span_duration_seconds"
+        error_metric = f"{METRIC_PREFIX}_span_errors_total"
+        lines = [
+            f"# HELP {duration_metric} Duration of traced operations.",
+            f"# TYPE {duration_metric} histogram",
+        ]
+        for (kind, name), histogram in sorted(histograms.items()):
+            labels = f'kind="{kind}",name="{_escape_label(name)}"'
+            for upper_bound, count in zip(DURATION_BUCKETS, histogram["buckets"]):
+                lines.append(f'{duration_metric}_bucket{{{labels},le="{upper_bound}"}} {count}')
+            lines.append(f'{duration_metric}_bucket{{{labels},le="+Inf"}} {histogram["count"]}')
+            lines.append(f"{duration_metric}_sum{{{labels}}} {histogram['sum']:.6f}")
+            lines.append(f"{duration_metric}_count{{{labels}}} {histogram['count']}")
+        lines += [
+            f"# HELP {error_metric} Traced operations that raised an exception.",
+            f"# TYPE {error_metric} counter",
+        ]
+        for (kind, name), histogram in sorted(histograms.items()):
+            lines.append(f'{error_metric}{{kind="{kind}",name="{_escape_label(name)}"}} {histogram["errors"]}')
+        return "\n".join(lines) + "\n"
+
+def _escape_label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+_tracer = Tracer()
+
+def get_tracer() -> Tracer:
+    """
+    Returns the tracer shared by the whole process.
+
+    Returns:
+    - Tracer: The process-wide tracer.
+    """
+    return _tracer
+
+def get_current_trace_id() -> Optional[str]:
+    """
+    Returns the trace ID of the innermost open span of the caller, if any.
+
+    Returns:
+    - Optional[str]: The trace ID, or None outside any span.
+    """
+    span = _current_span.get()
+    return span.trace_id if span else None
+
+def start_metrics_server(port: int, host: str = "127.0.0.1", tracer: Optional[Tracer] = None) -> ThreadingHTTPServer:
+    """
+    Serves the tracer's metrics at /metrics for Prometheus from a daemon thread.
+
+    Parameters:
+    - port: The port to listen on (0 picks a free one).
+    - host: The interface to bind.
+    - tracer: The tracer to expose; defaults to the process-wide one.
+
+    Returns:
+    - ThreadingHTTPServer: The running server; call `shutdown()` to stop it.
+    """
+    tracer = tracer or get_tracer()
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = tracer.prometheus_text().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass  # One line per scrape is noise
+
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    threading.Thread(target=server.serve_forever, name="trace-metrics-server", daemon=True).start()
+    logging.info(f"Serving trace metrics at http://{host}:{server.server_address[1]}/metrics")
+    return server
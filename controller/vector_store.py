@@ -1,9 +1,13 @@
 import logging
+import threading
 from typing import Tuple, Optional, Any
 
 # Configure the logger
 logging.basicConfig(level=logging.INFO)
 
+# Sessions starting together would otherwise each create a store with the same name
+_initialize_lock = threading.Lock()
+
 def initialize_vector_store(api_client: Any, vector_store_name: str) -> Tuple[Optional[Any], bool]:
     """
     Creates or retrieves a vector store by name.
@@ -17,19 +21,20 @@ def initialize_vector_store(api_client: Any, vector_store_name: str) -> Tuple[Op
       whether it was newly already existed (True) or not (False). Returns (None, True) if an error occurs.
     """
     try:
-        # Retrieve list of existing vector stores
-        vector_stores = api_client.vector_stores.list()
-        # Check if a store with the given name already exists
-        existing_store = next((store for store in vector_stores if store.name == vector_store_name), None)
-        
-        if existing_store:
-            logging.info(f"Vector store '{vector_store_name}' already exists with ID: {existing_store.id}")
-            return existing_store, True
-
-        # Create a new vector store if it doesn't exist
-        vector_store = api_client.vector_stores.create(name=vector_store_name)
-        logging.info(f"New vector store created with ID: {vector_store.id}")
-        return vector_store, False
+        with _initialize_lock:
+            # Retrieve list of existing vector stores
+            vector_stores = api_client.vector_stores.list()
+            # Check if a store with the given name already exists
+            existing_store = next((store for store in vector_stores if store.name == vector_store_name), None)
+
+            if existing_store:
+                logging.info(f"Vector store '{vector_store_name}' already exists with ID: {existing_store.id}")
+                return existing_store, True
+
+            # Create a new vector store if it doesn't exist
+            vector_store = api_client.vector_stores.create(name=vector_store_name)
+            logging.info(f"New vector store created with ID: {vector_store.id}")
+            return vector_store, False
 
     except (AttributeError, TypeError, ValueError) as error:
         logging.error(f"Error creating or retrieving vector store: {error}")
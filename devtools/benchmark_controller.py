@@ -0,0 +1,184 @@
+"""
+Micro-benchmarks of the controller layer against the local mock server.
+
+Each benchmark calls one controller function repeatedly and reports, per call, the p50/p95 latency, the API
+calls it made (by endpoint) and the bytes sent and received, as counted by the mock server. Call counts and
+bytes are deterministic, so they catch regressions such as a lost cache or an extra listing exactly; latencies
+depend on the machine and on the configured latency distributions.
+
+The clients are plain tuned clients without the rate limiter, so queueing does not blur the numbers.
+
+Usage:
+    python -m devtools.benchmark_controller --iterations 20
+    python -m devtools.benchmark_controller --latency-profile realistic --iterations 5 --json results.json
+    python -m devtools.benchmark_controller --baseline results.json  # exits with status 1 on a regression
+"""
+import os
+import sys
+import json
+import time
+import uuid
+import logging
+import argparse
+import tempfile
+import statistics
+
+from controller.client_factory import create_openai_client
+from controller.assistant_registry import invalidate_assistant_registry
+from controller.agent import create_agent
+from controller.file import upload_pdfs_to_vector_store
+from controller.async_runtime import run_async
+from controller.input_guardrail import topical_guardrail_for_risk_assessment, ASSISTANT_INSTRUCTIONS
+from controller.conversation import create_conversation_thread, generate_agent_response
+from devtools.mock_openai_server import start_mock_server, parse_latency_arguments, LATENCY_PROFILES
+
+from view.format_response import extract_response_with_citations
+
+# Relative increase of p95 latency or bytes per call reported as a regression
+DEFAULT_TOLERANCE = 0.25
+# Latency differences below this (ms) are noise on a local server and never count as a regression
+LATENCY_NOISE_MS = 2.0
+
+AGENT_ROLE = "You are a data scientist building the ranking model."
+PROJECT_DESCRIPTION = "An AI system that ranks job applicants from their CVs and schedules interviews with the best ones."
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+def measure(name, function, iterations, state):
+    # Runs `function(iteration)` and attributes the mock server's counters to it
+    state.reset_stats()
+    latencies = []
+    for iteration in range(iterations):
+        started = time.perf_counter()
+        function(iteration)
+        latencies.append(time.perf_counter() - started)
+    stats = state.get_stats()
+
+    return {
+        "benchmark": name,
+        "iterations": iterations,
+        "p50_ms": round(statistics.median(latencies) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 2),
+        "api_calls_per_call": round(sum(endpoint["calls"] for endpoint in stats.values()) / iterations, 2),
+        "request_bytes_per_call": round(sum(endpoint["bytes_in"] for endpoint in stats.values()) / iterations),
+        "response_bytes_per_call": round(sum(endpoint["bytes_out"] for endpoint in stats.values()) / iterations),
+        "calls_by_endpoint": {endpoint: round(counters["calls"] / iterations, 2) for endpoint, counters in sorted(stats.items())},
+    }
+
+def write_pdfs(directory, count, size_kb):
+    # The upload path never parses the files, so random bytes behave like PDFs of the same size
+    for index in range(count):
+        with open(os.path.join(directory, f"document_{index}.pdf"), "wb") as file:
+            file.write(os.urandom(size_kb * 1024))
+
+def run_benchmarks(api_client, async_api_client, state, args):
+    results = []
+    vector_store = api_client.vector_stores.create(name="benchmark")
+
+    with tempfile.TemporaryDirectory() as pdf_directory:
+        write_pdfs(pdf_directory, args.pdfs, args.pdf_kb)
+        results.append(measure("upload_pdfs_to_vector_store (all changed)", lambda iteration: (
+            write_pdfs(pdf_directory, args.pdfs, args.pdf_kb),
+            upload_pdfs_to_vector_store(api_client, vector_store.id, pdf_directory),
+        ), args.iterations, state))
+        results.append(measure("upload_pdfs_to_vector_store (unchanged)", lambda iteration: (
+            upload_pdfs_to_vector_store(api_client, vector_store.id, pdf_directory)
+        ), args.iterations, state))
+
+    invalidate_assistant_registry()
+    results.append(measure("create_agent (new)", lambda iteration: (
+        create_agent(api_client, f"Agent {uuid.uuid4().hex[:8]}", AGENT_ROLE, args.model, vector_store.id)
+    ), args.iterations, state))
+    create_agent(api_client, "Data Scientist", AGENT_ROLE, args.model, vector_store.id)
+    results.append(measure("create_agent (reused)", lambda iteration: (
+        create_agent(api_client, "Data Scientist", AGENT_ROLE, args.model, vector_store.id)
+    ), args.iterations, state))
+
+    risk_agent = api_client.beta.assistants.create(name="RiskGuardAI", instructions=ASSISTANT_INSTRUCTIONS, model=args.model, temperature=0, top_p=0.5)
+    results.append(measure("topical_guardrail_for_risk_assessment", lambda iteration: (
+        run_async(topical_guardrail_for_risk_assessment(async_api_client, risk_agent, None, PROJECT_DESCRIPTION))
+    ), args.iterations, state))
+
+    agent = create_agent(api_client, "Data Scientist", AGENT_ROLE, args.model, vector_store.id)
+    agent = {"id": agent.id, "name": agent.name, "role": AGENT_ROLE}
+    thread = create_conversation_thread(api_client, vector_store.id)
+    results.append(measure("generate_agent_response", lambda iteration: (
+        generate_agent_response(api_client, agent, f"Round {iteration}: {PROJECT_DESCRIPTION}", thread)
+    ), args.iterations, state))
+
+    # The last agent reply, newest first as the app passes it
+    messages = api_client.beta.threads.messages.list(thread_id=thread.id, limit=1).data
+    results.append(measure("extract_response_with_citations", lambda iteration: (
+        extract_response_with_citations(api_client, messages)
+    ), args.iterations, state))
+    return results
+
+def compare_with_baseline(results, baseline, tolerance):
+    """
+    Compares results with a baseline written by --json.
+
+    Returns:
+    - List of regression descriptions; empty if there is none.
+    """
+    baseline_by_name = {result["benchmark"]: result for result in baseline}
+    regressions = []
+    for result in results:
+        previous = baseline_by_name.get(result["benchmark"])
+        if previous is None:
+            continue
+        if result["api_calls_per_call"] > previous["api_calls_per_call"]:
+            regressions.append(f"{result['benchmark']}: {previous['api_calls_per_call']} -> {result['api_calls_per_call']} API calls per call")
+        for metric in ("request_bytes_per_call", "response_bytes_per_call"):
+            if result[metric] > previous[metric] * (1 + tolerance):
+                regressions.append(f"{result['benchmark']}: {metric} {previous[metric]} -> {result[metric]}")
+        if result["p95_ms"] > previous["p95_ms"] * (1 + tolerance) + LATENCY_NOISE_MS:
+            regressions.append(f"{result['benchmark']}: p95 {previous['p95_ms']}ms -> {result['p95_ms']}ms")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the controller functions against the local mock server.")
+    parser.add_argument("--iterations", type=int, default=20, help="Calls per benchmark.")
+    parser.add_argument("--model", default="gpt-4o-mini")
+    parser.add_argument("--pdfs", type=int, default=4, help="PDF files in the upload benchmarks.")
+    parser.add_argument("--pdf-kb", type=int, default=256, help="Size of each PDF file in KB.")
+    parser.add_argument("--latency-profile", choices=sorted(LATENCY_PROFILES), default="none", help="Latencies of the mock server.")
+    parser.add_argument("--latency", action="append", default=[], metavar="GROUP=SPEC", help="Latency override of an endpoint group; repeatable.")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the mock server's latency sampling.")
+    parser.add_argument("--json", help="Write the results to this file.")
+    parser.add_argument("--baseline", help="Results file of an earlier run to compare with.")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE, help="Allowed relative increase of p95 latency and bytes.")
+    args = parser.parse_args()
+    # One log line per request would dominate the measurement
+    logging.getLogger().setLevel(logging.WARNING)
+
+    server, base_url = start_mock_server(latencies=parse_latency_arguments(args.latency_profile, args.latency), seed=args.seed)
+    try:
+        api_client = create_openai_client("mock", base_url=base_url, max_retries=0)
+        async_api_client = create_openai_client("mock", base_url=base_url, async_client=True, max_retries=0)
+        results = run_benchmarks(api_client, async_api_client, server.RequestHandlerClass.state, args)
+    finally:
+        server.shutdown()
+
+    columns = ["benchmark", "p50_ms", "p95_ms", "api_calls_per_call", "request_bytes_per_call", "response_bytes_per_call"]
+    print(" | ".join(f"{column:>42}" if column == "benchmark" else f"{column:>18}" for column in columns))
+    for result in results:
+        print(" | ".join(f"{result[column]:>42}" if column == "benchmark" else f"{result[column]:>18}" for column in columns))
+        print(f"{'':>42}   " + ", ".join(f"{endpoint} x{calls}" for endpoint, calls in result["calls_by_endpoint"].items()))
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as file:
+            json.dump(results, file, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as file:
+            regressions = compare_with_baseline(results, json.load(file), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            sys.exit(1)
+        print("No regressions against the baseline.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Benchmarks the tuned, shared OpenAI client against default clients on the local mock server.
+
+The request pattern mimics the app: bursts of short retrieve calls from several sessions, where each Streamlit
+rerun used to build a new default client (and therefore new connections). Three setups are compared:
+- default client per rerun: `OpenAI(...)` with default settings, recreated for every rerun
+- default client, shared: one `OpenAI(...)` with default settings for the whole process
+- tuned client, shared: `create_openai_client(...)`, as cached by main.py
+
+Usage:
+    python -m devtools.benchmark_http_client --sessions 8 --reruns 20 --calls-per-rerun 10
+"""
+import time
+import logging
+import argparse
+import statistics
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+from openai import OpenAI
+
+from controller.client_factory import ConnectionMetrics, create_openai_client
+from devtools.mock_openai_server import start_mock_server
+
+def default_client(base_url, metrics):
+    # OpenAI's default pool settings, with the same trace hook so the metrics are comparable
+    def add_trace(request):
+        request.extensions["trace"] = metrics.trace
+    return OpenAI(api_key="mock", base_url=base_url, max_retries=0, http_client=httpx.Client(
+        limits=httpx.Limits(max_connections=1000, max_keepalive_connections=100),
+        timeout=httpx.Timeout(timeout=600.0, connect=5.0),
+        follow_redirects=True,
+        event_hooks={"request": [add_trace]},
+    ))
+
+def run_session(get_client, file_id, reruns, calls_per_rerun):
+    latencies = []
+    for _ in range(reruns):
+        client = get_client()
+        for _ in range(calls_per_rerun):
+            started = time.perf_counter()
+            client.files.retrieve(file_id)
+            latencies.append(time.perf_counter() - started)
+    return latencies
+
+def run_setup(name, get_client, metrics, file_id, args):
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.sessions) as executor:
+        futures = [executor.submit(run_session, get_client, file_id, args.reruns, args.calls_per_rerun) for _ in range(args.sessions)]
+        latencies = sorted(latency for future in futures for latency in future.result())
+    elapsed = time.perf_counter() - started
+
+    connection_stats = metrics.snapshot()
+    return {
+        "setup": name,
+        "requests": len(latencies),
+        "requests_per_second": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(statistics.median(latencies) * 1000, 2),
+        "p95_ms": round(latencies[int(len(latencies) * 0.95) - 1] * 1000, 2),
+        "connections": connection_stats["connections"],
+        "reuse_ratio": round(connection_stats["reuse_ratio"], 3),
+        "handshake_seconds": connection_stats["handshake_seconds"],
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the tuned shared OpenAI client with default clients on the mock server.")
+    parser.add_argument("--sessions", type=int, default=8, help="Concurrent sessions.")
+    parser.add_argument("--reruns", type=int, default=20, help="Reruns per session.")
+    parser.add_argument("--calls-per-rerun", type=int, default=10, help="API calls per rerun.")
+    args = parser.parse_args()
+    # One log line per request would dominate the measurement
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+
+    server, base_url = start_mock_server()
+    try:
+        file_id = OpenAI(api_key="mock", base_url=base_url).files.create(file=("probe.txt", b"probe"), purpose="assistants").id
+
+        per_rerun_metrics = ConnectionMetrics()
+        shared_default_metrics = ConnectionMetrics()
+        shared_default = default_client(base_url, shared_default_metrics)
+        tuned_metrics = ConnectionMetrics()
+        tuned = create_openai_client("mock", base_url=base_url, max_retries=0, metrics=tuned_metrics)
+
+        results = [
+            run_setup("default client per rerun", lambda: default_client(base_url, per_rerun_metrics), per_rerun_metrics, file_id, args),
+            run_setup("default client, shared", lambda: shared_default, shared_default_metrics, file_id, args),
+            run_setup("tuned client, shared", lambda: tuned, tuned_metrics, file_id, args),
+        ]
+    finally:
+        server.shutdown()
+
+    columns = list(results[0])
+    print(" | ".join(f"{column:>24}" if column == "setup" else f"{column:>19}" for column in columns))
+    for result in results:
+        print(" | ".join(f"{result[column]:>24}" if column == "setup" else f"{result[column]:>19}" for column in columns))
+
+if __name__ == "__main__":
+    main()
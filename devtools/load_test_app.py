@@ -0,0 +1,230 @@
+"""
+Concurrent-session load test of main.py against the local mock server.
+
+Drives N simulated sessions through the real script with Streamlit's testing API (AppTest), all inside one
+process like a single Streamlit server: every session loads the app, clicks helper prompts (which runs the
+risk assessment and a conversation round) and reruns the page. The sessions share the process-wide caches,
+clients and rate limiter exactly as browser sessions do.
+
+Reported per concurrency level: rerun latency percentiles per action, upstream API calls per session (and by
+endpoint), time spent queueing for the rate limiter, failed reruns and the process' peak RSS. Levels run in
+increasing order, so the peak RSS of a level includes everything before it.
+
+AppTest is not thread-safe on its own (it swaps the Runtime singleton, the secrets and a config patch on every
+run), so the sessions run on SharedRuntimeAppTest, which installs those globals once for the whole test. It
+relies on AppTest internals of the pinned Streamlit version.
+
+Usage:
+    python -m devtools.load_test_app --sessions 1,10,30
+    python -m devtools.load_test_app --sessions 30 --latency-profile realistic --prompts-per-session 2 --json load.json
+"""
+import os
+import json
+import time
+import random
+import logging
+import argparse
+import resource
+import tempfile
+from urllib import parse
+from contextlib import contextmanager
+from unittest.mock import MagicMock
+from concurrent.futures import ThreadPoolExecutor
+
+import streamlit as st
+import streamlit.logger
+from streamlit.runtime import Runtime
+from streamlit.runtime.secrets import Secrets
+from streamlit.runtime.scriptrunner.script_cache import ScriptCache
+from streamlit.runtime.media_file_manager import MediaFileManager
+from streamlit.runtime.memory_media_file_storage import MemoryMediaFileStorage
+from streamlit.runtime.caching.storage.dummy_cache_storage import MemoryCacheStorageManager
+from streamlit.testing.v1 import AppTest
+from streamlit.testing.v1.local_script_runner import LocalScriptRunner
+from streamlit.testing.v1.util import patch_config_options
+
+from controller.assistant_registry import invalidate_assistant_registry
+from controller.rate_limiter import get_rate_limiter
+from devtools.mock_openai_server import start_mock_server, parse_latency_arguments, LATENCY_PROFILES
+
+REPOSITORY_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MAIN_SCRIPT = os.path.join(REPOSITORY_DIR, "main.py")
+# Read by main.py relative to the working directory; everything else there (the .cache) starts empty
+APP_DATA_DIRS = ("agent_role_examples", "pdf_data_sources")
+HELPER_PROMPTS = ("AI Surveillance", "Predictive Policing", "Content Moderation", "Library Information")
+# One compiled main.py for all sessions, as the server's runtime keeps it; concurrent compiles of the same
+# script also trip CPython 3.11's AST recursion check
+SHARED_SCRIPT_CACHE = ScriptCache()
+
+class SharedRuntimeAppTest(AppTest):
+    """
+    AppTest whose runs only execute the script; the runtime globals are installed once by `shared_app_test_runtime`.
+    """
+
+    def _run(self, widget_state=None, timeout=None):
+        script_runner = LocalScriptRunner(self._script_path, self.session_state, args=self.args, kwargs=self.kwargs)
+        script_runner._script_cache = SHARED_SCRIPT_CACHE
+        self._tree = script_runner.run(widget_state, self.query_params, timeout or self.default_timeout, self._page_hash)
+        self._tree._runner = self
+        # Last event is SHUTDOWN, so the corresponding data includes the query string
+        self.query_params = parse.parse_qs(script_runner.event_data[-1]["client_state"].query_string)
+        return self
+
+@contextmanager
+def shared_app_test_runtime(secrets):
+    # What AppTest sets up and tears down around every run, installed once for all sessions
+    mock_runtime = MagicMock(spec=Runtime)
+    mock_runtime.media_file_mgr = MediaFileManager(MemoryMediaFileStorage("/mock/media"))
+    mock_runtime.cache_storage_manager = MemoryCacheStorageManager()
+    saved_secrets = st.secrets
+    shared_secrets = Secrets([])
+    shared_secrets._secrets = secrets
+    Runtime._instance = mock_runtime
+    st.secrets = shared_secrets
+    try:
+        # Per-rerun debug lines would dominate the output
+        with patch_config_options({"global.appTest": True, "logger.level": "error"}):
+            streamlit.logger.set_log_level("error")
+            yield
+    finally:
+        st.secrets = saved_secrets
+        Runtime._instance = None
+
+@contextmanager
+def app_working_directory():
+    # A fresh working directory per level, so the risk cache, conversation store and chunk manifest start empty
+    previous_directory = os.getcwd()
+    with tempfile.TemporaryDirectory() as working_directory:
+        for data_dir in APP_DATA_DIRS:
+            os.symlink(os.path.join(REPOSITORY_DIR, data_dir), os.path.join(working_directory, data_dir))
+        os.chdir(working_directory)
+        try:
+            yield working_directory
+        finally:
+            os.chdir(previous_directory)
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)] if ordered else 0.0
+
+def timed_rerun(samples, action, run):
+    # Records one rerun; timeouts and uncaught app exceptions count as errors
+    started = time.perf_counter()
+    error = None
+    try:
+        app = run()
+        if app.exception:
+            error = app.exception[0].value
+    except Exception as exception:
+        error = str(exception)
+    samples.append({"action": action, "seconds": time.perf_counter() - started, "error": error})
+
+def run_session(session_index, args, samples):
+    # Not AppTest.from_file, which always builds a plain AppTest
+    app = SharedRuntimeAppTest(MAIN_SCRIPT, default_timeout=args.timeout)
+    timed_rerun(samples, "initial load", app.run)
+
+    # Sessions start on different prompts, as a workshop would
+    for prompt_index in range(args.prompts_per_session):
+        time.sleep(random.uniform(0, args.think_time))
+        label = HELPER_PROMPTS[(session_index + prompt_index) % len(HELPER_PROMPTS)]
+        button = next((button for button in app.button if button.label == label), None)
+        if button is None:
+            samples.append({"action": "helper prompt", "seconds": 0.0, "error": f"Helper prompt '{label}' not rendered."})
+            return
+        timed_rerun(samples, "helper prompt", button.click().run)
+        for _ in range(args.reruns_per_prompt):
+            time.sleep(random.uniform(0, args.think_time))
+            timed_rerun(samples, "rerun", app.run)
+
+def run_level(sessions, args):
+    server, base_url = start_mock_server(latencies=parse_latency_arguments(args.latency_profile, args.latency), seed=args.seed)
+    # The app's cached clients pick the mock server up from the environment
+    os.environ["OPENAI_BASE_URL"] = base_url
+    st.cache_resource.clear()
+    invalidate_assistant_registry()
+    queue_seconds_before = get_rate_limiter().get_stats()["queue_seconds"]
+
+    samples = []
+    started = time.perf_counter()
+    try:
+        with app_working_directory(), ThreadPoolExecutor(max_workers=sessions) as executor:
+            futures = []
+            for session_index in range(sessions):
+                futures.append(executor.submit(run_session, session_index, args, samples))
+                time.sleep(args.ramp_up / sessions)
+            for future in futures:
+                future.result()
+        elapsed = time.perf_counter() - started
+        stats = server.RequestHandlerClass.state.get_stats()
+    finally:
+        server.shutdown()
+
+    upstream_calls = sum(endpoint["calls"] for endpoint in stats.values())
+    result = {
+        "sessions": sessions,
+        "reruns": len(samples),
+        "failed_reruns": sum(1 for sample in samples if sample["error"]),
+        "reruns_per_second": round(len(samples) / elapsed, 2),
+        "upstream_calls_per_session": round(upstream_calls / sessions, 1),
+        "rate_limiter_queue_seconds": round(get_rate_limiter().get_stats()["queue_seconds"] - queue_seconds_before, 2),
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "latency_by_action": {},
+        "upstream_calls_by_endpoint": {endpoint: counters["calls"] for endpoint, counters in sorted(stats.items(), key=lambda item: -item[1]["calls"])},
+        "errors": sorted({str(sample["error"]) for sample in samples if sample["error"]}),
+    }
+    for action in ("initial load", "helper prompt", "rerun", "all"):
+        latencies = [sample["seconds"] for sample in samples if action in ("all", sample["action"])]
+        if latencies:
+            result["latency_by_action"][action] = {
+                "count": len(latencies),
+                "p50_ms": round(percentile(latencies, 0.50) * 1000, 1),
+                "p95_ms": round(percentile(latencies, 0.95) * 1000, 1),
+                "p99_ms": round(percentile(latencies, 0.99) * 1000, 1),
+                "max_ms": round(max(latencies) * 1000, 1),
+            }
+    return result
+
+def print_result(result):
+    print(
+        f"\n{result['sessions']} sessions: {result['reruns']} reruns ({result['failed_reruns']} failed), "
+        f"{result['reruns_per_second']} reruns/s, {result['upstream_calls_per_session']} upstream calls per session, "
+        f"{result['rate_limiter_queue_seconds']}s queued for the rate limiter, peak RSS {result['peak_rss_mb']} MB"
+    )
+    print(f"{'action':>14} | {'count':>6} | {'p50_ms':>9} | {'p95_ms':>9} | {'p99_ms':>9} | {'max_ms':>9}")
+    for action, latency in result["latency_by_action"].items():
+        print(f"{action:>14} | {latency['count']:>6} | {latency['p50_ms']:>9} | {latency['p95_ms']:>9} | {latency['p99_ms']:>9} | {latency['max_ms']:>9}")
+    print("Upstream calls: " + ", ".join(f"{endpoint} x{calls}" for endpoint, calls in result["upstream_calls_by_endpoint"].items()))
+    for error in result["errors"]:
+        print(f"ERROR {error}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test main.py with concurrent simulated sessions against the mock server.")
+    parser.add_argument("--sessions", default="10", help="Concurrent sessions; a comma-separated list runs one level per value.")
+    parser.add_argument("--prompts-per-session", type=int, default=1, help="Helper prompts each session clicks.")
+    parser.add_argument("--reruns-per-prompt", type=int, default=1, help="Plain reruns after each helper prompt (e.g., a widget change).")
+    parser.add_argument("--think-time", type=float, default=1.0, help="Maximum random pause in seconds between two actions of a session.")
+    parser.add_argument("--ramp-up", type=float, default=2.0, help="Seconds over which the sessions start.")
+    parser.add_argument("--timeout", type=float, default=120.0, help="Seconds before a rerun counts as timed out.")
+    parser.add_argument("--latency-profile", choices=sorted(LATENCY_PROFILES), default="none", help="Latencies of the mock server.")
+    parser.add_argument("--latency", action="append", default=[], metavar="GROUP=SPEC", help="Latency override of an endpoint group; repeatable.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="Write the results to this file.")
+    args = parser.parse_args()
+    # Per-request log lines would dominate the measurement
+    logging.getLogger().setLevel(logging.WARNING)
+    random.seed(args.seed)
+
+    results = []
+    with shared_app_test_runtime({"OPENAI_API_KEY": "mock"}):
+        for sessions in sorted(int(value) for value in args.sessions.split(",")):
+            result = run_level(sessions, args)
+            print_result(result)
+            results.append(result)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as file:
+            json.dump(results, file, indent=2)
+
+if __name__ == "__main__":
+    main()
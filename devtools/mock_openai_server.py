@@ -0,0 +1,1006 @@
+"""
+Local stand-in for the OpenAI endpoints used by the app and the batch tooling.
+
+Serves the Assistants (assistants, threads, messages, runs and run steps), Files, Vector Stores and Batches
+endpoints in memory, so the controller layer can be exercised and measured without an API key or network
+access:
+- Runs complete after a sampled run duration, either on the first retrieve after it or through a server-sent
+  event stream (`stream=true`). RiskGuard answers with a JSON assessment from the local risk classifier; the
+  other assistants answer with a templated reply that cites a vector store file when file_search is available.
+- Batches complete on the first retrieve after `--processing-delay` seconds; every chat completion request in
+  them is answered with a RiskGuard-style assessment.
+- Latency is added per endpoint group from distributions such as "lognormal:150,0.3" (see LatencyDistribution).
+- Calls, bytes in and out and server time per endpoint are counted and served at GET /v1/mock/stats.
+
+Usage:
+    python -m devtools.mock_openai_server --port 8765 --latency-profile realistic
+    python -m devtools.mock_openai_server --port 8765 --latency runs=fixed:200 --latency run_duration=uniform:1000,3000
+    python batch_runner.py descriptions.jsonl results.jsonl --risk-batch --base-url http://127.0.0.1:8765/v1
+"""
+import re
+import json
+import math
+import time
+import random
+import logging
+import argparse
+import itertools
+import threading
+from urllib.parse import parse_qs, urlsplit
+from email.parser import BytesParser
+from email.policy import default as default_policy
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from controller.risk_classifier import classify_description
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+
+# Routes: (HTTP method, compiled path pattern, handler method name)
+ROUTES: List[Tuple[str, "re.Pattern[str]", str]] = []
+
+# Endpoint groups that latency can be configured for; 'run_duration' is the time a run takes to complete
+LATENCY_GROUPS = ("assistants", "threads", "messages", "runs", "run_duration", "files", "vector_stores", "batches")
+
+# Rough medians (ms) of the hosted API, for benchmarks that should feel like production
+REALISTIC_LATENCIES = {
+    "assistants": "lognormal:180,0.3",
+    "threads": "lognormal:150,0.3",
+    "messages": "lognormal:120,0.3",
+    "runs": "lognormal:150,0.3",
+    "run_duration": "lognormal:4000,0.4",
+    "files": "lognormal:300,0.4",
+    "vector_stores": "lognormal:250,0.4",
+    "batches": "lognormal:200,0.3",
+}
+LATENCY_PROFILES = {"none": {}, "realistic": REALISTIC_LATENCIES}
+
+# Object IDs are unique across all mock servers of a process, so process-wide caches keyed by ID never collide
+_ids = itertools.count(1)
+
+# Words of the templated agent replies
+REPLY_WORDS = 120
+# Text deltas a streamed reply is split into
+STREAM_DELTAS = 8
+
+def route(method: str, pattern: str) -> Callable:
+    """
+    Registers a handler method of MockOpenAIHandler for a method and path pattern.
+
+    Parameters:
+    - method: The HTTP method (e.g., "POST").
+    - pattern: Regular expression matched against the whole request path; named groups become arguments.
+
+    Returns:
+    - The decorator.
+    """
+    def decorator(handler: Callable) -> Callable:
+        ROUTES.append((method, re.compile(f"^{pattern}$"), handler.__name__))
+        return handler
+    return decorator
+
+def error_payload(message: str) -> Dict[str, Any]:
+    return {"error": {"message": message, "type": "invalid_request_error"}}
+
+def paginate(items: List[Dict[str, Any]], query: Dict[str, str], default_limit: int = 20) -> Dict[str, Any]:
+    """
+    Builds a cursor-paginated list response like the API's (limit, order, after, before).
+
+    Parameters:
+    - items: The objects to list, oldest first.
+    - query: The query parameters of the request.
+    - default_limit: The page size when the request does not set one.
+
+    Returns:
+    - The list response body.
+    """
+    ordered = items if query.get("order", "desc") == "asc" else items[::-1]
+    ids = [item["id"] for item in ordered]
+    if query.get("after") in ids:
+        ordered = ordered[ids.index(query["after"]) + 1:]
+    elif query.get("before") in ids:
+        ordered = ordered[:ids.index(query["before"])]
+    limit = int(query.get("limit", default_limit))
+    page = ordered[:limit]
+    return {
+        "object": "list",
+        "data": page,
+        "first_id": page[0]["id"] if page else None,
+        "last_id": page[-1]["id"] if page else None,
+        "has_more": len(ordered) > limit,
+    }
+
+class LatencyDistribution:
+    """
+    Samples latencies from a spec in milliseconds: "fixed:50", "uniform:20,80" or "lognormal:120,0.5"
+    (median and sigma of the underlying normal distribution).
+    """
+
+    def __init__(self, spec: str):
+        self.spec = spec
+        kind, _, parameters = spec.partition(":")
+        self.kind = kind.strip().lower()
+        self.parameters = [float(value) for value in parameters.split(",") if value.strip()]
+        expected_parameters = {"fixed": 1, "uniform": 2, "lognormal": 2}
+        if expected_parameters.get(self.kind) != len(self.parameters):
+            raise ValueError(f"Invalid latency distribution '{spec}'; use fixed:MS, uniform:MIN_MS,MAX_MS or lognormal:MEDIAN_MS,SIGMA.")
+
+    def sample(self, rng: random.Random) -> float:
+        """
+        Draws one latency.
+
+        Parameters:
+        - rng: The random number generator to draw from.
+
+        Returns:
+        - float: The latency in seconds.
+        """
+        if self.kind == "fixed":
+            milliseconds = self.parameters[0]
+        elif self.kind == "uniform":
+            milliseconds = rng.uniform(*self.parameters)
+        else:
+            milliseconds = rng.lognormvariate(math.log(self.parameters[0]), self.parameters[1])
+        return max(milliseconds, 0.0) / 1000
+
+class MockOpenAIState:
+    """
+    In-memory objects served by the mock server, with its latency settings and per-endpoint statistics.
+    """
+
+    def __init__(self, processing_delay: float = 0.0, latencies: Optional[Dict[str, str]] = None, seed: Optional[int] = None):
+        self.processing_delay = processing_delay
+        self.latencies = {group: LatencyDistribution(spec) for group, spec in (latencies or {}).items()}
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.files: Dict[str, Dict[str, Any]] = {}
+        self.file_contents: Dict[str, bytes] = {}
+        self.batches: Dict[str, Dict[str, Any]] = {}
+        self.assistants: Dict[str, Dict[str, Any]] = {}
+        self.threads: Dict[str, Dict[str, Any]] = {}
+        self.messages: Dict[str, List[Dict[str, Any]]] = {}
+        self.runs: Dict[str, Dict[str, Any]] = {}
+        self.run_finish_times: Dict[str, float] = {}
+        self.run_steps: Dict[str, List[Dict[str, Any]]] = {}
+        self.vector_stores: Dict[str, Dict[str, Any]] = {}
+        self.vector_store_files: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        self.file_batches: Dict[str, Dict[str, Any]] = {}
+        self.file_batch_file_ids: Dict[str, List[str]] = {}
+        self.stats: Dict[str, Dict[str, float]] = {}
+
+    def new_id(self, prefix: str) -> str:
+        return f"{prefix}_mock{next(_ids):08d}"
+
+    def add_file(self, file_name: str, purpose: str, content: bytes) -> Dict[str, Any]:
+        file_object = {
+            "id": self.new_id("file"),
+            "object": "file",
+            "bytes": len(content),
+            "created_at": int(time.time()),
+            "filename": file_name,
+            "purpose": purpose,
+            "status": "processed",
+        }
+        with self.lock:
+            self.files[file_object["id"]] = file_object
+            self.file_contents[file_object["id"]] = content
+        return file_object
+
+    def sample_latency(self, group: str) -> float:
+        """
+        Draws the latency of an endpoint group (0 if none is configured).
+
+        Parameters:
+        - group: One of LATENCY_GROUPS.
+
+        Returns:
+        - float: The latency in seconds.
+        """
+        distribution = self.latencies.get(group)
+        if distribution is None:
+            return 0.0
+        with self.lock:
+            return distribution.sample(self.rng)
+
+    def record_call(self, endpoint: str, bytes_in: int, bytes_out: int, seconds: float) -> None:
+        with self.lock:
+            stats = self.stats.setdefault(endpoint, {"calls": 0, "bytes_in": 0, "bytes_out": 0, "server_seconds": 0.0})
+            stats["calls"] += 1
+            stats["bytes_in"] += bytes_in
+            stats["bytes_out"] += bytes_out
+            stats["server_seconds"] += seconds
+
+    def get_stats(self) -> Dict[str, Dict[str, float]]:
+        """
+        Returns the statistics per endpoint.
+
+        Returns:
+        - Dict mapping handler names (e.g., 'create_run') to their 'calls', 'bytes_in', 'bytes_out' and
+          'server_seconds'.
+        """
+        with self.lock:
+            return {endpoint: dict(stats) for endpoint, stats in self.stats.items()}
+
+    def reset_stats(self) -> None:
+        with self.lock:
+            self.stats.clear()
+
+def mock_risk_assessment(description: str) -> str:
+    """
+    Assesses a description like RiskGuard would, with the local risk classifier.
+
+    Parameters:
+    - description: The module description.
+
+    Returns:
+    - str: The JSON assessment with 'Category' and 'Justification'.
+    """
+    category = classify_description(description) or "Minimal Risk"
+    return json.dumps({
+        "Category": category,
+        "Justification": f"Mock assessment: the description matches the {category} criteria of the EU AI Act.",
+    })
+
+def mock_chat_completion(body: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Answers a chat completion request with a RiskGuard-style assessment of its last user message.
+
+    Parameters:
+    - body: The chat completion request body.
+
+    Returns:
+    - The chat completion response body.
+    """
+    description = next((message["content"] for message in reversed(body.get("messages", [])) if message["role"] == "user"), "")
+    content = mock_risk_assessment(description)
+    return {
+        "id": f"chatcmpl-mock{abs(hash(description)) % 10 ** 8:08d}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": body.get("model", "gpt-4o-mini"),
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+        "usage": {"prompt_tokens": len(description) // 4, "completion_tokens": len(content) // 4, "total_tokens": (len(description) + len(content)) // 4},
+    }
+
+def mock_agent_reply(agent_name: str, prompt: str, cites_file: bool) -> Tuple[str, List[Dict[str, Any]]]:
+    """
+    Writes a templated agent reply in the structure the agents are instructed to use.
+
+    Parameters:
+    - agent_name: The name of the answering assistant.
+    - prompt: The latest user message of the thread.
+    - cites_file: Whether the reply carries a file_search citation marker.
+
+    Returns:
+    - Tuple of the reply text and its annotations without file IDs (filled in by the caller).
+    """
+    marker = "【4:0†source】" if cites_file else ""
+    excerpt = " ".join(prompt.split()[:30])
+    filler_words = ("transparency", "human", "oversight", "accountability", "risk", "management", "data", "governance", "fairness", "robustness")
+    filler = " ".join(filler_words[index % len(filler_words)] for index in range(REPLY_WORDS))
+    text = (
+        f"**Reply**: As the {agent_name}, I reviewed the latest contribution{marker}.\n\n"
+        f"**Reflection**: The discussion so far ({excerpt}) raises points on {filler}.\n\n"
+        f"**Critique**: The proposal should document its safeguards before deployment."
+    )
+    annotations = []
+    if marker:
+        start_index = text.index(marker)
+        annotations.append({"type": "file_citation", "text": marker, "start_index": start_index, "end_index": start_index + len(marker)})
+    return text, annotations
+
+class MockOpenAIHandler(BaseHTTPRequestHandler):
+    # Keep-alive like the real API, so clients can reuse connections
+    protocol_version = "HTTP/1.1"
+    # Headers and body are written separately; without this, delayed ACKs add ~40ms per response
+    disable_nagle_algorithm = True
+    state: MockOpenAIState = MockOpenAIState()
+
+    def log_message(self, format: str, *args: Any) -> None:
+        logging.debug("Mock OpenAI server: " + format % args)
+
+    def _dispatch(self, method: str) -> None:
+        started = time.perf_counter()
+        path = urlsplit(self.path).path
+        bytes_in = int(self.headers.get("Content-Length") or 0)
+        for route_method, pattern, handler_name in ROUTES:
+            match = pattern.match(path)
+            if route_method == method and match:
+                endpoint = handler_name
+                time.sleep(self.state.sample_latency(self._latency_group(path)))
+                status, payload = getattr(self, handler_name)(**match.groupdict())
+                break
+        else:
+            # Drain the body so the kept-alive connection stays usable
+            self.rfile.read(bytes_in)
+            endpoint = "not_found"
+            status, payload = 404, error_payload(f"No mock route for {method} {path}.")
+
+        self.send_response(status)
+        if isinstance(payload, Iterator):
+            # Server-sent events, written as they are produced
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            # The call is recorded before its last chunk, so clients that read the counters next see it
+            write_chunk = lambda chunk: self.wfile.write(f"{len(chunk):X}\r\n".encode("ascii") + chunk + b"\r\n")
+            bytes_out, previous_chunk = 0, b""
+            for chunk in payload:
+                if previous_chunk:
+                    write_chunk(previous_chunk)
+                bytes_out += len(chunk)
+                previous_chunk = chunk
+            self.state.record_call(endpoint, bytes_in, bytes_out, time.perf_counter() - started)
+            write_chunk(previous_chunk)
+            self.wfile.write(b"0\r\n\r\n")
+        else:
+            body = payload if isinstance(payload, bytes) else json.dumps(payload).encode("utf-8")
+            self.state.record_call(endpoint, bytes_in, len(body), time.perf_counter() - started)
+            self.send_header("Content-Type", "application/octet-stream" if isinstance(payload, bytes) else "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    @staticmethod
+    def _latency_group(path: str) -> str:
+        # /v1/threads/{id}/messages -> messages, /v1/threads/{id}/runs/... -> runs, /v1/files/... -> files
+        segments = path.strip("/").split("/")
+        if len(segments) > 3 and segments[1] == "threads":
+            return segments[3]
+        return segments[1] if len(segments) > 1 else ""
+
+    def do_GET(self) -> None:
+        self._dispatch("GET")
+
+    def do_POST(self) -> None:
+        self._dispatch("POST")
+
+    def do_DELETE(self) -> None:
+        self._dispatch("DELETE")
+
+    def read_query(self) -> Dict[str, str]:
+        return {key: values[0] for key, values in parse_qs(urlsplit(self.path).query).items()}
+
+    def read_json(self) -> Dict[str, Any]:
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def read_multipart(self) -> Dict[str, Tuple[Optional[str], bytes]]:
+        length = int(self.headers.get("Content-Length") or 0)
+        raw = f"Content-Type: {self.headers['Content-Type']}\r\n\r\n".encode("utf-8") + self.rfile.read(length)
+        message = BytesParser(policy=default_policy).parsebytes(raw)
+        return {
+            part.get_param("name", header="content-disposition"): (part.get_filename(), part.get_payload(decode=True))
+            for part in message.iter_parts()
+        }
+
+    # Mock statistics
+
+    @route("GET", "/v1/mock/stats")
+    def get_mock_stats(self) -> Tuple[int, Any]:
+        return 200, self.state.get_stats()
+
+    @route("POST", "/v1/mock/stats/reset")
+    def reset_mock_stats(self) -> Tuple[int, Any]:
+        self.read_json()
+        self.state.reset_stats()
+        return 200, {"reset": True}
+
+    # Files
+
+    @route("POST", "/v1/files")
+    def create_file(self) -> Tuple[int, Any]:
+        fields = self.read_multipart()
+        file_name, content = fields["file"]
+        purpose = fields.get("purpose", (None, b"assistants"))[1].decode("utf-8")
+        return 200, self.state.add_file(file_name or "upload", purpose, content)
+
+    @route("GET", "/v1/files")
+    def list_files(self) -> Tuple[int, Any]:
+        query = self.read_query()
+        files = [file for file in self.state.files.values() if query.get("purpose") in (None, file["purpose"])]
+        return 200, paginate(files, query, default_limit=10000)
+
+    @route("GET", "/v1/files/(?P<file_id>[^/]+)")
+    def retrieve_file(self, file_id: str) -> Tuple[int, Any]:
+        if file_id not in self.state.files:
+            return 404, error_payload(f"No file with ID {file_id}.")
+        return 200, self.state.files[file_id]
+
+    @route("GET", "/v1/files/(?P<file_id>[^/]+)/content")
+    def retrieve_file_content(self, file_id: str) -> Tuple[int, Any]:
+        if file_id not in self.state.file_contents:
+            return 404, error_payload(f"No file with ID {file_id}.")
+        return 200, self.state.file_contents[file_id]
+
+    @route("DELETE", "/v1/files/(?P<file_id>[^/]+)")
+    def delete_file(self, file_id: str) -> Tuple[int, Any]:
+        with self.state.lock:
+            deleted = self.state.files.pop(file_id, None) is not None
+            self.state.file_contents.pop(file_id, None)
+            # Deleted files also disappear from the vector stores
+            for vector_store_files in self.state.vector_store_files.values():
+                vector_store_files.pop(file_id, None)
+        return 200, {"id": file_id, "object": "file", "deleted": deleted}
+
+    # Assistants
+
+    @route("POST", "/v1/assistants")
+    def create_assistant(self) -> Tuple[int, Any]:
+        body = self.read_json()
+        assistant = {
+            "id": self.state.new_id("asst"),
+            "object": "assistant",
+            "created_at": int(time.time()),
+            "name": body.get("name"),
+            "description": body.get("description"),
+            "model": body["model"],
+            "instructions": body.get("instructions"),
+            "tools": body.get("tools", []),
+            "tool_resources": body.get("tool_resources") or {},
+            "metadata": body.get("metadata") or {},
+            "temperature": body.get("temperature", 1.0),
+            "top_p": body.get("top_p", 1.0),
+            "response_format": body.get("response_format", "auto"),
+        }
+        with self.state.lock:
+            self.state.assistants[assistant["id"]] = assistant
+        return 200, assistant
+
+    @route("GET", "/v1/assistants")
+    def list_assistants(self) -> Tuple[int, Any]:
+        return 200, paginate(list(self.state.assistants.values()), self.read_query())
+
+    @route("GET", "/v1/assistants/(?P<assistant_id>[^/]+)")
+    def retrieve_assistant(self, assistant_id: str) -> Tuple[int, Any]:
+        if assistant_id not in self.state.assistants:
+            return 404, error_payload(f"No assistant found with id '{assistant_id}'.")
+        return 200, self.state.assistants[assistant_id]
+
+    @route("DELETE", "/v1/assistants/(?P<assistant_id>[^/]+)")
+    def delete_assistant(self, assistant_id: str) -> Tuple[int, Any]:
+        with self.state.lock:
+            deleted = self.state.assistants.pop(assistant_id, None) is not None
+        if not deleted:
+            return 404, error_payload(f"No assistant found with id '{assistant_id}'.")
+        return 200, {"id": assistant_id, "object": "assistant.deleted", "deleted": True}
+
+    # Threads and messages
+
+    @route("POST", "/v1/threads")
+    def create_thread(self) -> Tuple[int, Any]:
+        body = self.read_json()
+        thread = {
+            "id": self.state.new_id("thread"),
+            "object": "thread",
+            "created_at": int(time.time()),
+            "tool_resources": body.get("tool_resources") or {},
+            "metadata": body.get("metadata") or {},
+        }
+        with self.state.lock:
+            self.state.threads[thread["id"]] = thread
+            self.state.messages[thread["id"]] = []
+        for message in body.get("messages", []):
+            self._add_message(thread["id"], message)
+        return 200, thread
+
+    @route("POST", "/v1/threads/(?P<thread_id>[^/]+)/messages")
+    def create_message(self, thread_id: str) -> Tuple[int, Any]:
+        body = self.read_json()
+        if thread_id not in self.state.threads:
+            return 404, error_payload(f"No thread found with id '{thread_id}'.")
+        return 200, self._add_message(thread_id, body)
+
+    @route("GET", "/v1/threads/(?P<thread_id>[^/]+)/messages")
+    def list_messages(self, thread_id: str) -> Tuple[int, Any]:
+        if thread_id not in self.state.threads:
+            return 404, error_payload(f"No thread found with id '{thread_id}'.")
+        query = self.read_query()
+        with self.state.lock:
+            messages = [message for message in self.state.messages[thread_id] if query.get("run_id") in (None, message["run_id"])]
+        return 200, paginate(messages, query)
+
+    def _add_message(self, thread_id: str, body: Dict[str, Any], assistant_id: Optional[str] = None, run_id: Optional[str] = None) -> Dict[str, Any]:
+        content = body.get("content", "")
+        if isinstance(content, str):
+            content = [{"type": "text", "text": {"value": content, "annotations": []}}]
+        else:
+            # Content parts of a request ({"type": "text", "text": "..."}) become text blocks
+            content = [
+                {"type": "text", "text": {"value": part["text"], "annotations": []}} if isinstance(part.get("text"), str) else part
+                for part in content
+            ]
+        now = int(time.time())
+        message = {
+            "id": self.state.new_id("msg"),
+            "object": "thread.message",
+            "created_at": now,
+            "completed_at": now,
+            "incomplete_at": None,
+            "incomplete_details": None,
+            "status": "completed",
+            "thread_id": thread_id,
+            "role": body.get("role", "user"),
+            "content": content,
+            "assistant_id": assistant_id,
+            "run_id": run_id,
+            "attachments": body.get("attachments") or [],
+            "metadata": body.get("metadata") or {},
+        }
+        with self.state.lock:
+            self.state.messages[thread_id].append(message)
+        return message
+
+    # Runs
+
+    @route("POST", "/v1/threads/(?P<thread_id>[^/]+)/runs")
+    def create_run(self, thread_id: str) -> Tuple[int, Any]:
+        body = self.read_json()
+        assistant = self.state.assistants.get(body.get("assistant_id"))
+        if thread_id not in self.state.threads or assistant is None:
+            return 404, error_payload("Unknown thread or assistant.")
+        run = {
+            "id": self.state.new_id("run"),
+            "object": "thread.run",
+            "created_at": int(time.time()),
+            "thread_id": thread_id,
+            "assistant_id": assistant["id"],
+            "status": "queued",
+            "model": body.get("model") or assistant["model"],
+            "instructions": body.get("instructions") or assistant["instructions"],
+            "tools": body["tools"] if "tools" in body else assistant["tools"],
+            "tool_resources": assistant["tool_resources"],
+            "metadata": body.get("metadata") or {},
+            "temperature": body.get("temperature", assistant["temperature"]),
+            "top_p": body.get("top_p", assistant["top_p"]),
+            "parallel_tool_calls": body.get("parallel_tool_calls", True),
+            "response_format": "auto",
+            "tool_choice": "auto",
+            "truncation_strategy": {"type": "auto", "last_messages": None},
+            "started_at": None,
+            "completed_at": None,
+            "cancelled_at": None,
+            "failed_at": None,
+            "expires_at": None,
+            "last_error": None,
+            "incomplete_details": None,
+            "required_action": None,
+            "usage": None,
+        }
+        duration = self.state.sample_latency("run_duration")
+        with self.state.lock:
+            self.state.runs[run["id"]] = run
+            self.state.run_finish_times[run["id"]] = time.time() + duration
+        if body.get("stream"):
+            return 200, self._stream_run(run, duration)
+        return 200, run
+
+    @route("GET", "/v1/threads/(?P<thread_id>[^/]+)/runs/(?P<run_id>[^/]+)")
+    def retrieve_run(self, thread_id: str, run_id: str) -> Tuple[int, Any]:
+        run = self.state.runs.get(run_id)
+        if run is None or run["thread_id"] != thread_id:
+            return 404, error_payload(f"No run found with id '{run_id}'.")
+        if run["status"] in ("queued", "in_progress"):
+            if time.time() >= self.state.run_finish_times[run_id]:
+                self._finish_run(run, *self._build_run_output(run))
+            else:
+                run["status"] = "in_progress"
+                run["started_at"] = run["started_at"] or int(time.time())
+        return 200, run
+
+    @route("POST", "/v1/threads/(?P<thread_id>[^/]+)/runs/(?P<run_id>[^/]+)/cancel")
+    def cancel_run(self, thread_id: str, run_id: str) -> Tuple[int, Any]:
+        self.read_json()
+        run = self.state.runs.get(run_id)
+        if run is None or run["thread_id"] != thread_id:
+            return 404, error_payload(f"No run found with id '{run_id}'.")
+        if run["status"] in ("queued", "in_progress", "requires_action"):
+            run["status"] = "cancelled"
+            run["cancelled_at"] = int(time.time())
+        return 200, run
+
+    @route("GET", "/v1/threads/(?P<thread_id>[^/]+)/runs/(?P<run_id>[^/]+)/steps")
+    def list_run_steps(self, thread_id: str, run_id: str) -> Tuple[int, Any]:
+        if run_id not in self.state.runs:
+            return 404, error_payload(f"No run found with id '{run_id}'.")
+        return 200, paginate(self.state.run_steps.get(run_id, []), self.read_query())
+
+    @route("GET", "/v1/threads/(?P<thread_id>[^/]+)/runs/(?P<run_id>[^/]+)/steps/(?P<step_id>[^/]+)")
+    def retrieve_run_step(self, thread_id: str, run_id: str, step_id: str) -> Tuple[int, Any]:
+        step = next((step for step in self.state.run_steps.get(run_id, []) if step["id"] == step_id), None)
+        if step is None:
+            return 404, error_payload(f"No run step found with id '{step_id}'.")
+        return 200, step
+
+    def _cited_file(self, run: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        # The first file of the first vector store the run can search, if file_search is enabled
+        if not any(tool.get("type") == "file_search" for tool in run["tools"]):
+            return None
+        thread = self.state.threads[run["thread_id"]]
+        vector_store_ids = (
+            thread["tool_resources"].get("file_search", {}).get("vector_store_ids", [])
+            + run["tool_resources"].get("file_search", {}).get("vector_store_ids", [])
+        )
+        for vector_store_id in vector_store_ids:
+            file_ids = list(self.state.vector_store_files.get(vector_store_id, {}))
+            if file_ids:
+                return self.state.files.get(file_ids[0], {"id": file_ids[0], "filename": file_ids[0]})
+        return None
+
+    def _build_run_output(self, run: Dict[str, Any]) -> Tuple[Dict[str, Any], List[Dict[str, Any]]]:
+        # Builds the reply message (not yet added to the thread) and the run steps of a run
+        assistant = self.state.assistants[run["assistant_id"]]
+        with self.state.lock:
+            thread_messages = list(self.state.messages[run["thread_id"]])
+        prompt = next((block["text"]["value"] for message in reversed(thread_messages) if message["role"] == "user"
+                       for block in message["content"] if block.get("type") == "text"), "")
+
+        cited_file = self._cited_file(run)
+        if "riskguard" in (assistant["name"] or "").lower():
+            text, annotations = mock_risk_assessment(prompt), []
+        else:
+            text, annotations = mock_agent_reply(assistant["name"] or "assistant", prompt, cited_file is not None)
+            for annotation in annotations:
+                annotation["file_citation"] = {"file_id": cited_file["id"]}
+
+        now = int(time.time())
+        message = {
+            "id": self.state.new_id("msg"),
+            "object": "thread.message",
+            "created_at": now,
+            "completed_at": now,
+            "incomplete_at": None,
+            "incomplete_details": None,
+            "status": "completed",
+            "thread_id": run["thread_id"],
+            "role": "assistant",
+            "content": [{"type": "text", "text": {"value": text, "annotations": annotations}}],
+            "assistant_id": assistant["id"],
+            "run_id": run["id"],
+            "attachments": [],
+            "metadata": {},
+        }
+
+        prompt_tokens = (len(run["instructions"] or "") + sum(
+            len(block["text"]["value"]) for thread_message in thread_messages for block in thread_message["content"] if block.get("type") == "text"
+        )) // 4
+        completion_tokens = len(text) // 4
+        step_base = {"object": "thread.run.step", "created_at": now, "completed_at": now, "run_id": run["id"],
+                     "assistant_id": assistant["id"], "thread_id": run["thread_id"], "status": "completed",
+                     "cancelled_at": None, "failed_at": None, "expired_at": None, "last_error": None, "metadata": {}}
+        steps = []
+        if cited_file:
+            steps.append({
+                **step_base,
+                "id": self.state.new_id("step"),
+                "type": "tool_calls",
+                "step_details": {"type": "tool_calls", "tool_calls": [{
+                    "id": self.state.new_id("call"),
+                    "type": "file_search",
+                    "file_search": {
+                        "ranking_options": {"ranker": "default_2024_08_21", "score_threshold": 0.0},
+                        "results": [{"file_id": cited_file["id"], "file_name": cited_file["filename"], "score": 0.8}],
+                    },
+                }]},
+                "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": 20, "total_tokens": prompt_tokens + 20},
+            })
+        steps.append({
+            **step_base,
+            "id": self.state.new_id("step"),
+            "type": "message_creation",
+            "step_details": {"type": "message_creation", "message_creation": {"message_id": message["id"]}},
+            "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens, "total_tokens": prompt_tokens + completion_tokens},
+        })
+        return message, steps
+
+    def _finish_run(self, run: Dict[str, Any], message: Dict[str, Any], steps: List[Dict[str, Any]]) -> None:
+        prompt_tokens = sum(step["usage"]["prompt_tokens"] for step in steps)
+        completion_tokens = sum(step["usage"]["completion_tokens"] for step in steps)
+        with self.state.lock:
+            self.state.messages[run["thread_id"]].append(message)
+            self.state.run_steps[run["id"]] = steps
+        now = int(time.time())
+        run.update({
+            "status": "completed",
+            "started_at": run["started_at"] or run["created_at"],
+            "completed_at": now,
+            "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens, "total_tokens": prompt_tokens + completion_tokens},
+        })
+
+    def _stream_run(self, run: Dict[str, Any], duration: float) -> Iterator[bytes]:
+        # Mirrors the event sequence of the streaming runs API; the run duration is spread over the events
+        def event(name: str, data: Any) -> bytes:
+            return f"event: {name}\ndata: {json.dumps(data)}\n\n".encode("utf-8")
+
+        yield event("thread.run.created", run)
+        yield event("thread.run.queued", run)
+        run["status"] = "in_progress"
+        run["started_at"] = int(time.time())
+        yield event("thread.run.in_progress", run)
+
+        message, steps = self._build_run_output(run)
+        # Retrieval (if any) takes the first third of the run, the text is written over the rest
+        for step in steps[:-1]:
+            time.sleep(duration / 3)
+            yield event("thread.run.step.created", {**step, "status": "in_progress", "completed_at": None})
+            yield event("thread.run.step.completed", step)
+        yield event("thread.run.step.created", {**steps[-1], "status": "in_progress", "completed_at": None})
+
+        text_block = message["content"][0]["text"]
+        yield event("thread.message.created", {**message, "status": "in_progress", "content": [], "completed_at": None})
+        words = text_block["value"].split(" ")
+        delta_size = max(len(words) // STREAM_DELTAS, 1)
+        pieces = [" ".join(words[start:start + delta_size]) for start in range(0, len(words), delta_size)]
+        pieces = [piece + (" " if index < len(pieces) - 1 else "") for index, piece in enumerate(pieces)]
+        text_seconds = duration * (2 / 3 if len(steps) > 1 else 1)
+        for index, piece in enumerate(pieces):
+            time.sleep(text_seconds / len(pieces))
+            annotations = [{**annotation, "index": annotation_index} for annotation_index, annotation in enumerate(text_block["annotations"])] if index == len(pieces) - 1 else []
+            yield event("thread.message.delta", {
+                "id": message["id"],
+                "object": "thread.message.delta",
+                "delta": {"content": [{"index": 0, "type": "text", "text": {"value": piece, "annotations": annotations}}]},
+            })
+
+        self._finish_run(run, message, steps)
+        yield event("thread.message.completed", message)
+        yield event("thread.run.step.completed", steps[-1])
+        yield event("thread.run.completed", run)
+        yield b"event: done\ndata: [DONE]\n\n"
+
+    # Vector stores
+
+    @route("POST", "/v1/vector_stores")
+    def create_vector_store(self) -> Tuple[int, Any]:
+        body = self.read_json()
+        vector_store = {
+            "id": self.state.new_id("vs"),
+            "object": "vector_store",
+            "created_at": int(time.time()),
+            "name": body.get("name"),
+            "status": "completed",
+            "usage_bytes": 0,
+            "file_counts": {},
+            "metadata": body.get("metadata") or {},
+            "expires_after": body.get("expires_after"),
+            "expires_at": None,
+            "last_active_at": int(time.time()),
+        }
+        with self.state.lock:
+            self.state.vector_stores[vector_store["id"]] = vector_store
+            self.state.vector_store_files[vector_store["id"]] = {}
+        for file_id in body.get("file_ids", []):
+            self._add_vector_store_file(vector_store["id"], file_id, None)
+        return 200, self._with_file_counts(vector_store)
+
+    @route("GET", "/v1/vector_stores")
+    def list_vector_stores(self) -> Tuple[int, Any]:
+        vector_stores = [self._with_file_counts(vector_store) for vector_store in self.state.vector_stores.values()]
+        return 200, paginate(vector_stores, self.read_query())
+
+    @route("GET", "/v1/vector_stores/(?P<vector_store_id>[^/]+)")
+    def retrieve_vector_store(self, vector_store_id: str) -> Tuple[int, Any]:
+        if vector_store_id not in self.state.vector_stores:
+            return 404, error_payload(f"No vector store found with id '{vector_store_id}'.")
+        return 200, self._with_file_counts(self.state.vector_stores[vector_store_id])
+
+    @route("GET", "/v1/vector_stores/(?P<vector_store_id>[^/]+)/files")
+    def list_vector_store_files(self, vector_store_id: str) -> Tuple[int, Any]:
+        if vector_store_id not in self.state.vector_store_files:
+            return 404, error_payload(f"No vector store found with id '{vector_store_id}'.")
+        with self.state.lock:
+            files = list(self.state.vector_store_files[vector_store_id].values())
+        return 200, paginate(files, self.read_query())
+
+    @route("POST", "/v1/vector_stores/(?P<vector_store_id>[^/]+)/files")
+    def create_vector_store_file(self, vector_store_id: str) -> Tuple[int, Any]:
+        body = self.read_json()
+        if vector_store_id not in self.state.vector_store_files or body.get("file_id") not in self.state.files:
+            return 404, error_payload("Unknown vector store or file.")
+        return 200, self._add_vector_store_file(vector_store_id, body["file_id"], body.get("attributes"))
+
+    @route("POST", "/v1/vector_stores/(?P<vector_store_id>[^/]+)/files/(?P<file_id>[^/]+)")
+    def update_vector_store_file(self, vector_store_id: str, file_id: str) -> Tuple[int, Any]:
+        body = self.read_json()
+        vector_store_file = self.state.vector_store_files.get(vector_store_id, {}).get(file_id)
+        if vector_store_file is None:
+            return 404, error_payload(f"No file found with id '{file_id}' in vector store '{vector_store_id}'.")
+        vector_store_file["attributes"] = body.get("attributes")
+        return 200, vector_store_file
+
+    @route("DELETE", "/v1/vector_stores/(?P<vector_store_id>[^/]+)/files/(?P<file_id>[^/]+)")
+    def delete_vector_store_file(self, vector_store_id: str, file_id: str) -> Tuple[int, Any]:
+        with self.state.lock:
+            deleted = self.state.vector_store_files.get(vector_store_id, {}).pop(file_id, None) is not None
+        return 200, {"id": file_id, "object": "vector_store.file.deleted", "deleted": deleted}
+
+    @route("POST", "/v1/vector_stores/(?P<vector_store_id>[^/]+)/file_batches")
+    def create_vector_store_file_batch(self, vector_store_id: str) -> Tuple[int, Any]:
+        body = self.read_json()
+        if vector_store_id not in self.state.vector_store_files:
+            return 404, error_payload(f"No vector store found with id '{vector_store_id}'.")
+        file_ids = [file_id for file_id in body.get("file_ids", []) if file_id in self.state.files]
+        for file_id in file_ids:
+            self._add_vector_store_file(vector_store_id, file_id, body.get("attributes"))
+        failed = len(body.get("file_ids", [])) - len(file_ids)
+        # Indexing is instantaneous, so batches are created completed and create_and_poll returns at once
+        file_batch = {
+            "id": self.state.new_id("vsfb"),
+            "object": "vector_store.files_batch",
+            "created_at": int(time.time()),
+            "vector_store_id": vector_store_id,
+            "status": "completed" if not failed else "failed",
+            "file_counts": {"in_progress": 0, "completed": len(file_ids), "failed": failed, "cancelled": 0, "total": len(file_ids) + failed},
+        }
+        with self.state.lock:
+            self.state.file_batches[file_batch["id"]] = file_batch
+            self.state.file_batch_file_ids[file_batch["id"]] = file_ids
+        return 200, file_batch
+
+    @route("GET", "/v1/vector_stores/(?P<vector_store_id>[^/]+)/file_batches/(?P<batch_id>[^/]+)")
+    def retrieve_vector_store_file_batch(self, vector_store_id: str, batch_id: str) -> Tuple[int, Any]:
+        if batch_id not in self.state.file_batches:
+            return 404, error_payload(f"No file batch found with id '{batch_id}'.")
+        return 200, self.state.file_batches[batch_id]
+
+    @route("GET", "/v1/vector_stores/(?P<vector_store_id>[^/]+)/file_batches/(?P<batch_id>[^/]+)/files")
+    def list_vector_store_file_batch_files(self, vector_store_id: str, batch_id: str) -> Tuple[int, Any]:
+        if batch_id not in self.state.file_batches:
+            return 404, error_payload(f"No file batch found with id '{batch_id}'.")
+        query = self.read_query()
+        with self.state.lock:
+            vector_store_files = self.state.vector_store_files.get(vector_store_id, {})
+            files = [vector_store_files[file_id] for file_id in self.state.file_batch_file_ids[batch_id] if file_id in vector_store_files]
+        if query.get("filter"):
+            files = [file for file in files if file["status"] == query["filter"]]
+        return 200, paginate(files, query)
+
+    def _add_vector_store_file(self, vector_store_id: str, file_id: str, attributes: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        vector_store_file = {
+            "id": file_id,
+            "object": "vector_store.file",
+            "created_at": int(time.time()),
+            "vector_store_id": vector_store_id,
+            "status": "completed",
+            "usage_bytes": self.state.files.get(file_id, {}).get("bytes", 0),
+            "last_error": None,
+            "attributes": attributes,
+            "chunking_strategy": {"type": "static", "static": {"max_chunk_size_tokens": 800, "chunk_overlap_tokens": 400}},
+        }
+        with self.state.lock:
+            self.state.vector_store_files[vector_store_id][file_id] = vector_store_file
+        return vector_store_file
+
+    def _with_file_counts(self, vector_store: Dict[str, Any]) -> Dict[str, Any]:
+        with self.state.lock:
+            files = list(self.state.vector_store_files.get(vector_store["id"], {}).values())
+        vector_store["file_counts"] = {"in_progress": 0, "completed": len(files), "failed": 0, "cancelled": 0, "total": len(files)}
+        vector_store["usage_bytes"] = sum(file["usage_bytes"] for file in files)
+        return vector_store
+
+    # Batches
+
+    @route("POST", "/v1/batches")
+    def create_batch(self) -> Tuple[int, Any]:
+        body = self.read_json()
+        if body.get("input_file_id") not in self.state.file_contents:
+            return 400, error_payload("Unknown input_file_id.")
+        now = int(time.time())
+        batch = {
+            "id": self.state.new_id("batch"),
+            "object": "batch",
+            "endpoint": body["endpoint"],
+            "input_file_id": body["input_file_id"],
+            "completion_window": body.get("completion_window", "24h"),
+            "status": "validating",
+            "output_file_id": None,
+            "error_file_id": None,
+            "created_at": now,
+            "completed_at": None,
+            "request_counts": {"total": 0, "completed": 0, "failed": 0},
+            "metadata": body.get("metadata"),
+        }
+        with self.state.lock:
+            self.state.batches[batch["id"]] = batch
+        return 200, batch
+
+    @route("GET", "/v1/batches/(?P<batch_id>[^/]+)")
+    def retrieve_batch(self, batch_id: str) -> Tuple[int, Any]:
+        batch = self.state.batches.get(batch_id)
+        if batch is None:
+            return 404, error_payload(f"No batch with ID {batch_id}.")
+        if batch["status"] == "validating":
+            batch["status"] = "in_progress"
+        elif batch["status"] == "in_progress" and time.time() - batch["created_at"] >= self.state.processing_delay:
+            self._complete_batch(batch)
+        return 200, batch
+
+    @route("POST", "/v1/batches/(?P<batch_id>[^/]+)/cancel")
+    def cancel_batch(self, batch_id: str) -> Tuple[int, Any]:
+        batch = self.state.batches.get(batch_id)
+        if batch is None:
+            return 404, error_payload(f"No batch with ID {batch_id}.")
+        if batch["status"] not in ("completed", "failed", "expired", "cancelled"):
+            batch["status"] = "cancelled"
+        return 200, batch
+
+    def _complete_batch(self, batch: Dict[str, Any]) -> None:
+        outputs, errors = [], []
+        for line in self.state.file_contents[batch["input_file_id"]].decode("utf-8").splitlines():
+            if not line.strip():
+                continue
+            request = json.loads(line)
+            if request.get("url") != batch["endpoint"]:
+                errors.append({"id": self.state.new_id("batch_req"), "custom_id": request.get("custom_id"), "response": None,
+                               "error": {"code": "invalid_url", "message": f"Expected {batch['endpoint']}."}})
+                continue
+            outputs.append({
+                "id": self.state.new_id("batch_req"),
+                "custom_id": request["custom_id"],
+                "response": {"status_code": 200, "request_id": self.state.new_id("req"), "body": mock_chat_completion(request["body"])},
+                "error": None,
+            })
+
+        to_jsonl = lambda records: "".join(json.dumps(record) + "\n" for record in records).encode("utf-8")
+        batch["output_file_id"] = self.state.add_file(f"{batch['id']}_output.jsonl", "batch_output", to_jsonl(outputs))["id"]
+        if errors:
+            batch["error_file_id"] = self.state.add_file(f"{batch['id']}_error.jsonl", "batch_output", to_jsonl(errors))["id"]
+        batch["request_counts"] = {"total": len(outputs) + len(errors), "completed": len(outputs), "failed": len(errors)}
+        batch["status"] = "completed"
+        batch["completed_at"] = int(time.time())
+
+def start_mock_server(
+    host: str = "127.0.0.1", port: int = 0, processing_delay: float = 0.0, latencies: Optional[Dict[str, str]] = None, seed: Optional[int] = None
+) -> Tuple[ThreadingHTTPServer, str]:
+    """
+    Starts the mock server on a background thread.
+
+    Parameters:
+    - host: The interface to listen on.
+    - port: The port to listen on; 0 picks a free port.
+    - processing_delay: Seconds before a batch completes.
+    - latencies: Latency distribution spec per endpoint group (see LATENCY_GROUPS), e.g. {"runs": "fixed:100"}.
+    - seed: Optional seed of the latency sampling, for reproducible benchmarks.
+
+    Returns:
+    - Tuple of the server (call `shutdown()` to stop it; its state is `server.RequestHandlerClass.state`) and the
+      base URL to pass to the OpenAI client.
+    """
+    server = ThreadingHTTPServer((host, port), create_handler(processing_delay, latencies, seed))
+    threading.Thread(target=server.serve_forever, name="mock-openai-server", daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}/v1"
+
+def create_handler(processing_delay: float = 0.0, latencies: Optional[Dict[str, str]] = None, seed: Optional[int] = None) -> type:
+    # Every server gets its own state
+    unknown_groups = set(latencies or {}) - set(LATENCY_GROUPS)
+    if unknown_groups:
+        raise ValueError(f"Unknown latency groups {sorted(unknown_groups)}; use {', '.join(LATENCY_GROUPS)}.")
+    return type("MockOpenAIHandler", (MockOpenAIHandler,), {"state": MockOpenAIState(processing_delay, latencies, seed)})
+
+def parse_latency_arguments(profile: str, latency_arguments: List[str]) -> Dict[str, str]:
+    # A profile, then "group=spec" overrides
+    latencies = dict(LATENCY_PROFILES[profile])
+    for latency_argument in latency_arguments:
+        group, _, spec = latency_argument.partition("=")
+        latencies[group.strip()] = spec.strip()
+    return latencies
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Serve a local stand-in for the OpenAI Assistants, Files, Vector Stores and Batches endpoints.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--processing-delay", type=float, default=0.0, help="Seconds before a batch completes.")
+    parser.add_argument("--latency-profile", choices=sorted(LATENCY_PROFILES), default="none", help="Base latencies of all endpoint groups.")
+    parser.add_argument("--latency", action="append", default=[], metavar="GROUP=SPEC",
+                        help=f"Latency of an endpoint group ({', '.join(LATENCY_GROUPS)}), e.g. runs=lognormal:150,0.3; repeatable.")
+    parser.add_argument("--seed", type=int, default=None, help="Seed of the latency sampling.")
+    args = parser.parse_args()
+
+    latencies = parse_latency_arguments(args.latency_profile, args.latency)
+    server = ThreadingHTTPServer((args.host, args.port), create_handler(args.processing_delay, latencies, args.seed))
+    logging.info(f"Mock OpenAI server listening on http://{args.host}:{args.port}/v1")
+    server.serve_forever()
+
+if __name__ == "__main__":
+    main()
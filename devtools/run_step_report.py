@@ -0,0 +1,46 @@
+"""
+Report of the run-step profiles recorded by conversations run with run-step profiling enabled (the "Profile Run
+Steps" sidebar option or batch_runner.py --profile-run-steps).
+
+Shows, per agent, per agent and round, and for the most expensive prompts, how many tool calls the runs made,
+how many chunks file_search retrieved and how the runs' server-side time split between tool calls and
+generation, so tool configurations can be changed where the tool loops do not pay off.
+
+Usage:
+    python -m devtools.run_step_report
+    python -m devtools.run_step_report --profiles .cache/run_step_profiles.jsonl --agent "Data Scientist" --json report.json
+"""
+import json
+import argparse
+
+from controller.run_step_profiler import RUN_STEP_PROFILE_PATH, load_run_profiles, aggregate_run_profiles, format_run_profile_report
+
+def main():
+    parser = argparse.ArgumentParser(description="Summarize the recorded run-step profiles.")
+    parser.add_argument("--profiles", default=RUN_STEP_PROFILE_PATH, help="JSONL file written by the profiler.")
+    parser.add_argument("--agent", action="append", default=[], help="Only include runs of this agent; repeatable.")
+    parser.add_argument("--since", type=float, help="Only include runs recorded after this Unix timestamp.")
+    parser.add_argument("--top-prompts", type=int, default=10, help="Prompts listed in the most-expensive-prompts section.")
+    parser.add_argument("--json", help="Also write the aggregates to this file.")
+    args = parser.parse_args()
+
+    records = [
+        record for record in load_run_profiles(args.profiles)
+        if (not args.agent or record["agent"] in args.agent) and (args.since is None or record["recorded_at"] >= args.since)
+    ]
+    if not records:
+        print(f"No run-step profiles in {args.profiles}.")
+        return
+    print(format_run_profile_report(records, args.top_prompts))
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as file:
+            json.dump({
+                "runs": len(records),
+                "per_agent": aggregate_run_profiles(records, ("agent",)),
+                "per_agent_and_round": aggregate_run_profiles(records, ("agent", "round")),
+                "per_prompt": aggregate_run_profiles(records, ("prompt",)),
+            }, file, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -1,21 +1,35 @@
 import streamlit as st
 import openai
-from openai import OpenAI
 import os
 import asyncio
 import time
 import random
 import datetime
+import uuid
 
 from dotenv import load_dotenv
 from controller.vector_store import initialize_vector_store
-from controller.file import upload_pdfs_to_vector_store
-from controller.input_guardrail import initialize_risk_guard, topical_guardrail_for_risk_assessment
+from controller.chunk_ingestion import sync_pdf_chunks_to_vector_store
+from controller.local_retrieval import load_local_index
+from controller.file_metadata_cache import prefetch_vector_store_file_names, get_file_cache_stats
+from controller.async_runtime import run_async
+from controller.input_guardrail import get_risk_guard_assistant, topical_guardrail_for_risk_assessment
 from controller.agent import create_agent, delete_agent_by_id
-from controller.response_text_file import generate_conversation_text
-
-from view.format_response import extract_response_with_citations, show_risk
+from controller.context_compaction import CONTEXT_TOKEN_BUDGET
+from controller.conversation import run_conversation, generate_agent_response, PDFS_DIR
+from controller.risk_cache import get_cached_risk_assessment, store_risk_assessment
+from controller.risk_classifier import classify_description, record_classifier_agreement
+from controller.response_text_file import Transcript, EXPORT_FORMATS
+from controller.run_completion import RunNotCompletedError
+from controller.rate_limiter import RateLimitedClient, get_rate_limiter
+from controller.client_factory import create_openai_client, ConnectionMetrics
+from controller.tracing import get_tracer, get_current_trace_id, start_metrics_server
+from controller.run_step_profiler import load_run_profiles, aggregate_run_profiles
+from controller.token_usage import usage_scope, get_usage_summary, current_day
+
+from view.format_response import extract_response_with_citations, show_risk, render_streaming_text
 from view.helper_prompts import display_helper_prompts
+from view.trace_waterfall import display_trace_waterfall
 
 st.set_page_config(page_title="Agents4EthicalSE")
 
@@ -25,15 +39,41 @@ load_dotenv()
 # Set OpenAI API key and model
 #os.environ["OPENAI_API_KEY"] = st.secrets["OPENAI_API_KEY"]
 #api_client = OpenAI(api_key=st.secrets["OPENAI_API_KEY"])
-api_client =  OpenAI(api_key=st.secrets["OPENAI_API_KEY"], default_headers={"OpenAI-Beta": "assistants=v2"})
+model = "gpt-4o-mini"
+
+@st.cache_resource
+def get_api_clients():
+    """
+    Creates the API clients once per process, so every session and rerun reuses the same connection pools.
+
+    Returns:
+    - Tuple of the sync client, the async client (both behind the shared rate limiter, which also does the
+      retries) and their connection metrics.
+    """
+    connection_metrics = ConnectionMetrics()
+    client_options = {"max_retries": 0, "default_headers": {"OpenAI-Beta": "assistants=v2"}, "metrics": connection_metrics}
+    sync_client = create_openai_client(st.secrets["OPENAI_API_KEY"], **client_options)
+    # The async client is only used on the shared event loop of run_async, so its pool never changes loops
+    async_client = create_openai_client(st.secrets["OPENAI_API_KEY"], async_client=True, **client_options)
+    return RateLimitedClient(sync_client, model), RateLimitedClient(async_client, model), connection_metrics
+
+api_client, async_api_client, connection_metrics = get_api_clients()
+
+@st.cache_resource
+def start_trace_metrics_server(port):
+    # One Prometheus endpoint per process, shared by every session
+    return start_metrics_server(port)
+
+# Span durations are served for Prometheus if a port is configured
+if os.getenv("TRACE_METRICS_PORT"):
+    start_trace_metrics_server(int(os.getenv("TRACE_METRICS_PORT")))
+
 #api_key = st.secrets["OPENAI_API_KEY"]  # or load however you'd like
 #api_client = OpenAI(api_key=api_key)
 #openai.api_key = os.getenv("OPENAI_API_KEY")
 #api_client = openai.OpenAI(api_key=openai.api_key)
-model = "gpt-4o-mini"
 
 # Ensure the directory exists
-PDFS_DIR = "./pdf_data_sources"
 os.makedirs(PDFS_DIR, exist_ok=True)
 
 # Initializing vector store 
@@ -41,9 +81,19 @@ os.makedirs(PDFS_DIR, exist_ok=True)
 vector_store_name = "Agents4EthicalSE"
 vector_store, exists = initialize_vector_store(api_client, vector_store_name)
 
-# Uploading pdf data sources to the new vector store
-if not exists:
-    upload_pdfs_to_vector_store(api_client, vector_store.id, PDFS_DIR)
+@st.cache_resource
+def sync_pdf_data_sources(vector_store_id):
+    # Synchronizing pdf data sources with the vector store once per process; only changed chunks of amended
+    # documents are re-uploaded
+    report = sync_pdf_chunks_to_vector_store(api_client, vector_store_id, PDFS_DIR)
+    # Build (or open) the memory-mapped local index here, so local retrieval queries only read it
+    load_local_index(PDFS_DIR)
+    return report
+
+sync_pdf_data_sources(vector_store.id)
+
+# Cache the names of the cited documents so citations resolve without network calls
+prefetch_vector_store_file_names(api_client, vector_store.id)
 
 def display_sidebar_messages(successMessage="", errorMessage="", writeMessage=""):
     if successMessage:
@@ -126,7 +176,9 @@ def add_agents():
             elif agent_role:
                 # Create the agent using the `create_agent` function
                 agent = create_agent(api_client, agent_name, agent_role, model, vector_store.id)
-                
+                if agent is None:
+                    display_sidebar_messages(errorMessage=f"Agent '{agent_name}' could not be created. Please try again.")
+
                 # Add the new agent to the session state
                 st.session_state['agents'].append({
                     "id": agent.id,
@@ -193,85 +245,48 @@ def get_random_color():
     ]
     return random.choice(colors)
 
-def generate_agent_response(agent, context, thread_multiagent, is_unacceptable_risk = False):
-    # Add a message to the thread
-    message_multiagent = {
-        "role": "user",
-        "content": [
-            {
-                "type": "text",
-                "text": context
-            }
-        ]
-    }
-
-    api_client.beta.threads.messages.create(thread_id=thread_multiagent.id, **message_multiagent)
-
-    if is_unacceptable_risk:
-        agent_id=agent.id
-    else:
-        agent_id=agent['id']
-
-    # Initiate a run
-    run = api_client.beta.threads.runs.create(
-        thread_id=thread_multiagent.id,
-        assistant_id=agent_id          
-    )
+def display_round_header(round_number):
+    st.markdown(f"<h3 style='color: #c63678;'>Round: {round_number}</h3>", unsafe_allow_html=True)
 
-    # Wait for the run to complete
-    while True:
-        run_status = api_client.beta.threads.runs.retrieve(run.id, thread_id=thread_multiagent.id)
-        if run_status.status == 'completed':
-            break
-        elif run_status.status == 'failed':
-            raise Exception(f"Run failed.")
-        time.sleep(5)  # Poll every 5 second
-
-    # Fetch the messages from the thread
-    response_messages = api_client.beta.threads.messages.list(thread_id=thread_multiagent.id)
-    response, citations = extract_response_with_citations(api_client, response_messages)
-    
-    return response, citations
+def display_agent_header(agent):
+    # Display the agent's name with its assigned color
+    color = st.session_state['agent_colors'][agent['name']]
+    st.markdown(f"""<h4 style='color: {color}; padding: 10px; border-radius: 5px; margin-bottom: 10px;'>
+        {agent['name']}:</h4>""", unsafe_allow_html=True)
 
-def summarize_conversation(conversation_history, summary_agent, thread_multiagent):
-    """
-    Generates a summary of the conversation history using the specified agent.
-
-    Parameters:
-    - conversation_history: The current conversation history to be summarized.
-    - summary_agent: The agent responsible for summarization.
-    - thread_multiagent: The thread object for communication.
+def display_agent_response(response_placeholder, response, citations):
+    # Replace any partial text with the final response including citation markers
+    response_placeholder.markdown(f"""<div style='padding: 10px; border-radius: 5px; margin-bottom: 10px;'>{response}</div>""", unsafe_allow_html=True)
 
-    Returns:
-    - A summarized text of the conversation.
-    """
-    response, _ = generate_agent_response(summary_agent, conversation_history, thread_multiagent)
-    return response.strip()
+    # Display citations if available
+    if citations:
+        st.markdown("**Source:**")
+        st.write(citations)
 
-def initiate_conversation(project_description, rounds, ai_ethicist_agent):
+def initiate_conversation(project_description, rounds, ai_ethicist_agent, stream_responses=False, parallel_rounds=False, context_token_budget=CONTEXT_TOKEN_BUDGET, local_retrieval=False, profile_run_steps=False, token_budget=None, budget_action="stop", conversation_key=None):
     """
     Initiates a multi-round conversation among agents and displays their responses.
 
+    Every completed turn is checkpointed, so an interrupted conversation resumes from its last completed turn.
+    A finished conversation is kept in the session state under `conversation_key`, so reruns redisplay it with
+    `replay_conversation` instead of running a new one.
+
     Parameters:
     - project_description: Initial project description to start the conversation.
     - rounds: Number of conversation rounds to run.
     - ai_ethicist_agent: The special 'AI Ethicist' agent to be included at the end of each round.
+    - stream_responses: Whether to render each agent's text as it is generated.
+    - parallel_rounds: Whether all agents except the AI Ethicist answer each round concurrently.
+    - context_token_budget: Token count above which the oldest turns are folded into a summary.
+    - local_retrieval: Whether to ground turns with passages from the local index instead of file_search.
+    - profile_run_steps: Whether to record where each run's time went (tool calls versus generation).
+    - token_budget: Optional maximum number of tokens the conversation may use; it stops before exceeding it.
+    - budget_action: 'stop', or 'economy' to first switch to cheaper runs when nearing the budget.
+    - conversation_key: The key the finished conversation is kept under (see `get_conversation_key`).
 
     Returns:
-    - None
+    - The conversation transcript.
     """
-    conversation_history = [project_description]
-
-    # Create thread
-    thread_message = {
-        "tool_resources": {
-            "file_search": {
-                "vector_store_ids": [vector_store.id]
-            }
-        }
-    }
-    thread_multiagent = api_client.beta.threads.create(**thread_message)
-
     # Assign random colors to agents if not already done
     if 'agent_colors' not in st.session_state:
         st.session_state['agent_colors'] = {agent['name']: get_random_color() for agent in st.session_state['agents']}
@@ -279,49 +294,109 @@ def initiate_conversation(project_description, rounds, ai_ethicist_agent):
     # Ensure the AI Ethicist is always the last agent in the list
     st.session_state['agents'] = sorted(st.session_state['agents'], key=lambda x: x['id'] == ai_ethicist_agent.id)
 
-    for round_number in range(rounds):
-        st.markdown(f"<h3 style='color: #c63678;'>Round: {round_number + 1}</h3>", unsafe_allow_html=True)
-        st.session_state['conversation_history'].append("ROUND: " + str(round_number + 1))
-
-        for agent in st.session_state['agents']:
-            context = " ".join(conversation_history)
-
-            # Generate agent's response using the assistant API
-            response, citations = generate_agent_response(agent, context, thread_multiagent)
-
-            # Append the response to conversation history
-            conversation_history.append(response)
-            st.session_state['conversation_history'].append(agent['name'] + ": " + response)
-
-            # Display the current agent's response with its assigned color
-            color = st.session_state['agent_colors'][agent['name']]
-            st.markdown(f"""<h4 style='color: {color}; padding: 10px; border-radius: 5px; margin-bottom: 10px;'>
-                {agent['name']}:</h4>""", unsafe_allow_html=True)
-            st.markdown(f"""<div style='padding: 10px; border-radius: 5px; margin-bottom: 10px;'>{response}</div>""", unsafe_allow_html=True)
-
-            # Display citations if available
-            if citations:
-                st.markdown("**Source:**")
-                st.write(citations)
-       
-        # Summarize the conversation history at the end of each round
-        # summary = summarize_conversation(conversation_history, ai_ethicist_agent, thread_multiagent)
-
-        # Update the conversation history with the summary
-        # conversation_history = [summary]
-
-        # Display the summary at the end of the round
-        # st.markdown(f"<h4 style='color: #FF6347;'>Summary after Round {round_number + 1}:</h4>", unsafe_allow_html=True)
-        # st.markdown(f"""<div style='color: #FF6347; padding: 10px; border-radius: 5px; margin-bottom: 10px;'>
-        #     <strong>AI Ethicist Summary:</strong> {summary}</div>""", unsafe_allow_html=True)
-
-    conversation_text = generate_conversation_text(
-                    st.session_state['conversation_history'],
-                    st.session_state['agents'],
-                    project_description=project_description
-                )
-    
-    return conversation_text
+    response_placeholders = {}
+    # What was displayed, so reruns can show the finished conversation again
+    displayed_events = []
+    budget_exhausted = False
+
+    def on_round_start(round_number):
+        # Remember the conversation's trace for the timing waterfall
+        st.session_state['trace_id'] = get_current_trace_id()
+        display_round_header(round_number)
+        displayed_events.append(("round", round_number))
+
+    def on_turn_start(agent):
+        display_agent_header(agent)
+        response_placeholders[agent['id']] = st.empty()
+        # Render partial text while the agent is writing if streaming
+        return render_streaming_text(response_placeholders[agent['id']]) if stream_responses else None
+
+    def on_turn_complete(agent, response, citations):
+        display_agent_response(response_placeholders.pop(agent['id']), response, citations)
+        displayed_events.append(("turn", agent, response, citations))
+
+    def on_budget_reached(action, used_tokens, token_budget):
+        nonlocal budget_exhausted
+        budget_exhausted = budget_exhausted or action == "stop"
+        if action == "economy":
+            st.info(f"{used_tokens} of {token_budget} tokens used: the agents continue without file search and with a shorter context.")
+        else:
+            st.warning(f"The conversation stopped at {used_tokens} of {token_budget} tokens before exceeding its budget. Raise the budget and run it again to resume.")
+
+    transcript = run_conversation(
+        api_client,
+        project_description,
+        st.session_state['agents'],
+        rounds,
+        ai_ethicist_agent.id,
+        vector_store.id,
+        model,
+        transcript=st.session_state['conversation_history'],
+        parallel_rounds=parallel_rounds,
+        context_token_budget=context_token_budget,
+        local_retrieval=local_retrieval,
+        profile_run_steps=profile_run_steps,
+        token_budget=token_budget,
+        budget_action=budget_action,
+        # Only this session's interrupted conversations are resumed
+        resume_scope=st.session_state['usage_session_id'],
+        on_round_start=on_round_start,
+        on_turn_start=on_turn_start,
+        on_turn_complete=on_turn_complete,
+        on_compacted=lambda token_budget: st.caption(f"Earlier turns were summarized to keep the context within {token_budget} tokens."),
+        on_budget_reached=on_budget_reached,
+        parallel_wait=lambda agents: st.spinner(f"Waiting for {len(agents)} agent(s) to respond...")
+    )
+    # Conversations stopped by the budget stay resumable instead
+    if not budget_exhausted:
+        st.session_state['finished_conversation'] = {"key": conversation_key, "transcript": transcript, "events": displayed_events}
+    return transcript
+
+def get_conversation_key(project_description, agents, rounds):
+    # Identifies the conversation of a description, set of agents and number of rounds within the session
+    return (project_description, tuple(sorted(agent['id'] for agent in agents)), rounds)
+
+def replay_conversation(finished_conversation):
+    """
+    Displays a finished conversation of this session again, without any API calls.
+
+    Parameters:
+    - finished_conversation: The dict kept by `initiate_conversation` ('key', 'transcript' and 'events').
+
+    Returns:
+    - The conversation transcript.
+    """
+    for event in finished_conversation['events']:
+        if event[0] == "round":
+            display_round_header(event[1])
+        else:
+            _, agent, response, citations = event
+            display_agent_header(agent)
+            display_agent_response(st.empty(), response, citations)
+    return finished_conversation['transcript']
+
+async def bootstrap_session(agent_role_file_content, risk_agent, module_description):
+    """
+    Looks up (or creates) the AI Ethicist and runs the RiskGuard assessment concurrently.
+
+    Parameters:
+    - agent_role_file_content: The role/instructions for the AI Ethicist agent.
+    - risk_agent: The RiskGuard assistant object.
+    - module_description: The description to assess; no assessment is run if empty.
+
+    Returns:
+    - Tuple of the AI Ethicist agent and the RiskGuard messages (None if no assessment was run).
+    """
+    ai_ethicist_task = asyncio.to_thread(create_agent, api_client, "AI Ethicist", agent_role_file_content, model, vector_store.id)
+    if not module_description:
+        return await ai_ethicist_task, None
+
+    # The assessment creates its own thread, so thread creation overlaps with the AI Ethicist lookup too
+    ai_ethicist_agent, messages = await asyncio.gather(
+        ai_ethicist_task,
+        topical_guardrail_for_risk_assessment(async_api_client, risk_agent, None, module_description)
+    )
+    return ai_ethicist_agent, messages
 
 def main():
     # Main view title
@@ -329,23 +404,15 @@ def main():
 
     st.session_state.setdefault("user_input", "")
     st.session_state.setdefault("risk_level", "")
-    st.session_state['conversation_history'] = []
 
-    conversation_text = "" 
+    transcript = None
     number_of_rounds = "" 
     module_description = ""
 
-    risk_agent, thread = initialize_risk_guard(api_client, vector_store, model)
+    risk_agent = get_risk_guard_assistant(api_client, model)
 
     with open("agent_role_examples/AI_ethicist.txt", "r", encoding="utf-8") as file:
         agent_role_file_content = file.read()
-    ai_ethicist_agent = create_agent(api_client, "AI Ethicist", agent_role_file_content, model, vector_store.id)
-
-    display_agents(ai_ethicist_agent)
-
-    add_agents()
-    
-    number_of_rounds = st.sidebar.number_input("Select Number of Round(s)", min_value=1, max_value=10, value=1, help="Input a total number for agents to converse in round.")
 
     display_helper_prompts(st)
     st.markdown("<div style='margin-top: 15px;'></div>", unsafe_allow_html=True)
@@ -355,22 +422,106 @@ def main():
                         key="user_input",
                         help = "Provide clear instructions here about what is the AI system intended to do? In which sector or context will it be deployed? Who will be using it?")
 
+    # Reuse a previous assessment of the same description instead of running RiskGuard again
+    cached_assessment = get_cached_risk_assessment(module_description, model) if module_description else None
+    needs_assessment = bool(module_description) and not cached_assessment
+
+    # Show the local classifier's provisional category while RiskGuard confirms or revises it
+    provisional_risk = classify_description(module_description) if needs_assessment else None
+    provisional_placeholder = st.empty()
+    if provisional_risk:
+        provisional_placeholder.info(f"Provisional assessment: **{provisional_risk}** (confirming with RiskGuard...)")
+
+    # Look up the AI Ethicist and run the risk assessment concurrently
+    with get_tracer().span("session bootstrap", assessment=needs_assessment):
+        ai_ethicist_agent, messages = run_async(bootstrap_session(
+            agent_role_file_content, risk_agent, module_description if needs_assessment else ""
+        ))
+    provisional_placeholder.empty()
+    if ai_ethicist_agent is None:
+        st.error("The AI Ethicist could not be initialized, the API may be overloaded. Please try again in a moment.")
+        st.stop()
+
+    display_agents(ai_ethicist_agent)
+
+    add_agents()
+    
+    number_of_rounds = st.sidebar.number_input("Select Number of Round(s)", min_value=1, max_value=10, value=1, help="Input a total number for agents to converse in round.")
+    stream_responses = st.sidebar.checkbox("Stream Responses", value=True, help="Show each agent's answer as it is being written.")
+    parallel_rounds = st.sidebar.checkbox("Parallel Rounds", value=False, help="Let all agents except the AI Ethicist answer each round at the same time.")
+    local_retrieval = st.sidebar.checkbox("Local Retrieval", value=False, help="Ground the agents with passages from a local index of the PDF data sources instead of the hosted file search.")
+    context_token_budget = st.sidebar.number_input("Context Token Budget", min_value=1000, max_value=100000, value=CONTEXT_TOKEN_BUDGET, step=1000, help="Older turns are summarized once the conversation grows beyond this many tokens.")
+    show_waterfall = st.sidebar.checkbox("Show Timing Waterfall", value=False, help="Show where the time of the last conversation went, per API call.")
+    profile_run_steps = st.sidebar.checkbox("Profile Run Steps", value=False, help="Record each run's tool calls, retrieved chunks and step durations (one extra request per turn).")
+    token_budget = st.sidebar.number_input("Token Budget per Conversation", min_value=0, max_value=10000000, value=0, step=10000, help="The conversation stops before its runs use more tokens than this; 0 means unlimited.")
+    budget_action = st.sidebar.selectbox("When Nearing the Budget", ["Stop", "Switch to Economy Mode"], help="Economy mode runs the agents without file search and with only the latest messages as context.")
+
+    # Tokens and estimated cost of this session and of today, over every session of this machine
+    session_usage = get_usage_summary((), session_id=st.session_state['usage_session_id'])[0]
+    day_usage = get_usage_summary((), day=current_day())[0]
+    if day_usage["runs"]:
+        st.sidebar.caption(
+            f"Usage: {session_usage['total_tokens']} tokens (~${session_usage['cost']:.4f}) this session, "
+            f"{day_usage['total_tokens']} tokens (~${day_usage['cost']:.4f}) today."
+        )
+
+    # Report how long requests waited for the shared rate limiter, how often connections were reused and how
+    # often cited file names were served from the file metadata cache
+    rate_limiter_stats = get_rate_limiter().get_stats()
+    connection_stats = connection_metrics.snapshot()
+    file_cache_stats = get_file_cache_stats()
+    if rate_limiter_stats["queued_requests"]:
+        st.sidebar.caption(
+            f"Rate limiter: {rate_limiter_stats['queued_requests']} of {rate_limiter_stats['requests']} requests queued "
+            f"(avg {rate_limiter_stats['average_queue_seconds']:.2f}s, max {rate_limiter_stats['max_queue_seconds']:.2f}s), "
+            f"{rate_limiter_stats['retries']} retries."
+        )
+    if connection_stats["requests"]:
+        st.sidebar.caption(
+            f"Connections: {connection_stats['reused_requests']} of {connection_stats['requests']} requests reused a connection "
+            f"({connection_stats['connections']} opened, {connection_stats['handshake_seconds']:.2f}s in handshakes)."
+        )
+    if file_cache_stats["hits"] or file_cache_stats["misses"]:
+        st.sidebar.caption(
+            f"File name cache: {file_cache_stats['hits']} hits, {file_cache_stats['misses']} misses "
+            f"({file_cache_stats['size']} names cached, {file_cache_stats['prefetched']} prefetched, {file_cache_stats['evictions']} evicted)."
+        )
+
+    # A conversation this session already finished is shown again (e.g., after changing the export format) instead
+    # of starting a new, paid one; any other transcript is rebuilt while the assessment and conversation run
+    conversation_key = get_conversation_key(module_description, st.session_state['agents'], number_of_rounds)
+    finished_conversation = st.session_state.get('finished_conversation')
+    if not finished_conversation or finished_conversation['key'] != conversation_key:
+        finished_conversation = None
+    st.session_state['conversation_history'] = finished_conversation['transcript'] if finished_conversation else Transcript()
+
     if module_description:
-        messages = asyncio.run(topical_guardrail_for_risk_assessment(api_client, risk_agent, thread, module_description))
-        if messages.data:
-            guardrail_response, citations = extract_response_with_citations(api_client, messages)
+        if cached_assessment:
+            guardrail_response, citations = cached_assessment
+        else:
+            guardrail_response, citations = "", []
+            if messages:
+                guardrail_response, citations = extract_response_with_citations(api_client, messages)
+                store_risk_assessment(module_description, model, guardrail_response, citations)
+
+        if guardrail_response:
             st.session_state.risk_level = show_risk(st, guardrail_response, citations)
-            st.session_state['conversation_history'].append("RiskGuard:" + guardrail_response)
+            if not finished_conversation:
+                st.session_state['conversation_history'].append("RiskGuard:" + guardrail_response)
+            if not cached_assessment:
+                record_classifier_agreement(provisional_risk, st.session_state.risk_level)
 
     if module_description and st.session_state['agents'] and st.session_state.risk_level:
         if st.session_state.risk_level != "Unacceptable Risk":
-            conversation_text = initiate_conversation(module_description, number_of_rounds, ai_ethicist_agent)
+            try:
+                if finished_conversation:
+                    transcript = replay_conversation(finished_conversation)
+                else:
+                    transcript = initiate_conversation(module_description, number_of_rounds, ai_ethicist_agent, stream_responses=stream_responses, parallel_rounds=parallel_rounds, context_token_budget=context_token_budget, local_retrieval=local_retrieval, profile_run_steps=profile_run_steps, token_budget=token_budget or None, budget_action="economy" if budget_action == "Switch to Economy Mode" else "stop", conversation_key=conversation_key)
+            except RunNotCompletedError as error:
+                st.error(f"The conversation stopped because a run ended with status '{error.status}'. Completed turns were saved; run it again to resume from the last completed turn.")
         else:
-            conversation_text = generate_conversation_text(
-                    st.session_state['conversation_history'],
-                    st.session_state['agents'],
-                    project_description=module_description
-                )
+            transcript = st.session_state['conversation_history']
             if st.button("Learn More"):
                 context = "Given that the user provided following module description: " + module_description + " The risk assesment agent evaluated the AI system with the following criteria: " + guardrail_response + "Discuss the evaluation in detail compliant with the European Union's AI Act grounded on the documents provided. DO NOT GIVE ANY CODE IN YOUR RESPONSE."
 
@@ -383,28 +534,36 @@ def main():
                 }
 
                 thread_ai_ethicist = api_client.beta.threads.create(**thread_unacceptable_risk)
-                response, citations = generate_agent_response(ai_ethicist_agent, context, thread_ai_ethicist, is_unacceptable_risk= True)
+                response, citations = generate_agent_response(api_client, ai_ethicist_agent, context, thread_ai_ethicist, is_unacceptable_risk= True)
                 st.session_state['conversation_history'].append("AI Ethicist:" + response)               
                 st.markdown(f"""<div style='padding: 10px; border-radius: 5px; margin-bottom: 10px;'>{response}</div>""", unsafe_allow_html=True)
                 if citations:
                     st.markdown("**Source:**")
                     st.write(citations)
 
-                conversation_text = generate_conversation_text(
-                    st.session_state['conversation_history'],
-                    st.session_state['agents'],
-                    project_description=module_description
-                )
-
 
-    if conversation_text:
+    if transcript is not None:
+        # A finished conversation's transcript is kept across reruns, so its entries are only rendered once per format
+        transcript.project_description = module_description
+        transcript.agents = st.session_state['agents']
+        export_format = st.sidebar.selectbox("Transcript Format", list(EXPORT_FORMATS), help="Plain text, Markdown or one JSON object per line.")
+        compress_export = st.sidebar.checkbox("Compress Transcript (gzip)", value=False)
         st.sidebar.download_button(
         label="Download Conversation",
-        data=conversation_text,
-        file_name="conversation_history.txt",
-        mime="text/plain"
+        data=transcript.export(export_format, compress_export),
+        file_name=transcript.file_name(export_format, compress_export),
+        mime=transcript.mime_type(export_format, compress_export)
     )
     
+    if show_waterfall and st.session_state.get('trace_id'):
+        display_trace_waterfall(st.sidebar, get_tracer().get_trace(st.session_state['trace_id']))
+
+    # Tool calls and step time per agent over every profiled run (see devtools/run_step_report.py for the full report)
+    if profile_run_steps:
+        run_profiles = aggregate_run_profiles(load_run_profiles(), ("agent",))
+        if run_profiles:
+            st.sidebar.dataframe(run_profiles, hide_index=True, use_container_width=True)
+
     current_year = datetime.datetime.now().year
 
     st.markdown(
@@ -429,4 +588,7 @@ def main():
     )
 
 if __name__ == "__main__":
-    main()
+    # Every run of this browser session is recorded under the same session ID
+    st.session_state.setdefault('usage_session_id', uuid.uuid4().hex)
+    with usage_scope(session_id=st.session_state['usage_session_id']):
+        main()
@@ -2,12 +2,14 @@ import os
 import openai
 from dotenv import load_dotenv
 
+from controller.client_factory import create_openai_client
+
 # Load environment variables
 load_dotenv()
 
 # Set OpenAI API key
 openai.api_key = os.getenv("OPENAI_API_KEY")
-client = openai.OpenAI(api_key=openai.api_key)
+client = create_openai_client(openai.api_key)
 modelName = "gpt-4o-mini"
 
 assistants = client.beta.assistants.list()
@@ -1,13 +1,15 @@
-from typing import Tuple, List, Any
+from typing import Tuple, List, Any, Callable
 import json
 
+from controller.file_metadata_cache import get_cached_file_name
+
 def extract_response_with_citations(client: Any, response_messages: Any) -> Tuple[str, List[str]]:
     """
     Extracts the assistant's response and formats citations from the given response messages.
 
     Parameters:
     - client: The client object to interact with the file service.
-    - response_messages: The response messages object containing the assistant's messages.
+    - response_messages: The response messages, either a page object with `.data` or a list, newest first.
 
     Returns:
     - Tuple[str, List[str]]: A tuple containing the formatted response text and a list of citations.
@@ -16,27 +18,80 @@ def extract_response_with_citations(client: Any, response_messages: Any) -> Tupl
     citations = []
 
     # Iterate through response messages to find the assistant's response
-    for message in response_messages.data:
+    for message in getattr(response_messages, "data", response_messages):
         if message.role == "assistant" and message.content:
-            message_content = message.content[0].text
-            annotations = message_content.annotations
-
-            # Replace annotated text with citation indices and generate citations list
-            for index, annotation in enumerate(annotations):
-                message_content.value = message_content.value.replace(
-                    annotation.text, f"<span style='color: #B22222;'><b>[{index}]</b></span>"
-                )
-                # Retrieve the file citation if present and format it
-                if file_citation := getattr(annotation, "file_citation", None):
-                    cited_file = client.files.retrieve(file_citation.file_id)
-                    citations.append(f"[{index}] {cited_file.filename}")
+            text_blocks = []
+            index = 0
+
+            # A message can hold several content blocks; only text blocks carry the answer and its citations
+            for content_block in message.content:
+                if getattr(content_block, "type", "text") != "text":
+                    continue
+                message_content = content_block.text
+                block_text = message_content.value
+
+                # Replace annotated text with citation indices and generate citations list
+                for annotation in message_content.annotations:
+                    block_text = block_text.replace(
+                        annotation.text, f"<span style='color: #B22222;'><b>[{index}]</b></span>"
+                    )
+                    # Retrieve the file citation if present and format it
+                    if file_citation := getattr(annotation, "file_citation", None):
+                        cited_file_name = get_cached_file_name(client, file_citation.file_id)
+                        citations.append(f"[{index}] {cited_file_name}")
+                    index += 1
+
+                text_blocks.append(block_text)
 
             # Set the response text to the formatted content
-            response_text = message_content.value
+            response_text = "\n\n".join(text_blocks)
             break  # Only process the first assistant response
 
     return response_text.strip(), citations
 
+def render_streaming_text(placeholder: Any) -> Callable[[str], None]:
+    """
+    Creates a callback that renders streamed text deltas into a Streamlit placeholder.
+
+    Parameters:
+    - placeholder: The Streamlit placeholder (e.g., from `st.empty()`) to render into.
+
+    Returns:
+    - Callable[[str], None]: A callback to be invoked with each text delta as it arrives.
+    """
+    streamed_text = []
+
+    def on_text_delta(text_delta: str) -> None:
+        streamed_text.append(text_delta)
+        # Show a cursor while the agent is still writing
+        placeholder.markdown("".join(streamed_text) + " ▌")
+
+    return on_text_delta
+
+# Risk categories in the order they are matched, and the tile color of each
+RISK_TILE_COLORS = {
+    "Unacceptable Risk": "#B22222",  # Dark Red (Firebrick)
+    "High Risk": "#FF8C00",  # Dark Orange
+    "Limited Risk": "#40E0D0",  # Dark Yellow (Gold)
+    "Minimal Risk": "#228B22",  # Dark Green (Forest Green)
+    "Unknown Risk": "#A9A9A9",  # Dark Gray (Default)
+}
+
+def detect_risk_level(response: str) -> str:
+    """
+    Detects the risk category named in a RiskGuard response without rendering anything.
+
+    Parameters:
+    - response: The response text from the AI assessment.
+
+    Returns:
+    - str: The detected risk level/category, "Unknown Risk" if none is named.
+    """
+    for risk_level in RISK_TILE_COLORS:
+        if risk_level != "Unknown Risk" and risk_level in response:
+            return risk_level
+    return "Unknown Risk"
+
 def show_risk(st, response: str, citations: list) -> str:
     """
     Displays the response text in a colored tile based on the detected risk category and returns the risk level.
@@ -49,21 +104,8 @@ def show_risk(st, response: str, citations: list) -> str:
     - str: The detected risk level/category.
     """
     # Determine the risk level from the response text
-    if "Unacceptable Risk" in response:
-        tile_color = "#B22222"  # Dark Red (Firebrick)
-        risk_level = "Unacceptable Risk"
-    elif "High Risk" in response:
-        tile_color = "#FF8C00"  # Dark Orange
-        risk_level = "High Risk"
-    elif "Limited Risk" in response:
-        tile_color = "#40E0D0"  # Dark Yellow (Gold)
-        risk_level = "Limited Risk"
-    elif "Minimal Risk" in response:
-        tile_color = "#228B22"  # Dark Green (Forest Green)
-        risk_level = "Minimal Risk"
-    else:
-        tile_color = "#A9A9A9"  # Dark Gray (Default)
-        risk_level = "Unknown Risk"
+    risk_level = detect_risk_level(response)
+    tile_color = RISK_TILE_COLORS[risk_level]
 
     # Convert the response string to a dictionary
     try:
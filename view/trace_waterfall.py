@@ -0,0 +1,80 @@
+from typing import Any, Dict, List
+
+# Width of the timing bars in characters
+WATERFALL_WIDTH = 30
+# Spans beyond this are left out of the waterfall (they still count in the totals)
+MAX_WATERFALL_ROWS = 150
+
+def format_trace_waterfall(spans: List[Dict[str, Any]], width: int = WATERFALL_WIDTH, max_rows: int = MAX_WATERFALL_ROWS) -> str:
+    """
+    Renders the spans of one trace as a text waterfall: one row per span, indented by nesting depth, with a bar
+    placed at the span's offset from the start of the trace.
+
+    Parameters:
+    - spans: The span dicts of the trace (see `Tracer.get_trace`), ordered by start time.
+    - width: The width of the timing bars in characters.
+    - max_rows: The maximum number of rows.
+
+    Returns:
+    - str: The waterfall, one line per span.
+    """
+    if not spans:
+        return ""
+
+    trace_start = min(span["start_time"] for span in spans)
+    trace_end = max(span["start_time"] + (span["duration_seconds"] or 0.0) for span in spans)
+    total = max(trace_end - trace_start, 1e-6)
+    parents = {span["span_id"]: span["parent_id"] for span in spans}
+
+    def depth(span):
+        level, parent_id = 0, span["parent_id"]
+        while parent_id in parents:
+            level, parent_id = level + 1, parents[parent_id]
+        return level
+
+    rows = []
+    for span in spans[:max_rows]:
+        duration = span["duration_seconds"] or 0.0
+        offset = int((span["start_time"] - trace_start) / total * width)
+        length = max(int(duration / total * width), 1)
+        bar = (" " * offset + "█" * length)[:width].ljust(width)
+        label = "  " * depth(span) + span["name"] + (" (error)" if span["error"] else "")
+        rows.append(f"{bar} {duration * 1000:>8.0f}ms {label}")
+    if len(spans) > max_rows:
+        rows.append(f"... {len(spans) - max_rows} more span(s)")
+    return "\n".join(rows)
+
+def summarize_trace(spans: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Sums the time of the API calls and waits of a trace by operation name.
+
+    Parameters:
+    - spans: The span dicts of the trace.
+
+    Returns:
+    - List of dicts with 'operation', 'calls' and 'total_ms', slowest first.
+    """
+    totals = {}
+    for span in spans:
+        if span["kind"] in ("api", "wait"):
+            total = totals.setdefault(span["name"], {"operation": span["name"], "calls": 0, "total_ms": 0.0})
+            total["calls"] += 1
+            total["total_ms"] += (span["duration_seconds"] or 0.0) * 1000
+    for total in totals.values():
+        total["total_ms"] = round(total["total_ms"], 1)
+    return sorted(totals.values(), key=lambda total: -total["total_ms"])
+
+def display_trace_waterfall(container: Any, spans: List[Dict[str, Any]]) -> None:
+    """
+    Shows the timing waterfall and the per-operation totals of a trace.
+
+    Parameters:
+    - container: The Streamlit container to render into (e.g., `st.sidebar`).
+    - spans: The span dicts of the trace.
+    """
+    if not spans:
+        container.caption("No timings recorded for this conversation yet.")
+        return
+    expander = container.expander("Timing Waterfall", expanded=True)
+    expander.dataframe(summarize_trace(spans), hide_index=True, use_container_width=True)
+    expander.code(format_trace_waterfall(spans), language=None)